@@ -1,3 +1,4 @@
+import logging
 import os
 from flask import Flask, send_from_directory
 from flask_cors import CORS
@@ -12,6 +13,8 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # 初始化扩展
 jwt = JWTManager()
 migrate = Migrate()
@@ -35,12 +38,19 @@ def create_app(test_config=None):
     # !!! 注释掉下面这行，让配置从 config.py 加载 !!!
     # app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///health_system.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SQLALCHEMY_ECHO'] = True  # Add SQLALCHEMY_ECHO = True for debugging SQL queries
     
     # 配置JWT
     app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'dev-secret-key')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
     
+    # 测试配置覆盖以上设置（例如临时数据库）
+    if test_config:
+        app.config.from_mapping(test_config)
+    
+    # 日志：经队列由后台线程输出，级别见 LOG_LEVEL
+    from .utils.log import setup_logging
+    setup_logging(app)
+    
     # 配置上传文件夹
     app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'public/uploads')
     
@@ -61,23 +71,57 @@ def create_app(test_config=None):
     jwt.init_app(app)
     migrate.init_app(app, db)
     
+    # 每个请求的 SQL 次数和耗时统计（代替 SQLALCHEMY_ECHO，汇总见 /api/admin/perf）
+    from .utils.profiler import query_profiler
+    query_profiler.init_app(app)
+    
+    # 密码哈希线程池
+    from .utils.passwords import password_hasher
+    password_hasher.init_app(app)
+    
+    # 活动日志批量写入
+    from .services.activity_log import activity_log
+    activity_log.init_app(app)
+    
+    # 管理后台全文搜索索引（表和触发器在下方 create_all 之后创建）
+    from .services.search import search_index
+    search_index.init_app(app)
+    
+    # 推荐食物索引和个性化推荐
+    from .services.recommendations import food_index, food_recommender
+    food_index.init_app(app)
+    food_recommender.init_app(app)
+    
+    # 管理员仪表板计数器
+    from .services.dashboard import dashboard_counters
+    dashboard_counters.init_app(app)
+    
+    # 后台报告生成任务（工作线程在第一次提交申请时启动）
+    from .services.report_jobs import report_job_runner
+    report_job_runner.init_app(app)
+    
     # 配置JWT
     @jwt.user_identity_loader
     def user_identity_lookup(user):
-        print(f"用户身份加载器: {user}")
+        logger.debug('用户身份加载器: %s', user)
         return user
         
     @jwt.user_lookup_loader
     def user_lookup_callback(_jwt_header, jwt_data):
-        from .models.user import User
-        identity = jwt_data["sub"]
-        print(f"用户查找回调: {identity}")
-        return User.query.filter_by(id=identity).one_or_none()
+        # 使用身份缓存，同一请求内的 admin_required 检查不会再次查询 users 表
+        from .utils.identity import get_identity
+        return get_identity(jwt_data["sub"])
+    
+    @jwt.token_in_blocklist_loader
+    def check_token_revoked(_jwt_header, jwt_payload):
+        # 角色/状态变化后 token_version 递增，旧令牌在这里被拒绝
+        from .utils.identity import is_token_revoked
+        return is_token_revoked(jwt_payload)
     
     # JWT错误处理
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
-        print(f"令牌已过期: {jwt_payload}")
+        logger.debug('令牌已过期: %s', jwt_payload)
         return {
             'success': False,
             'message': '令牌已过期，请重新登录'
@@ -85,15 +129,23 @@ def create_app(test_config=None):
     
     @jwt.invalid_token_loader
     def invalid_token_callback(error_string):
-        print(f"无效的令牌: {error_string}")
+        logger.warning('无效的令牌: %s', error_string)
         return {
             'success': False,
             'message': f'无效的令牌: {error_string}'
         }, 422
     
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        logger.debug('令牌已失效: %s', jwt_payload)
+        return {
+            'success': False,
+            'message': '令牌已失效，请重新登录'
+        }, 401
+    
     @jwt.unauthorized_loader
     def missing_token_callback(error_string):
-        print(f"缺少令牌: {error_string}")
+        logger.debug('缺少令牌: %s', error_string)
         return {
             'success': False,
             'message': '缺少令牌'
@@ -103,6 +155,10 @@ def create_app(test_config=None):
     from .utils.errors import register_error_handlers
     register_error_handlers(app)
     
+    # 注册命令行工具
+    from .commands import register_commands
+    register_commands(app)
+    
     # 导入蓝图
     from .routes.auth import auth_bp
     from .routes.records import records_bp
@@ -144,7 +200,7 @@ def create_app(test_config=None):
     @app.route('/default-avatar.png')
     def default_avatar():
         # 打印调试信息
-        print("请求默认头像")
+        logger.debug('请求默认头像')
         try:
             # 确保上传文件夹存在
             os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -155,11 +211,11 @@ def create_app(test_config=None):
                 # 如果不存在，创建一个空文件
                 with open(avatar_path, 'wb') as f:
                     f.write(b'')
-                print(f"创建了默认头像文件: {avatar_path}")
+                logger.info('创建了默认头像文件: %s', avatar_path)
             
             return send_from_directory(app.config['UPLOAD_FOLDER'], 'default-avatar.png')
         except Exception as e:
-            print(f"提供默认头像时出错: {str(e)}")
+            logger.exception('提供默认头像时出错: %s', e)
             # 返回一个简单的响应，避免500错误
             return "", 200
     
@@ -168,6 +224,7 @@ def create_app(test_config=None):
         # 按照依赖关系顺序导入模型
         from .models.user import User, UserProfile
         from .models.record import Record
+        from .models.daily_metric import DailyUserMetric
         from .models.report import Report, Recommendation
         from .models.admin import SystemSetting, Announcement, ActivityLog
         from .models.manual_suggestion import ManualSuggestion
@@ -175,6 +232,7 @@ def create_app(test_config=None):
         
         # 创建表
         db.create_all()
+        search_index.ensure()
         
         # 创建初始管理员用户
         from werkzeug.security import generate_password_hash
@@ -190,6 +248,6 @@ def create_app(test_config=None):
             )
             db.session.add(admin)
             db.session.commit()
-            print('已创建初始管理员用户')
+            logger.info('已创建初始管理员用户')
     
     return app 
\ No newline at end of file
@@ -0,0 +1,188 @@
+import time
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import func
+
+from .models import db, Record
+
+
+def _hot_record_queries():
+    """热点接口使用的记录查询，用于检查执行计划
+
+    Returns:
+        list: [(名称, 期望使用的索引, Query)]
+    """
+    user_id = 1
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=30)
+
+    return [
+        (
+            '/api/records/all',
+            'ix_records_user_created',
+            Record.query.filter(
+                Record.user_id == user_id,
+                Record.created_at >= start_date
+            ).order_by(Record.created_at.desc())
+        ),
+        (
+            '/api/records/stats',
+            'ix_records_user_type_created',
+            db.session.query(Record.type, func.count(Record.id), func.sum(Record.duration)).filter(
+                Record.user_id == user_id,
+                Record.type == 'exercise',
+                Record.created_at >= start_date
+            ).group_by(Record.type)
+        ),
+        (
+            '/api/records/trends',
+            'ix_records_user_record_date',
+            Record.query.filter(
+                Record.user_id == user_id,
+                Record.record_date >= start_date,
+                Record.record_date < end_date
+            ).order_by(Record.record_date.asc())
+        ),
+        (
+            'ReportService.get_summary',
+            'ix_records_user_type_created',
+            db.session.query(Record.type, func.count(Record.id)).filter(
+                Record.user_id == user_id,
+                Record.type.in_(('food', 'exercise', 'mood', 'health')),
+                Record.created_at >= start_date,
+                Record.created_at <= end_date
+            ).group_by(Record.type)
+        ),
+        (
+            'ReportService.generate_report_data',
+            'ix_records_user_record_date',
+            Record.query.filter(
+                Record.user_id == user_id,
+                Record.record_date >= start_date,
+                Record.record_date < end_date
+            ).order_by(Record.record_date.asc())
+        ),
+    ]
+
+
+def _explain(query):
+    """返回查询的执行计划中使用到的索引名和原始计划文本
+
+    Args:
+        query: SQLAlchemy Query 对象
+
+    Returns:
+        tuple: (使用到的索引名集合, 计划文本行列表)
+    """
+    dialect = db.engine.dialect
+    compiled = query.statement.compile(dialect=dialect, compile_kwargs={'render_postcompile': True})
+    params = [compiled.params[name] for name in (compiled.positiontup or [])]
+    # 执行计划不依赖参数取值，日期参数统一转为字符串避免驱动适配差异
+    params = tuple(p.isoformat(' ') if isinstance(p, datetime) else p for p in params)
+
+    with db.engine.connect() as conn:
+        if dialect.name == 'sqlite':
+            rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).fetchall()
+            lines = [row[-1] for row in rows]
+            used = {word for line in lines for word in line.split() if word.startswith('ix_')}
+        else:
+            rows = conn.exec_driver_sql(f'EXPLAIN {compiled}', params).mappings().fetchall()
+            lines = [str(dict(row)) for row in rows]
+            used = {row['key'] for row in rows if row.get('key')}
+    return used, lines
+
+
+def register_commands(app):
+    """注册命令行工具"""
+
+    @app.cli.command('check-indexes')
+    def check_indexes():
+        """使用 EXPLAIN 检查热点记录查询是否命中复合索引"""
+        failures = 0
+        for name, expected_index, query in _hot_record_queries():
+            used, lines = _explain(query)
+            ok = expected_index in used
+            failures += 0 if ok else 1
+            click.echo(f"[{'OK' if ok else 'MISS'}] {name} -> 期望索引 {expected_index}")
+            for line in lines:
+                click.echo(f'    {line}')
+
+        if failures:
+            raise click.ClickException(f'{failures} 个热点查询未使用预期索引')
+        click.echo('所有热点查询均使用了预期索引')
+
+    @app.cli.command('rebuild-daily-metrics')
+    def rebuild_daily_metrics():
+        """根据原始记录重建 daily_user_metrics 汇总表"""
+        from .services.metrics import DailyMetricsService
+
+        started = time.perf_counter()
+        user_count = DailyMetricsService.rebuild_all()
+        click.echo(f'已重建 {user_count} 个用户的每日汇总，用时 {time.perf_counter() - started:.2f} 秒')
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index():
+        """从 users 和 food_items 表重建管理后台全文搜索索引"""
+        from .services.search import search_index
+
+        if not search_index.available:
+            raise click.ClickException('全文搜索索引不可用（需要支持 FTS5 的 SQLite 且 SEARCH_FTS_ENABLED 为 True）')
+        started = time.perf_counter()
+        search_index.rebuild()
+        click.echo(f'已重建全文搜索索引，用时 {time.perf_counter() - started:.2f} 秒')
+
+    @app.cli.command('generate-reports')
+    @click.option('--days', default=30, show_default=True, help='分析最近多少天的记录')
+    @click.option('--shard-size', default=1000, show_default=True, help='每个分片包含的用户数')
+    @click.option('--workers', default=None, type=int, help='工作进程数，默认等于CPU核数，1 表示不使用进程池')
+    @click.option('--dry-run', is_flag=True, help='只计算不写入报告')
+    def generate_reports(days, shard_size, workers, dry_run):
+        """按用户分片并行为全部用户生成报告（适合每晚定时执行）"""
+        from .services.batch_reports import BatchReportService
+
+        if days <= 0 or shard_size <= 0:
+            raise click.BadParameter('days 和 shard-size 必须大于0')
+        if workers is not None and workers <= 0:
+            raise click.BadParameter('workers 必须大于0')
+
+        def progress(done, total):
+            click.echo(f'分片 {done}/{total} 已完成')
+
+        stats = BatchReportService.run(
+            days=days, shard_size=shard_size, workers=workers, dry_run=dry_run, progress=progress
+        )
+        click.echo(
+            f"用户 {stats['users']} 个，分片 {stats['shards']} 个，读取记录 {stats['records']} 条，"
+            f"{'计算' if dry_run else '生成'}报告 {stats['reports']} 份，"
+            f"当天已有报告跳过 {stats['skipped']} 份，用时 {stats['seconds']} 秒"
+        )
+        click.echo(
+            f"吞吐量: {stats['users_per_second']} 用户/秒，{stats['records_per_second']} 记录/秒"
+        )
+
+    @app.cli.command('precompute-meal-plans')
+    @click.option('--day', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='推荐适用的日期 (YYYY-MM-DD)，默认明天')
+    @click.option('--batch-size', default=1000, show_default=True, help='每批处理的用户数')
+    @click.option('--seed', default=None, type=int, help='随机种子，便于复现')
+    @click.option('--dry-run', is_flag=True, help='只计算不写入')
+    def precompute_meal_plans(day, batch_size, seed, dry_run):
+        """为所有启用的用户预先生成三餐推荐（适合每晚定时执行）"""
+        from .services.meal_plans import MealPlanService
+
+        if batch_size <= 0:
+            raise click.BadParameter('batch-size 必须大于0')
+
+        def progress(done, total):
+            click.echo(f'批次 {done}/{total} 已完成')
+
+        stats = MealPlanService.run(
+            day=day.date() if day else None, batch_size=batch_size, seed=seed, dry_run=dry_run, progress=progress
+        )
+        click.echo(
+            f"日期 {stats['day']}: 用户 {stats['users']} 个，候选食物 {stats['foods']} 种，"
+            f"读取记录 {stats['records']} 条，{'计算' if dry_run else '生成'}推荐 {stats['plans']} 份，"
+            f"用时 {stats['seconds']} 秒"
+        )
+        click.echo(f"吞吐量: {stats['users_per_second']} 用户/秒")
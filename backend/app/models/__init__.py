@@ -10,11 +10,13 @@ __all__ = ['db']
 # 导入所有模型
 from .user import User, UserProfile
 from .record import Record
+from .daily_metric import DailyUserMetric
 from .report import Report, ReportRequest, Recommendation
 from .admin import SystemSetting, Announcement, ActivityLog
 from .food import FoodItem
 from .manual_suggestion import ManualSuggestion
 from .advice_request import AdviceRequest
+from .meal_plan import MealPlan
 
 # 导出所有模型
 __all__ = [
@@ -22,6 +24,7 @@ __all__ = [
     'User',
     'UserProfile',
     'Record',
+    'DailyUserMetric',
     'Report',
     'ReportRequest',
     'Recommendation',
@@ -30,5 +33,6 @@ __all__ = [
     'ActivityLog',
     'FoodItem',
     'ManualSuggestion',
-    'AdviceRequest'
+    'AdviceRequest',
+    'MealPlan'
 ] 
\ No newline at end of file
@@ -51,6 +51,12 @@ class Announcement(db.Model):
 
 class ActivityLog(db.Model):
     __tablename__ = 'activity_logs'
+    __table_args__ = (
+        # 按时间倒序分页（游标为 created_at, id）
+        db.Index('ix_activity_logs_created_id', 'created_at', 'id'),
+        # 按用户筛选日志
+        db.Index('ix_activity_logs_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -66,7 +72,7 @@ class ActivityLog(db.Model):
         return {
             'id': self.id,
             'user_id': self.user_id,
-            'username': self.user.username,
+            'username': self.user.username if self.user else None,
             'action': self.action,
             'details': self.details,
             'ip_address': self.ip_address,
@@ -20,15 +20,22 @@ class AdviceRequest(db.Model):
     responder = db.relationship('User', foreign_keys=[admin_id], backref=db.backref('advice_requests_answered', lazy='dynamic'))
 
     def to_dict(self):
+        return self.to_dict_with_usernames(
+            self.requester.username if self.requester else None,
+            self.responder.username if self.responder else None
+        )
+
+    def to_dict_with_usernames(self, requester_username, responder_username):
+        """使用已查询到的用户名序列化，不访问 requester/responder 关联（列表接口使用）"""
         return {
             'id': self.id,
             'user_id': self.user_id,
-            'requester_username': self.requester.username if self.requester else None, # 包含申请者用户名
+            'requester_username': requester_username, # 包含申请者用户名
             'request_text': self.request_text,
             'requested_at': self.requested_at.isoformat(),
             'status': self.status,
             'admin_id': self.admin_id,
-            'responder_username': self.responder.username if self.responder else None, # 包含回复者用户名
+            'responder_username': responder_username, # 包含回复者用户名
             'response_text': self.response_text,
             'responded_at': self.responded_at.isoformat() if self.responded_at else None
         }
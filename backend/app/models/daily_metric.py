@@ -0,0 +1,59 @@
+from datetime import datetime
+from . import db
+
+class DailyUserMetric(db.Model):
+    """每个用户每天的记录汇总（由记录的增删改增量维护）"""
+    __tablename__ = 'daily_user_metrics'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', name='uq_daily_user_metrics_user_day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # 对应记录的 record_date
+
+    # 运动
+    exercise_count = db.Column(db.Integer, default=0, nullable=False)
+    exercise_minutes = db.Column(db.Integer, default=0, nullable=False)
+
+    # 饮食（按餐次计数）
+    food_count = db.Column(db.Integer, default=0, nullable=False)
+    breakfast_count = db.Column(db.Integer, default=0, nullable=False)
+    lunch_count = db.Column(db.Integer, default=0, nullable=False)
+    dinner_count = db.Column(db.Integer, default=0, nullable=False)
+    snack_count = db.Column(db.Integer, default=0, nullable=False)
+
+    # 心情分布 {"happy": 2, "sad": 1}，键为小写心情类型
+    mood_counts = db.Column(db.JSON, nullable=True)
+
+    # 身体状况：当天最后一次体重/BMI，以及感受分值之和与条数
+    weight_kg = db.Column(db.Float, nullable=True)
+    bmi = db.Column(db.Float, nullable=True)
+    feeling_score_sum = db.Column(db.Integer, default=0, nullable=False)
+    feeling_count = db.Column(db.Integer, default=0, nullable=False)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def meal_counts(self):
+        """返回各餐次的记录数"""
+        return {
+            'breakfast': self.breakfast_count,
+            'lunch': self.lunch_count,
+            'dinner': self.dinner_count,
+            'snack': self.snack_count
+        }
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'day': self.day.isoformat(),
+            'exercise_count': self.exercise_count,
+            'exercise_minutes': self.exercise_minutes,
+            'food_count': self.food_count,
+            'meal_counts': self.meal_counts(),
+            'mood_counts': self.mood_counts or {},
+            'weight_kg': self.weight_kg,
+            'bmi': self.bmi,
+            'feeling_score_sum': self.feeling_score_sum,
+            'feeling_count': self.feeling_count
+        }
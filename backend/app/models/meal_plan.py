@@ -0,0 +1,50 @@
+from datetime import datetime
+from . import db
+
+class MealPlan(db.Model):
+    """预先生成的每日三餐推荐（每个用户每天一行，由 flask precompute-meal-plans 批量写入）"""
+    __tablename__ = 'meal_plans'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', name='uq_meal_plans_user_day'),
+    )
+
+    # (列名, 显示名称)
+    MEALS = (('breakfast', '早餐'), ('lunch', '午餐'), ('dinner', '晚餐'))
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # 推荐适用的日期
+
+    # 每餐推荐的食物名称，以“、”分隔
+    breakfast = db.Column(db.String(255), nullable=True)
+    lunch = db.Column(db.String(255), nullable=True)
+    dinner = db.Column(db.String(255), nullable=True)
+
+    # 用户在参考时间窗口内有饮食记录，推荐按其记录加权生成（与 FoodRecommender 一致）
+    personalized = db.Column(db.Boolean, default=False, nullable=False)
+
+    generated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def meals(self):
+        """返回与推荐接口相同格式的餐次列表，省略为空的餐次"""
+        return [
+            {'meal_time': label, 'content': getattr(self, column), 'calories': None}
+            for column, label in self.MEALS
+            if getattr(self, column)
+        ]
+
+    def foods(self):
+        """推荐中出现的全部食物名称"""
+        return {
+            name for column, _ in self.MEALS
+            for name in (getattr(self, column) or '').split('、') if name
+        }
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'day': self.day.isoformat(),
+            'meals': self.meals(),
+            'personalized': self.personalized,
+            'generated_at': self.generated_at.isoformat() if self.generated_at else None
+        }
@@ -5,6 +5,14 @@ from sqlalchemy.types import JSON # Use this for broader compatibility
 
 class Record(db.Model):
     __tablename__ = 'records'
+    __table_args__ = (
+        # 按用户+类型+时间过滤（统计、摘要）
+        db.Index('ix_records_user_type_created', 'user_id', 'type', 'created_at'),
+        # 按用户+时间倒序列出全部记录
+        db.Index('ix_records_user_created', 'user_id', 'created_at'),
+        # 按用户+记录日期查询趋势和报告
+        db.Index('ix_records_user_record_date', 'user_id', 'record_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -9,12 +9,16 @@ class ReportRequest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True) # 关联的用户ID
     requested_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False) # 申请时间
-    # 状态: pending (待处理), processing (处理中), completed (已完成), rejected (已拒绝)
+    # 状态: pending (待处理), processing (处理中), completed (已完成), rejected (已拒绝), failed (生成失败)
     status = db.Column(db.String(20), default='pending', nullable=False, index=True)
     # 用户申请时可选填写的备注
     user_notes = db.Column(db.Text)
     # 可选，关联到完成的报告ID
     report_id = db.Column(db.Integer, db.ForeignKey('reports.id'), nullable=True)
+    # 后台任务开始/结束处理的时间，以及失败原因
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    error_message = db.Column(db.Text, nullable=True)
 
     # 关联关系
     user = db.relationship('User', backref=db.backref('report_requests', lazy='dynamic')) # 反向关联到User模型
@@ -29,7 +33,10 @@ class ReportRequest(db.Model):
             'requested_at': self.requested_at.isoformat(),
             'status': self.status,
             'user_notes': self.user_notes,
-            'report_id': self.report_id
+            'report_id': self.report_id,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'error_message': self.error_message
         }
 
 class Report(db.Model):
@@ -1,6 +1,6 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from . import db
+from ..utils.passwords import password_hasher
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -15,6 +15,8 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    # 令牌版本号，角色或状态变化时递增，使已签发的令牌失效
+    token_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     
     @property
     def password(self):
@@ -22,13 +24,29 @@ class User(db.Model):
         
     @password.setter
     def password(self, password):
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        # 在有界的哈希线程池中计算，避免阻塞请求线程的 CPU
+        self.password_hash = password_hasher.hash(password)
         
     def verify_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+    
+    def rehash_password_if_needed(self, password):
+        """哈希参数与当前配置不一致时，用已验证的明文密码重新生成哈希
+
+        Returns:
+            bool: 是否重新生成了哈希（调用方负责提交）
+        """
+        if not password_hasher.needs_rehash(self.password_hash):
+            return False
+        self.password = password
+        return True
     
     def is_admin(self):
         return self.role == 'admin'
+
+    def revoke_tokens(self):
+        """使该用户已签发的所有令牌失效"""
+        self.token_version = (self.token_version or 0) + 1
     
     def to_dict(self):
         return {
@@ -2,18 +2,25 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 
-from ..models import db, User, SystemSetting, Announcement, ActivityLog
-from ..utils.errors import bad_request, not_found, unauthorized
+from ..models import db, User, SystemSetting, Announcement
+from ..services.audit import audit
+from ..services.activity_log import ActivityLogService
+from ..services.dashboard import dashboard_counters
+from ..utils.errors import ValidationError, bad_request, not_found, unauthorized
+from ..utils.identity import current_is_admin, invalidate_identity
+from ..utils.pagination import pagination_args, paginate
 
 admin_bp = Blueprint('admin', __name__)
 
+# 活动日志游标分页的默认/最大每页条数
+DEFAULT_LOG_PAGE_SIZE = 50
+MAX_LOG_PAGE_SIZE = 200
+
 # 管理员权限检查装饰器
 def admin_required(fn):
     def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        if not user or not user.is_admin():
+        # 角色来自令牌声明，令牌是否已失效由 token_in_blocklist_loader 检查
+        if not current_is_admin():
             return unauthorized('需要管理员权限')
         
         return fn(*args, **kwargs)
@@ -21,11 +28,11 @@ def admin_required(fn):
     wrapper.__name__ = fn.__name__
     return wrapper
 
-@admin_bp.route('/users', methods=['GET'])
+@admin_bp.route('/users/all', methods=['GET'])
 @jwt_required()
 @admin_required
 def get_all_users():
-    """获取所有用户"""
+    """获取所有用户（不分页，供报告页的用户选择使用；分页和搜索见 admin_api.get_users）"""
     users = User.query.all()
     return jsonify([user.to_dict() for user in users])
 
@@ -58,17 +65,15 @@ def update_user_status(user_id):
     if user_id == admin_id:
         return bad_request('不能修改自己的状态')
     
-    user.is_active = data['is_active']
-    db.session.commit()
-    
-    # 记录活动
-    log = ActivityLog(
-        user_id=admin_id,
-        action='update_user_status',
-        details=f"更新用户 {user.username} 的状态为 {'激活' if user.is_active else '禁用'}"
-    )
-    db.session.add(log)
-    db.session.commit()
+    before = dashboard_counters.user_state(user)
+    # 修改与活动日志在同一个事务中提交
+    with audit('update_user_status') as entry:
+        if user.is_active != data['is_active']:
+            user.is_active = data['is_active']
+            user.revoke_tokens()
+        entry.details = f"更新用户 {user.username} 的状态为 {'激活' if user.is_active else '禁用'}"
+    invalidate_identity(user.id)
+    dashboard_counters.record_user_change(before, dashboard_counters.user_state(user))
     
     return jsonify({'message': '用户状态已更新'})
 
@@ -93,17 +98,14 @@ def update_user_role(user_id):
     if user_id == admin_id and data['role'] != 'admin':
         return bad_request('不能降级自己的权限')
     
-    user.role = data['role']
-    db.session.commit()
-    
-    # 记录活动
-    log = ActivityLog(
-        user_id=admin_id,
-        action='update_user_role',
-        details=f"更新用户 {user.username} 的角色为 {user.role}"
-    )
-    db.session.add(log)
-    db.session.commit()
+    before = dashboard_counters.user_state(user)
+    with audit('update_user_role') as entry:
+        if user.role != data['role']:
+            user.role = data['role']
+            user.revoke_tokens()
+        entry.details = f"更新用户 {user.username} 的角色为 {user.role}"
+    invalidate_identity(user.id)
+    dashboard_counters.record_user_change(before, dashboard_counters.user_state(user))
     
     return jsonify({'message': '用户角色已更新'})
 
@@ -135,18 +137,8 @@ def create_system_setting():
         description=data.get('description', '')
     )
     
-    db.session.add(setting)
-    db.session.commit()
-    
-    # 记录活动
-    admin_id = get_jwt_identity()
-    log = ActivityLog(
-        user_id=admin_id,
-        action='create_setting',
-        details=f"创建系统设置 {setting.key}"
-    )
-    db.session.add(log)
-    db.session.commit()
+    with audit('create_setting', f"创建系统设置 {setting.key}"):
+        db.session.add(setting)
     
     return jsonify(setting.to_dict()), 201
 
@@ -163,21 +155,10 @@ def update_system_setting(key):
     if not setting:
         return not_found('设置不存在')
     
-    setting.value = data['value']
-    if 'description' in data:
-        setting.description = data['description']
-    
-    db.session.commit()
-    
-    # 记录活动
-    admin_id = get_jwt_identity()
-    log = ActivityLog(
-        user_id=admin_id,
-        action='update_setting',
-        details=f"更新系统设置 {setting.key}"
-    )
-    db.session.add(log)
-    db.session.commit()
+    with audit('update_setting', f"更新系统设置 {setting.key}"):
+        setting.value = data['value']
+        if 'description' in data:
+            setting.description = data['description']
     
     return jsonify(setting.to_dict())
 
@@ -190,18 +171,8 @@ def delete_system_setting(key):
     if not setting:
         return not_found('设置不存在')
     
-    db.session.delete(setting)
-    db.session.commit()
-    
-    # 记录活动
-    admin_id = get_jwt_identity()
-    log = ActivityLog(
-        user_id=admin_id,
-        action='delete_setting',
-        details=f"删除系统设置 {key}"
-    )
-    db.session.add(log)
-    db.session.commit()
+    with audit('delete_setting', f"删除系统设置 {key}"):
+        db.session.delete(setting)
     
     return jsonify({'message': '设置已删除'})
 
@@ -225,21 +196,13 @@ def create_announcement():
     announcement = Announcement(
         title=data['title'],
         content=data['content'],
-        is_active=data.get('is_active', True)
+        is_active=data.get('is_active', True),
+        created_by=get_jwt_identity()
     )
     
-    db.session.add(announcement)
-    db.session.commit()
-    
-    # 记录活动
-    admin_id = get_jwt_identity()
-    log = ActivityLog(
-        user_id=admin_id,
-        action='create_announcement',
-        details=f"创建公告 {announcement.title}"
-    )
-    db.session.add(log)
-    db.session.commit()
+    with audit('create_announcement', f"创建公告 {announcement.title}"):
+        db.session.add(announcement)
+    dashboard_counters.record_announcement_change(False, announcement.is_active)
     
     return jsonify(announcement.to_dict()), 201
 
@@ -256,24 +219,16 @@ def update_announcement(announcement_id):
     if not announcement:
         return not_found('公告不存在')
     
-    if 'title' in data:
-        announcement.title = data['title']
-    if 'content' in data:
-        announcement.content = data['content']
-    if 'is_active' in data:
-        announcement.is_active = data['is_active']
-    
-    db.session.commit()
-    
-    # 记录活动
-    admin_id = get_jwt_identity()
-    log = ActivityLog(
-        user_id=admin_id,
-        action='update_announcement',
-        details=f"更新公告 {announcement.title}"
-    )
-    db.session.add(log)
-    db.session.commit()
+    was_active = announcement.is_active
+    with audit('update_announcement') as entry:
+        if 'title' in data:
+            announcement.title = data['title']
+        if 'content' in data:
+            announcement.content = data['content']
+        if 'is_active' in data:
+            announcement.is_active = data['is_active']
+        entry.details = f"更新公告 {announcement.title}"
+    dashboard_counters.record_announcement_change(was_active, announcement.is_active)
     
     return jsonify(announcement.to_dict())
 
@@ -286,18 +241,9 @@ def delete_announcement(announcement_id):
     if not announcement:
         return not_found('公告不存在')
     
-    db.session.delete(announcement)
-    db.session.commit()
-    
-    # 记录活动
-    admin_id = get_jwt_identity()
-    log = ActivityLog(
-        user_id=admin_id,
-        action='delete_announcement',
-        details=f"删除公告 {announcement.title}"
-    )
-    db.session.add(log)
-    db.session.commit()
+    with audit('delete_announcement', f"删除公告 {announcement.title}"):
+        db.session.delete(announcement)
+    dashboard_counters.record_announcement_change(announcement.is_active, False)
     
     return jsonify({'message': '公告已删除'})
 
@@ -305,45 +251,78 @@ def delete_announcement(announcement_id):
 @jwt_required()
 @admin_required
 def get_activity_logs():
-    """获取活动日志"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    
-    logs = ActivityLog.query.order_by(ActivityLog.created_at.desc()).paginate(page=page, per_page=per_page)
+    """获取活动日志
+    
+    支持按 action、user_id、start、end（ISO 时间）筛选。传入 limit 或 cursor 时
+    按 (created_at, id) 游标分页返回 {'logs', 'next_cursor', 'has_more'}，
+    否则保持原有的 page/per_page 分页（include_total=false 时不执行 COUNT）。
+    """
+    action = request.args.get('action')
+    filter_user_id = request.args.get('user_id', type=int)
+    start = _parse_time_arg('start')
+    end = _parse_time_arg('end')
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit', type=int)
+    
+    query = ActivityLogService.build_query(action=action, user_id=filter_user_id, start=start, end=end)
+    
+    if cursor is not None or limit is not None:
+        limit = max(1, min(limit or DEFAULT_LOG_PAGE_SIZE, MAX_LOG_PAGE_SIZE))
+        logs, next_cursor, has_more = ActivityLogService.list_after(query, cursor, limit)
+        return jsonify({
+            'logs': [log.to_dict() for log in logs],
+            'next_cursor': next_cursor,
+            'has_more': has_more
+        })
+    
+    args = pagination_args(default_per_page=20)
+    logs = paginate(ActivityLogService.ordered(query), args.page, args.per_page, args.include_total)
     
     return jsonify({
         'logs': [log.to_dict() for log in logs.items],
         'total': logs.total,
         'pages': logs.pages,
-        'current_page': logs.page
+        'current_page': logs.page,
+        'has_next': logs.has_next
     })
 
+def _parse_time_arg(name):
+    """解析 ISO 格式的时间查询参数"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValidationError(f'无效的时间参数 {name}，应为 ISO 格式')
+
 @admin_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
 @admin_required
 def get_admin_dashboard():
-    """获取管理员仪表板数据"""
-    # 用户统计
-    total_users = User.query.count()
-    active_users = User.query.filter_by(is_active=True).count()
-    admin_users = User.query.filter_by(role='admin').count()
+    """获取管理员仪表板数据
+    
+    计数来自增量维护的计数器，列表短时间缓存，页面访问通常不查询数据库。
+    """
+    counts = dashboard_counters.counts()
     
     # 最近注册的用户
-    recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
+    recent_users = dashboard_counters.cached('recent_users', lambda: [
+        user.to_dict() for user in User.query.order_by(User.created_at.desc()).limit(5).all()
+    ])
     
     # 最近的活动日志
-    recent_logs = ActivityLog.query.order_by(ActivityLog.created_at.desc()).limit(10).all()
-    
-    # 活跃公告
-    active_announcements = Announcement.query.filter_by(is_active=True).count()
+    recent_logs = dashboard_counters.cached('recent_logs', lambda: [
+        log.to_dict() for log in ActivityLogService.recent(10)
+    ])
     
     return jsonify({
         'user_stats': {
-            'total': total_users,
-            'active': active_users,
-            'admin': admin_users
+            'total': counts['total_users'],
+            'active': counts['active_users'],
+            'admin': counts['admin_users']
         },
-        'recent_users': [user.to_dict() for user in recent_users],
-        'recent_logs': [log.to_dict() for log in recent_logs],
-        'active_announcements': active_announcements
+        'recent_users': recent_users,
+        'recent_logs': recent_logs,
+        'active_announcements': counts['active_announcements']
     }) 
\ No newline at end of file
@@ -1,37 +1,77 @@
+import logging
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from functools import wraps
 from sqlalchemy import asc, desc # Import asc and desc for sorting
 from datetime import datetime # <--- 需要导入 datetime
 
-from ..models import db, FoodItem, User, Report, AdviceRequest # <--- 导入 AdviceRequest 模型
-from ..utils.errors import forbidden, not_found, bad_request # <--- 可能需要 bad_request
+from ..models import db, FoodItem, User, Report, AdviceRequest, DailyUserMetric, MealPlan # <--- 导入 AdviceRequest 模型
+from ..utils.errors import forbidden, not_found, bad_request, ServiceUnavailableError, ValidationError # <--- 可能需要 bad_request
+from ..utils.identity import current_is_admin, invalidate_identity
+from ..utils.pagination import pagination_args, paginate, keyset_paginate
+from ..utils.passwords import password_hasher
+from ..utils.profiler import query_profiler
+from ..services.activity_log import activity_log
+from ..services.advice import AdviceService
+from ..services.dashboard import dashboard_counters
+from ..services.recommendations import food_index
+from ..services.search import search_index
 
 admin_api_bp = Blueprint('admin_api', __name__, url_prefix='/api/admin')
 
+logger = logging.getLogger(__name__)
+
 # --- 权限检查装饰器 ---
 def admin_required(fn):
     """检查当前用户是否为管理员"""
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        if not user or not user.is_admin():
+        if not current_is_admin():
             return forbidden('需要管理员权限')
         return fn(*args, **kwargs)
     return wrapper
 
+def paginate_listing(query, args, model, sort_column, descending):
+    """按 pagination_args() 的参数分页列表
+
+    传入 cursor 时按 (排序列, id) 游标分页，排序列必须非空；否则按页码分页。
+
+    Raises:
+        ValidationError: 排序列不支持游标分页
+    """
+    if args.cursor is None:
+        order = desc(sort_column) if descending else asc(sort_column)
+        return paginate(query.order_by(order, model.id), args.page, args.per_page, args.include_total)
+
+    if getattr(sort_column, 'nullable', True):
+        raise ValidationError('该排序字段不支持游标分页')
+    columns = (sort_column,) if sort_column is model.id else (sort_column, model.id)
+    return keyset_paginate(query, columns, args.cursor, args.per_page, descending,
+                           include_total=args.include_total)
+
+def log_admin_action(action, details):
+    """记录管理员操作（由活动日志缓冲区批量写入）"""
+    activity_log.record(
+        user_id=get_jwt_identity(),
+        action=action,
+        details=details,
+        ip_address=request.remote_addr
+    )
+
 # --- FoodItem 管理接口 ---
 
 @admin_api_bp.route('/food-items', methods=['GET'])
 @jwt_required()
 @admin_required
 def get_food_items():
-    """获取食物条目列表 (支持分页, 搜索, 筛选, 排序)"""
+    """获取食物条目列表 (支持分页, 搜索, 筛选, 排序)
+    
+    分页参数见 pagination_args()：include_total=false 时不执行 COUNT，
+    传入 cursor 时使用游标分页。
+    """
     try:
         # Get query parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
+        args = pagination_args()
         search_term = request.args.get('search', None, type=str)
         category_filter = request.args.get('category', None, type=str)
         sort_by = request.args.get('sort_by', 'name', type=str) # Default sort by name
@@ -40,40 +80,34 @@ def get_food_items():
         # Base query
         query = FoodItem.query
 
-        # Apply search filter (case-insensitive)
-        if search_term:
+        # Apply search filter: 全文索引子串匹配，索引不可用或搜索词过短时回退到 ILIKE
+        matches = search_index.match('food_items', search_term) if search_term else None
+        if matches is not None:
+            query = query.join(matches, matches.c.id == FoodItem.id)
+        elif search_term:
             query = query.filter(FoodItem.name.ilike(f'%{search_term}%'))
 
         # Apply category filter
         if category_filter:
             query = query.filter(FoodItem.category == category_filter)
 
-        # Apply sorting
+        # Apply sorting and pagination (搜索且未指定排序时按相关度排序，仅支持页码分页)
         sort_column = getattr(FoodItem, sort_by, FoodItem.name) # Default to name if invalid column
-        if sort_order.lower() == 'desc':
-            query = query.order_by(desc(sort_column))
+        if matches is not None and 'sort_by' not in request.args and args.cursor is None:
+            page = paginate(query.order_by(matches.c.rank, FoodItem.id), args.page, args.per_page, args.include_total)
         else:
-            query = query.order_by(asc(sort_column))
-            
-        # Execute query with pagination
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        items = pagination.items
+            page = paginate_listing(query, args, FoodItem, sort_column, sort_order.lower() == 'desc')
 
         return jsonify({
             'success': True,
-            'data': [item.to_dict() for item in items],
-            'pagination': {
-                'total_items': pagination.total,
-                'total_pages': pagination.pages,
-                'current_page': pagination.page,
-                'per_page': pagination.per_page,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
+            'data': [item.to_dict() for item in page.items],
+            'pagination': page.to_dict()
         })
+    except ValidationError:
+        raise
     except Exception as e:
         # Log the error e
-        print(f"Error fetching food items: {e}") # Basic logging
+        logger.exception('Error fetching food items: %s', e)
         return jsonify({'success': False, 'message': '获取食物列表失败'}), 500
 
 @admin_api_bp.route('/food-items', methods=['POST'])
@@ -105,6 +139,8 @@ def create_food_item():
         )
         db.session.add(new_item)
         db.session.commit()
+        food_index.invalidate()
+        log_admin_action('create_food_item', f"创建食物条目 {new_item.name}")
         
         return jsonify({
             'success': True,
@@ -169,6 +205,8 @@ def update_food_item(item_id):
                  return jsonify({'success': False, 'message': 'is_recommended 必须是布尔值 (true/false)'}), 400
                             
         db.session.commit()
+        food_index.invalidate()
+        log_admin_action('update_food_item', f"更新食物条目 {item.name}")
         return jsonify({
             'success': True,
             'message': '食物条目更新成功',
@@ -192,6 +230,8 @@ def delete_food_item(item_id):
         item = FoodItem.query.get_or_404(item_id)
         db.session.delete(item)
         db.session.commit()
+        food_index.invalidate()
+        log_admin_action('delete_food_item', f"删除食物条目 {item.name}")
         return jsonify({
             'success': True,
             'message': '食物条目删除成功'
@@ -221,7 +261,7 @@ def get_food_categories():
             'data': category_list
         })
     except Exception as e:
-        print(f"Error fetching food categories: {e}") # Basic logging
+        logger.exception('Error fetching food categories: %s', e)
         return jsonify({'success': False, 'message': '获取食物类别列表失败'}), 500
 
 # --- User Management Endpoints ---
@@ -230,11 +270,14 @@ def get_food_categories():
 @jwt_required()
 @admin_required
 def get_users():
-    """获取用户列表 (支持分页, 搜索, 筛选, 排序)"""
+    """获取用户列表 (支持分页, 搜索, 筛选, 排序)
+    
+    分页参数见 pagination_args()：include_total=false 时不执行 COUNT，
+    传入 cursor 时使用游标分页。
+    """
     try:
         # Get query parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
+        args = pagination_args()
         search_term = request.args.get('search', None, type=str)
         role_filter = request.args.get('role', None, type=str)
         status_filter = request.args.get('status', None, type=str) # 'active', 'inactive' or None
@@ -244,8 +287,11 @@ def get_users():
         # Base query
         query = User.query
 
-        # Apply search filter (username or email, case-insensitive)
-        if search_term:
+        # Apply search filter (username or email): 全文索引子串匹配，索引不可用或搜索词过短时回退到 ILIKE
+        matches = search_index.match('users', search_term) if search_term else None
+        if matches is not None:
+            query = query.join(matches, matches.c.id == User.id)
+        elif search_term:
             search_pattern = f'%{search_term}%'
             query = query.filter(
                 db.or_(User.username.ilike(search_pattern), User.email.ilike(search_pattern))
@@ -262,31 +308,22 @@ def get_users():
             elif status_filter.lower() == 'inactive':
                 query = query.filter(User.is_active == False)
 
-        # Apply sorting
+        # Apply sorting and pagination (搜索且未指定排序时按相关度排序，仅支持页码分页)
         sort_column = getattr(User, sort_by, User.id) # Default to id if invalid column
-        if sort_order.lower() == 'desc':
-            query = query.order_by(desc(sort_column))
+        if matches is not None and 'sort_by' not in request.args and args.cursor is None:
+            page = paginate(query.order_by(matches.c.rank, User.id), args.page, args.per_page, args.include_total)
         else:
-            query = query.order_by(asc(sort_column))
-            
-        # Execute query with pagination
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        users = pagination.items
+            page = paginate_listing(query, args, User, sort_column, sort_order.lower() == 'desc')
 
         return jsonify({
             'success': True,
-            'data': [user.to_dict() for user in users],
-            'pagination': {
-                'total_items': pagination.total,
-                'total_pages': pagination.pages,
-                'current_page': pagination.page,
-                'per_page': pagination.per_page,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
+            'data': [user.to_dict() for user in page.items],
+            'pagination': page.to_dict()
         })
+    except ValidationError:
+        raise
     except Exception as e:
-        print(f"Error fetching users: {e}") # Basic logging
+        logger.exception('Error fetching users: %s', e)
         return jsonify({'success': False, 'message': '获取用户列表失败'}), 500
 
 @admin_api_bp.route('/users/<int:user_id>', methods=['PUT'])
@@ -309,6 +346,8 @@ def update_user(user_id):
         
     allowed_roles = ['user', 'admin']
     updated = False # Flag to track if any change was made
+    claims_changed = False # 角色或状态变化，令牌中的声明随之过期
+    before = dashboard_counters.user_state(user_to_update)
 
     try:
         # 更新角色
@@ -323,7 +362,7 @@ def update_user(user_id):
                  
             if user_to_update.role != new_role:
                 user_to_update.role = new_role
-                updated = True
+                updated = claims_changed = True
 
         # 更新状态 (is_active)
         if 'is_active' in data:
@@ -337,11 +376,17 @@ def update_user(user_id):
                  
             if user_to_update.is_active != new_status:
                 user_to_update.is_active = new_status
-                updated = True
+                updated = claims_changed = True
 
         # 如果有更新，则提交数据库
         if updated:
+            # 只有角色或状态变化才使旧令牌失效
+            if claims_changed:
+                user_to_update.revoke_tokens()
             db.session.commit()
+            invalidate_identity(user_id)
+            dashboard_counters.record_user_change(before, dashboard_counters.user_state(user_to_update))
+            log_admin_action('update_user', f"更新用户 {user_to_update.username} 的角色为 {user_to_update.role}，状态为 {'激活' if user_to_update.is_active else '禁用'}")
             return jsonify({
                 'success': True,
                 'message': '用户信息更新成功',
@@ -357,7 +402,7 @@ def update_user(user_id):
 
     except Exception as e:
         db.session.rollback()
-        print(f"Error updating user {user_id}: {e}") # Basic logging
+        logger.exception('Error updating user %s: %s', user_id, e)
         return jsonify({'success': False, 'message': f'更新用户信息失败: {str(e)}'}), 500
 
 @admin_api_bp.route('/users/<int:user_id>', methods=['DELETE'])
@@ -388,15 +433,22 @@ def delete_user(user_id):
     try:
         # 删除用户 (关联的 UserProfile 应该会因为 cascade delete 而被删除)
         # 注意：如果用户还有其他重要关联数据（不由cascade处理），可能需要在这里手动处理
+        before = dashboard_counters.user_state(user_to_delete)
+        # 每日汇总和预计算推荐没有 ORM 关系，需要手动删除
+        DailyUserMetric.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+        MealPlan.query.filter_by(user_id=user_id).delete(synchronize_session=False)
         db.session.delete(user_to_delete)
         db.session.commit()
+        invalidate_identity(user_id)
+        dashboard_counters.record_user_change(before, None)
+        log_admin_action('delete_user', f"删除用户 {user_to_delete.username}")
         return jsonify({
             'success': True,
             'message': '用户删除成功'
         })
     except Exception as e:
         db.session.rollback()
-        print(f"Error deleting user {user_id}: {e}") # Basic logging
+        logger.exception('Error deleting user %s: %s', user_id, e)
         # 检查是否是外键约束错误等特定数据库错误
         return jsonify({'success': False, 'message': f'删除用户失败: {str(e)}'}), 500
 
@@ -423,7 +475,7 @@ def get_user_details(user_id):
         })
         
     except Exception as e:
-        print(f"Error fetching details for user {user_id}: {e}")
+        logger.exception('Error fetching details for user %s: %s', user_id, e)
         return jsonify({'success': False, 'message': '获取用户详情失败'}), 500
 
 @admin_api_bp.route('/users', methods=['POST'])
@@ -471,6 +523,8 @@ def create_user():
         
         db.session.add(new_user)
         db.session.commit()
+        dashboard_counters.record_user_change(None, dashboard_counters.user_state(new_user))
+        log_admin_action('create_user', f"创建用户 {new_user.username}")
         
         return jsonify({
             'success': True,
@@ -478,11 +532,36 @@ def create_user():
             'data': new_user.to_dict() # Return newly created user data
         }), 201 # Created status code
 
+    except ServiceUnavailableError:
+        db.session.rollback()
+        raise
     except Exception as e:
         db.session.rollback()
-        print(f"Error creating user: {e}") # Basic logging
+        logger.exception('Error creating user: %s', e)
         return jsonify({'success': False, 'message': f'创建用户失败: {str(e)}'}), 500
 
+@admin_api_bp.route('/metrics/password-hashing', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_password_hashing_metrics():
+    """密码哈希线程池的并发、排队和耗时指标"""
+    return jsonify({'success': True, 'data': password_hasher.stats()})
+
+@admin_api_bp.route('/perf', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_perf_stats():
+    """各接口的 SQL 查询次数和耗时汇总，按 SQL 总耗时降序"""
+    return jsonify({'success': True, 'data': query_profiler.stats()})
+
+@admin_api_bp.route('/perf', methods=['DELETE'])
+@jwt_required()
+@admin_required
+def reset_perf_stats():
+    """清空 SQL 性能汇总，重新开始统计"""
+    query_profiler.reset()
+    return jsonify({'success': True, 'message': '性能统计已清空'})
+
 # --- 用户健康报告和建议接口 (更新后) ---
 
 @admin_api_bp.route('/users/<int:user_id>/report', methods=['GET'])
@@ -528,7 +607,7 @@ def get_user_health_report(user_id):
         })
         
     except Exception as e:
-        print(f"Error fetching health report for user {user_id}: {e}")
+        logger.exception('Error fetching health report for user %s: %s', user_id, e)
         return jsonify({'success': False, 'message': '获取健康报告失败'}), 500
 
 @admin_api_bp.route('/users/<int:user_id>/recommendation', methods=['POST'])
@@ -560,6 +639,7 @@ def submit_user_recommendation(user_id):
         # 更新最新报告的 admin_advice 字段
         latest_report.admin_advice = recommendation_text
         db.session.commit()
+        log_admin_action('submit_recommendation', f"更新用户 {user.username} 最新报告的建议")
 
         return jsonify({
             'success': True,
@@ -568,7 +648,7 @@ def submit_user_recommendation(user_id):
 
     except Exception as e:
         db.session.rollback()
-        print(f"Error submitting recommendation for user {user_id}'s report: {e}")
+        logger.exception("Error submitting recommendation for user %s's report: %s", user_id, e)
         return jsonify({'success': False, 'message': '提交建议失败'}), 500
 
 # --- 新增：管理员处理建议请求接口 ---
@@ -577,43 +657,34 @@ def submit_user_recommendation(user_id):
 @jwt_required()
 @admin_required
 def get_advice_requests():
-    """获取建议请求列表 (支持按状态筛选和分页)"""
+    """获取建议请求列表 (支持按状态筛选和分页)
+    
+    分页参数见 pagination_args()：include_total=false 时不执行 COUNT，
+    传入 cursor 时按 (requested_at, id) 游标分页。
+    """
     try:
         # 获取查询参数
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
+        args = pagination_args()
         # 筛选状态，默认为 'pending'，可以传 'all' 获取所有，或 'answered' 等
         status_filter = request.args.get('status', 'pending', type=str)
 
-        # 构建基础查询
-        query = AdviceRequest.query
-
-        # 应用状态筛选
-        if status_filter and status_filter.lower() != 'all':
-            query = query.filter(AdviceRequest.status == status_filter.lower())
-            
-        # 按请求时间排序 (最新优先)
-        query = query.order_by(AdviceRequest.requested_at.desc())
+        # 构建查询：申请者和回复者的用户名随请求一起查询，按请求时间排序 (最新优先)
+        status = status_filter.lower() if status_filter and status_filter.lower() != 'all' else None
+        query = AdviceService.listing_query(status)
         
         # 执行查询与分页
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        items = pagination.items
+        page = AdviceService.paginate(query, args)
         
         return jsonify({
             'success': True,
-            'data': [item.to_dict() for item in items],
-            'pagination': {
-                'total_items': pagination.total,
-                'total_pages': pagination.pages,
-                'current_page': pagination.page,
-                'per_page': pagination.per_page,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
+            'data': AdviceService.serialize(page.items),
+            'pagination': page.to_dict()
         })
 
+    except ValidationError:
+        raise
     except Exception as e:
-        print(f"获取建议请求列表时出错: {str(e)}")
+        logger.exception('获取建议请求列表时出错: %s', e)
         return jsonify({'success': False, 'message': '获取建议请求列表失败'}), 500
 
 @admin_api_bp.route('/advice-requests/<int:request_id>/respond', methods=['POST'])
@@ -646,6 +717,7 @@ def respond_to_advice_request(request_id):
         advice_request.responded_at = datetime.utcnow()
         
         db.session.commit()
+        log_admin_action('respond_advice_request', f"回复建议请求 {request_id}")
         
         return jsonify({
             'success': True,
@@ -655,7 +727,7 @@ def respond_to_advice_request(request_id):
 
     except Exception as e:
         db.session.rollback()
-        print(f"回复建议请求 {request_id} 时出错: {str(e)}")
+        logger.exception('回复建议请求 %s 时出错: %s', request_id, e)
         return jsonify({'success': False, 'message': '回复建议请求失败'}), 500
 
 # --- 其他管理员接口将在这里添加 ---
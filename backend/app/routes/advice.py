@@ -1,3 +1,4 @@
+import logging
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
@@ -7,6 +8,8 @@ from ..utils.errors import bad_request
 # 创建蓝图，定义 URL 前缀
 advice_bp = Blueprint('advice', __name__, url_prefix='/api/advice-requests')
 
+logger = logging.getLogger(__name__)
+
 @advice_bp.route('', methods=['POST'])
 @jwt_required() # 确保用户已登录
 def submit_advice_request():
@@ -40,7 +43,7 @@ def submit_advice_request():
 
     except Exception as e:
         db.session.rollback()
-        print(f"提交建议请求时发生错误 (User {user_id}): {str(e)}")
+        logger.exception('提交建议请求时发生错误 (User %s): %s', user_id, e)
         return jsonify({
             'success': False,
             'message': f'提交建议请求失败: {str(e)}'
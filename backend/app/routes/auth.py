@@ -1,17 +1,22 @@
+import logging
 from flask import Blueprint, jsonify, request, current_app
 from werkzeug.utils import secure_filename
 from ..services.auth import AuthService
-from ..utils.errors import ValidationError, AuthenticationError, bad_request, unauthorized, not_found
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
+from ..utils.errors import ValidationError, AuthenticationError, ServiceUnavailableError, bad_request, unauthorized, forbidden, not_found
+from flask_jwt_extended import jwt_required, get_jwt_identity
 import os
 import time
 import uuid
 from datetime import timedelta, datetime
 
-from ..models import db, User, ActivityLog, UserProfile
+from ..models import db, User, UserProfile
+from ..services.activity_log import activity_log
+from ..services.dashboard import dashboard_counters
 
 auth_bp = Blueprint('auth', __name__)
 
+logger = logging.getLogger(__name__)
+
 def allowed_file(filename):
     """检查文件类型是否允许"""
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
@@ -23,10 +28,10 @@ def register():
     data = request.get_json()
     
     # 添加详细日志
-    print(f"收到注册请求: {data}")
+    logger.debug('收到注册请求: %s', data.get('username') if isinstance(data, dict) else None)
     
     if not data:
-        print("注册失败: 无效的请求数据")
+        logger.warning('注册失败: 无效的请求数据')
         return bad_request('无效的请求数据')
     
     username = data.get('username')
@@ -34,13 +39,13 @@ def register():
     # email = data.get('email') # Removed email input
     
     if not username or not password:
-        print(f"注册失败: 用户名或密码为空 - username: {username}, password: {'已提供' if password else '未提供'}")
+        logger.warning('注册失败: 用户名或密码为空 - username: %s, password: %s', username, '已提供' if password else '未提供')
         return bad_request('用户名和密码不能为空')
     
     # 检查用户名是否已存在
     existing_user = User.query.filter_by(username=username).first()
     if existing_user:
-        print(f"注册失败: 用户名 {username} 已被使用")
+        logger.warning('注册失败: 用户名 %s 已被使用', username)
         return bad_request('用户名已被使用')
     
     # Removed email existence check
@@ -68,19 +73,19 @@ def register():
         try:
             user_profile.height = float(height_str) if height_str else None
         except (ValueError, TypeError):
-            print(f"Warning: Invalid height value '{height_str}' for user {username}, setting to None.")
+            logger.warning("Invalid height value '%s' for user %s, setting to None.", height_str, username)
             user_profile.height = None
             
         try:
             user_profile.weight = float(weight_str) if weight_str else None
         except (ValueError, TypeError):
-            print(f"Warning: Invalid weight value '{weight_str}' for user {username}, setting to None.")
+            logger.warning("Invalid weight value '%s' for user %s, setting to None.", weight_str, username)
             user_profile.weight = None
 
         try:
             user_profile.birth_date = datetime.strptime(birth_date_str, '%Y-%m-%d').date() if birth_date_str else None
         except (ValueError, TypeError):
-            print(f"Warning: Invalid birth_date format '{birth_date_str}' for user {username} (expected YYYY-MM-DD), setting to None.")
+            logger.warning("Invalid birth_date format '%s' for user %s (expected YYYY-MM-DD), setting to None.", birth_date_str, username)
             user_profile.birth_date = None
             
         user_profile.gender = gender
@@ -89,28 +94,23 @@ def register():
         db.session.add(user_profile)
         # --- END UserProfile Creation ---
 
-        # 第一次提交，保存 User 和 UserProfile，以便获取 user.id
-        # 注意：如果后续 ActivityLog 创建失败，这里可能需要调整事务处理
+        # 一次提交保存 User 和 UserProfile
         db.session.commit() 
+        dashboard_counters.record_user_change(None, dashboard_counters.user_state(user))
         
-        # 记录注册活动 (现在 user.id 是可用的)
-        log = ActivityLog(
+        # 记录注册活动（由活动日志缓冲区批量写入）
+        activity_log.record(
             user_id=user.id, 
             action='register',
             details={'ip': request.remote_addr},
             ip_address=request.remote_addr
         )
-        db.session.add(log)
-        db.session.commit() # 第二次提交，保存 ActivityLog
         
         # 生成JWT令牌
         expires = timedelta(hours=24)
-        access_token = create_access_token(
-            identity=user.id,
-            expires_delta=expires
-        )
+        access_token = AuthService.create_token(user, expires_delta=expires)
         
-        print(f"注册成功: 用户ID {user.id}, 用户名 {username}")
+        logger.info('注册成功: 用户ID %s, 用户名 %s', user.id, username)
         
         return jsonify({
             'success': True,
@@ -119,8 +119,12 @@ def register():
                 'user': user.to_dict() # Use the updated to_dict which excludes email
             }
         }), 201
+    except ServiceUnavailableError:
+        # 密码哈希线程池已满，交给错误处理器返回503
+        db.session.rollback()
+        raise
     except Exception as e:
-        print(f"注册异常: {str(e)}")
+        logger.exception('注册异常: %s', e)
         # 回滚数据库会话
         db.session.rollback()
         return jsonify({
@@ -152,27 +156,30 @@ def login():
         # 不再自动生成邮箱
         db.session.add(user)
         db.session.commit()
+        dashboard_counters.record_user_change(None, dashboard_counters.user_state(user))
     
     # 验证密码
     if not user or not user.verify_password(password):
         return unauthorized('用户名或密码错误')
     
-    # 记录登录活动
-    log = ActivityLog(
+    if not user.is_active:
+        return forbidden('账号已被禁用')
+    
+    # 哈希参数调整后，用本次验证通过的密码重新生成哈希；这是登录时唯一的写操作
+    if user.rehash_password_if_needed(password):
+        db.session.commit()
+    
+    # 记录登录活动（由活动日志缓冲区批量写入，登录请求本身不产生写事务）
+    activity_log.record(
         user_id=user.id,
         action='login',
         details={'ip': request.remote_addr},
         ip_address=request.remote_addr
     )
-    db.session.add(log)
-    db.session.commit()
     
     # 生成JWT令牌
     expires = timedelta(hours=24)
-    access_token = create_access_token(
-        identity=user.id,
-        expires_delta=expires
-    )
+    access_token = AuthService.create_token(user, expires_delta=expires)
     
     return jsonify({
         'success': True,
@@ -216,20 +223,13 @@ def change_user_password():
 
     db.session.commit() # Commit user password change
 
-    # 记录密码修改活动 (可选)
-    try:
-        log = ActivityLog(
-            user_id=user.id,
-            action='change_password',
-            details={'ip': request.remote_addr},
-            ip_address=request.remote_addr
-        )
-        db.session.add(log)
-        db.session.commit() # Commit activity log
-    except Exception as log_error:
-        print(f"Error logging password change for user {user_id}: {log_error}")
-        # Decide if failure to log should prevent success response
-        # db.session.rollback() # Optionally rollback if logging is critical
+    # 记录密码修改活动
+    activity_log.record(
+        user_id=user.id,
+        action='change_password',
+        details={'ip': request.remote_addr},
+        ip_address=request.remote_addr
+    )
 
     return jsonify({
         'success': True,
@@ -1,29 +1,217 @@
-from flask import Blueprint, request, jsonify
+import logging
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
+import csv
+import io
+import json
+from sqlalchemy import insert
 
-from ..models import db, Record
-from ..utils.errors import bad_request, not_found
+from ..models import db, Record, DailyUserMetric
+from ..services.metrics import DailyMetricsService
+from ..services.records import RecordService
+from ..services.recommendations import food_recommender
+from ..utils.errors import ValidationError, bad_request, not_found
+from ..utils.pagination import encode_cursor, decode_cursor, keyset_filter
 
 records_bp = Blueprint('records', __name__)
 
+logger = logging.getLogger(__name__)
+
+# 游标分页的默认/最大每页条数
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# 导出时每批从数据库读取的记录数
+EXPORT_BATCH_SIZE = 500
+EXPORT_CSV_FIELDS = [
+    'id', 'user_id', 'type', 'note', 'record_date', 'created_at',
+    'exercise_type', 'duration', 'intensity', 'mood_type',
+    'food_name', 'meal_time', 'feeling', 'status', 'weight_kg', 'bmi'
+]
+
+# 批量创建接口单次最多接收的记录数
+BATCH_MAX_RECORDS = 1000
+
 @records_bp.route('/all', methods=['GET'])
 @jwt_required()
 def get_all_records():
-    """获取所有记录"""
+    """获取所有记录
+    
+    传入 limit 或 cursor 参数时按 (created_at, id) 游标分页返回：
+    {'records': [...], 'next_cursor': str|None, 'has_more': bool}，
+    否则保持原有行为，直接返回记录数组。
+    """
     user_id = get_jwt_identity()
     days = request.args.get('days', 30, type=int)
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit', type=int)
     
     # 计算起始日期
     start_date = datetime.utcnow() - timedelta(days=days)
     
     # 查询记录
-    records = Record.query.filter(
+    query = Record.query.filter(
         Record.user_id == user_id,
         Record.created_at >= start_date
-    ).order_by(Record.created_at.desc()).all()
+    )
+    
+    if cursor is None and limit is None:
+        records = query.order_by(Record.created_at.desc()).all()
+        return jsonify([record.to_dict() for record in records])
+    
+    # 游标分页
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    if cursor:
+        query = query.filter(keyset_filter(
+            (Record.created_at, Record.id),
+            decode_cursor(cursor, datetime, int)
+        ))
+    
+    # 多取一条用于判断是否还有下一页
+    records = query.order_by(Record.created_at.desc(), Record.id.desc()).limit(limit + 1).all()
+    has_more = len(records) > limit
+    records = records[:limit]
+    
+    next_cursor = None
+    if has_more:
+        last = records[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    
+    return jsonify({
+        'records': [record.to_dict() for record in records],
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    })
+
+@records_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_records():
+    """流式导出当前用户的全部记录
+    
+    支持 format=ndjson（默认，每行一个JSON对象）或 format=csv，
+    可选 days 参数限制导出最近几天的记录。
+    记录通过服务端游标分批读取并逐行输出，内存占用与记录总数无关。
+    """
+    user_id = get_jwt_identity()
+    export_format = request.args.get('format', 'ndjson').lower()
+    days = request.args.get('days', type=int)
+    
+    if export_format not in ('ndjson', 'csv'):
+        return bad_request('不支持的导出格式，请使用 ndjson 或 csv')
+    
+    query = Record.query.filter(Record.user_id == user_id)
+    if days:
+        query = query.filter(Record.created_at >= datetime.utcnow() - timedelta(days=days))
+    query = query.order_by(Record.created_at.asc(), Record.id.asc()).yield_per(EXPORT_BATCH_SIZE)
+    
+    if export_format == 'csv':
+        generator = _export_csv_rows(query)
+        mimetype = 'text/csv'
+    else:
+        generator = (json.dumps(record.to_dict(), ensure_ascii=False) + '\n' for record in query)
+        mimetype = 'application/x-ndjson'
+    
+    filename = f"records_{user_id}_{datetime.utcnow().strftime('%Y%m%d')}.{export_format}"
+    return Response(
+        stream_with_context(generator),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+def _export_csv_rows(records):
+    """逐行生成CSV内容"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_FIELDS, extrasaction='ignore')
+    
+    writer.writeheader()
+    for record in records:
+        row = record.to_dict()
+        if row.get('status') is not None:
+            row['status'] = json.dumps(row['status'], ensure_ascii=False)
+        writer.writerow(row)
+        
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    
+    # 表头在没有记录时也要输出
+    if buffer.tell():
+        yield buffer.getvalue()
+
+# 记录中除 user_id/created_at 外可由请求设置的列
+RECORD_VALUE_FIELDS = (
+    'type', 'note', 'record_date',
+    'exercise_type', 'duration', 'intensity',
+    'mood_type',
+    'food_name', 'meal_time',
+    'feeling', 'status', 'weight_kg', 'bmi'
+)
+
+def _build_record_values(data):
+    """校验单条记录的请求数据并转换为列值
+    
+    Args:
+        data: 请求中的记录数据
+        
+    Returns:
+        dict: 包含 RECORD_VALUE_FIELDS 中所有列的字典
+        
+    Raises:
+        ValidationError: 数据无效
+    """
+    if not data or not isinstance(data, dict):
+        raise ValidationError('无效的请求数据')
+    
+    record_type = data.get('type')
+    if not record_type:
+        raise ValidationError('记录类型不能为空')
+    
+    # 验证记录类型
+    valid_types = ['exercise', 'mood', 'health', 'food', 'body_status']
+    if record_type not in valid_types:
+        raise ValidationError('无效的记录类型')
+    
+    # 处理记录日期
+    record_date = data.get('record_date')
+    if record_date:
+        try:
+            # 将字符串转换为日期对象
+            record_date = datetime.strptime(record_date, '%Y-%m-%d')
+        except (ValueError, TypeError):
+            logger.warning('无效的日期格式: %s，使用当前时间', record_date)
+            record_date = datetime.utcnow()
+    else:
+        record_date = datetime.utcnow()
+    
+    values = dict.fromkeys(RECORD_VALUE_FIELDS)
+    values.update(type=record_type, note=data.get('note', ''), record_date=record_date)
+    
+    # 根据记录类型设置特定字段
+    if record_type == 'exercise':
+        values['exercise_type'] = data.get('exercise_type')
+        values['duration'] = data.get('duration')
+        values['intensity'] = data.get('intensity')
+    elif record_type == 'mood':
+        values['mood_type'] = data.get('mood_type')
+    elif record_type == 'health':
+        values['feeling'] = data.get('feeling')
+        # 健康状态以列表形式存入 status JSON 字段
+        values['status'] = data.get('status') or None
+    elif record_type == 'food':
+        values['food_name'] = data.get('food_name')
+        values['meal_time'] = data.get('meal_time')
+    elif record_type == 'body_status':
+        # 无效的体重/BMI值直接忽略
+        for field in ('weight_kg', 'bmi'):
+            raw = data.get(field)
+            if raw is not None:
+                try:
+                    values[field] = float(raw)
+                except (ValueError, TypeError):
+                    logger.warning('无效的%s值: %s', field, raw)
     
-    return jsonify([record.to_dict() for record in records])
+    return values
 
 @records_bp.route('', methods=['POST', 'OPTIONS'])
 @jwt_required(optional=True)
@@ -32,116 +220,119 @@ def create_record():
     try:
         # 处理OPTIONS请求
         if request.method == 'OPTIONS':
-            print("收到OPTIONS预检请求，直接返回200")
+            logger.debug('收到OPTIONS预检请求，直接返回200')
             # 不添加额外的CORS头部，让Flask-CORS处理
             return '', 200
             
         # 验证JWT
         user_id = get_jwt_identity()
         if not user_id:
-            print("未提供有效的JWT令牌")
+            logger.debug('未提供有效的JWT令牌')
             return jsonify({
                 'success': False,
                 'message': '未授权，请先登录'
             }), 401
             
-        print(f"创建记录API被调用，用户ID: {user_id}")
+        logger.debug('创建记录API被调用，用户ID: %s', user_id)
         
         # 获取请求数据
         data = request.get_json()
-        print(f"请求数据: {data}")
-        
-        if not data:
-            print("无效的请求数据")
-            return bad_request('无效的请求数据')
-        
-        record_type = data.get('type')
-        if not record_type:
-            print("记录类型不能为空")
-            return bad_request('记录类型不能为空')
+        logger.debug('请求数据: %s', data)
         
-        # 验证记录类型
-        valid_types = ['exercise', 'mood', 'health', 'food', 'body_status']
-        if record_type not in valid_types:
-            print(f"无效的记录类型: {record_type}")
-            return bad_request('无效的记录类型')
-        
-        # 处理记录日期
-        record_date = data.get('record_date')
-        if record_date:
-            try:
-                # 将字符串转换为日期对象
-                record_date = datetime.strptime(record_date, '%Y-%m-%d')
-                print(f"使用用户选择的日期: {record_date}")
-            except ValueError:
-                print(f"无效的日期格式: {record_date}")
-                record_date = datetime.utcnow()
-                print(f"使用当前时间作为记录日期: {record_date}")
-        else:
-            record_date = datetime.utcnow()
-            print(f"未提供日期，使用当前时间: {record_date}")
+        try:
+            values = _build_record_values(data)
+        except ValidationError as e:
+            logger.warning('记录数据无效: %s', e)
+            return bad_request(str(e))
         
         # 创建记录
-        record = Record(
-            user_id=user_id,
-            type=record_type,
-            note=data.get('note', ''),
-            record_date=record_date
-        )
+        record = Record(user_id=user_id, **values)
         
-        # 根据记录类型设置特定字段
-        if record_type == 'exercise':
-            record.exercise_type = data.get('exercise_type')
-            record.duration = data.get('duration')
-            record.intensity = data.get('intensity')
-        elif record_type == 'mood':
-            record.mood_type = data.get('mood_type')
-        elif record_type == 'health':
-            record.feeling = data.get('feeling')
-            # 处理健康状态
-            statuses = data.get('status', [])
-            if statuses:
-                for status in statuses:
-                    health_status = HealthStatus(status=status)
-                    record.health_statuses.append(health_status)
-        elif record_type == 'food':
-            record.food_name = data.get('food_name')
-            record.meal_time = data.get('meal_time')
-        elif record_type == 'body_status':
-            weight = data.get('weight_kg')
-            bmi_val = data.get('bmi')
-            if weight is not None:
-                try:
-                    record.weight_kg = float(weight)
-                except (ValueError, TypeError):
-                    print(f"无效的体重值: {weight}")
-                    # 可以选择返回错误或忽略无效值，这里选择忽略
-                    pass
-            if bmi_val is not None:
-                try:
-                    record.bmi = float(bmi_val)
-                except (ValueError, TypeError):
-                    print(f"无效的BMI值: {bmi_val}")
-                    # 选择忽略无效值
-                    pass
-        
-        # 保存记录
+        # 保存记录，并在同一事务中刷新当天汇总
         db.session.add(record)
+        DailyMetricsService.refresh(user_id, [record.record_date])
         db.session.commit()
+        if record.type == 'food':
+            food_recommender.record_foods(user_id, [(record.food_name, record.meal_time, record.record_date)])
         
         # 返回成功响应
         result = record.to_dict()
-        print(f"记录创建成功: {result}")
+        logger.debug('记录创建成功: %s', result)
         return jsonify(result), 201
     except Exception as e:
         # 回滚事务
         db.session.rollback()
-        print(f"创建记录时发生错误: {str(e)}")
+        logger.exception('创建记录时发生错误: %s', e)
         return jsonify({
             'success': False,
             'message': f'创建记录失败: {str(e)}'
         }), 500
 
+@records_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def create_records_batch():
+    """批量创建记录
+    
+    请求体为记录数组（或 {'records': [...]}），每条记录使用与单条创建相同的校验规则。
+    所有有效记录在一个事务中批量插入，无效记录不会阻止其他记录写入。
+    
+    Returns:
+        每条记录的处理结果 [{'index', 'success', 'id' | 'message'}]
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json()
+    
+    items = data.get('records') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return bad_request('请求体必须是非空的记录数组')
+    if len(items) > BATCH_MAX_RECORDS:
+        return bad_request(f'单次最多提交 {BATCH_MAX_RECORDS} 条记录')
+    
+    results = [None] * len(items)
+    rows = []
+    row_indexes = []
+    now = datetime.utcnow()
+    
+    for index, item in enumerate(items):
+        try:
+            values = _build_record_values(item)
+        except ValidationError as e:
+            results[index] = {'index': index, 'success': False, 'message': str(e)}
+            continue
+        values.update(user_id=user_id, created_at=now)
+        rows.append(values)
+        row_indexes.append(index)
+    
+    try:
+        if rows:
+            # 一次 executemany 插入所有有效记录，并按参数顺序取回主键
+            inserted_ids = db.session.scalars(
+                insert(Record).returning(Record.id, sort_by_parameter_order=True),
+                rows
+            ).all()
+            DailyMetricsService.refresh(user_id, {row['record_date'] for row in rows})
+            db.session.commit()
+            food_recommender.record_foods(user_id, [
+                (row['food_name'], row['meal_time'], row['record_date']) for row in rows if row['type'] == 'food'
+            ])
+            for index, record_id in zip(row_indexes, inserted_ids):
+                results[index] = {'index': index, 'success': True, 'id': record_id}
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('批量创建记录时发生错误: %s', e)
+        return jsonify({
+            'success': False,
+            'message': f'批量创建记录失败: {str(e)}'
+        }), 500
+    
+    created = len(rows)
+    return jsonify({
+        'success': created > 0,
+        'created': created,
+        'failed': len(items) - created,
+        'results': results
+    }), 201 if created else 400
+
 @records_bp.route('/<int:record_id>', methods=['PUT'])
 @jwt_required()
 def update_record(record_id):
@@ -190,7 +381,10 @@ def update_record(record_id):
         if 'meal_time' in data:
             record.meal_time = data['meal_time']
     
+    DailyMetricsService.refresh(user_id, [record.record_date])
     db.session.commit()
+    if record.type == 'food':
+        food_recommender.invalidate(user_id)
     
     return jsonify(record.to_dict())
 
@@ -205,8 +399,13 @@ def delete_record(record_id):
     if not record:
         return not_found('记录不存在或无权限')
     
+    record_date = record.record_date
+    is_food = record.type == 'food'
     db.session.delete(record)
+    DailyMetricsService.refresh(user_id, [record_date])
     db.session.commit()
+    if is_food:
+        food_recommender.invalidate(user_id)
     
     return jsonify({'message': '记录已删除'})
 
@@ -217,64 +416,7 @@ def get_records_stats():
     user_id = get_jwt_identity()
     days = request.args.get('days', 30, type=int)
     
-    # 计算起始日期
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    # 查询各类型记录数量
-    exercise_count = Record.query.filter(
-        Record.user_id == user_id,
-        Record.type == 'exercise',
-        Record.created_at >= start_date
-    ).count()
-    
-    mood_count = Record.query.filter(
-        Record.user_id == user_id,
-        Record.type == 'mood',
-        Record.created_at >= start_date
-    ).count()
-    
-    health_count = Record.query.filter(
-        Record.user_id == user_id,
-        Record.type == 'health',
-        Record.created_at >= start_date
-    ).count()
-    
-    food_count = Record.query.filter(
-        Record.user_id == user_id,
-        Record.type == 'food',
-        Record.created_at >= start_date
-    ).count()
-    
-    # 计算总运动时间
-    exercise_records = Record.query.filter(
-        Record.user_id == user_id,
-        Record.type == 'exercise',
-        Record.created_at >= start_date
-    ).all()
-    
-    total_exercise_minutes = sum(record.duration or 0 for record in exercise_records)
-    
-    # 获取最近的心情记录
-    recent_moods = Record.query.filter(
-        Record.user_id == user_id,
-        Record.type == 'mood',
-        Record.created_at >= start_date
-    ).order_by(Record.created_at.desc()).limit(5).all()
-    
-    return jsonify({
-        'total_records': exercise_count + mood_count + health_count + food_count,
-        'exercise_records': exercise_count,
-        'mood_records': mood_count,
-        'health_records': health_count,
-        'food_records': food_count,
-        'exercise_minutes': total_exercise_minutes,
-        'recent_moods': [
-            {
-                'type': mood.mood_type,
-                'date': mood.created_at.isoformat()
-            } for mood in recent_moods
-        ]
-    })
+    return jsonify(RecordService.get_records_stats(user_id, days))
 
 @records_bp.route('/trends', methods=['GET'])
 @jwt_required()
@@ -313,47 +455,35 @@ def get_trends_data():
         if not requested_types:
             return bad_request(f'不支持的数据类型。支持的类型: {valid_data_types}')
 
-        # 构建基础查询
-        query = Record.query.filter(Record.user_id == user_id)
-        # 应用日期范围 (注意要查询 record_date 而不是 created_at)
-        # 将 date 对象转换为 datetime 对象以便与 DateTime 列比较
+        # 从每日汇总表读取，每天一行，不再逐条扫描原始记录
+        query = DailyUserMetric.query.filter(
+            DailyUserMetric.user_id == user_id,
+            DailyUserMetric.day <= end_date
+        )
         if start_date:
-             query = query.filter(Record.record_date >= datetime.combine(start_date, datetime.min.time()))
-        # 包含结束日期当天的数据
-        query = query.filter(Record.record_date < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
-
-        # 按日期排序，方便处理
-        query = query.order_by(Record.record_date.asc())
-        
-        # 查询数据库
-        records = query.all()
+            query = query.filter(DailyUserMetric.day >= start_date)
+        metrics = query.order_by(DailyUserMetric.day.asc()).all()
         
         # 处理结果
         trends_data = {dtype: [] for dtype in requested_types} # 初始化结果字典
         
-        for record in records:
-            record_date_str = record.record_date.strftime('%Y-%m-%d')
+        for metric in metrics:
+            day_str = metric.day.strftime('%Y-%m-%d')
             
-            if 'weight_kg' in requested_types and record.type == 'body_status' and record.weight_kg is not None:
-                trends_data['weight_kg'].append({'date': record_date_str, 'value': record.weight_kg})
+            if 'weight_kg' in requested_types and metric.weight_kg is not None:
+                trends_data['weight_kg'].append({'date': day_str, 'value': metric.weight_kg})
                 
-            if 'bmi' in requested_types and record.type == 'body_status' and record.bmi is not None:
-                trends_data['bmi'].append({'date': record_date_str, 'value': record.bmi})
+            if 'bmi' in requested_types and metric.bmi is not None:
+                trends_data['bmi'].append({'date': day_str, 'value': metric.bmi})
                 
-            if 'mood' in requested_types and record.type == 'mood' and record.mood_type:
-                 # 对于心情，我们直接返回值（字符串），前端可以进行映射或展示
-                trends_data['mood'].append({'date': record_date_str, 'value': record.mood_type})
+            if 'mood' in requested_types and metric.mood_counts:
+                # 对于心情，直接返回值（字符串），每条心情记录对应一个点
+                for mood_type, count in sorted(metric.mood_counts.items()):
+                    trends_data['mood'].extend({'date': day_str, 'value': mood_type} for _ in range(count))
                 
-            if 'exercise_duration' in requested_types and record.type == 'exercise' and record.duration is not None:
-                trends_data['exercise_duration'].append({'date': record_date_str, 'value': record.duration})
-
-        # 对于 exercise_duration，我们可能需要按天聚合（如果一天有多条记录）
-        if 'exercise_duration' in trends_data:
-            from collections import defaultdict
-            aggregated_duration = defaultdict(float)
-            for item in trends_data['exercise_duration']:
-                aggregated_duration[item['date']] += item['value']
-            trends_data['exercise_duration'] = [{'date': d, 'value': v} for d, v in sorted(aggregated_duration.items())]
+            if 'exercise_duration' in requested_types and metric.exercise_count:
+                # 汇总表中已按天累计运动时长
+                trends_data['exercise_duration'].append({'date': day_str, 'value': float(metric.exercise_minutes)})
             
         return jsonify({
             'success': True,
@@ -361,9 +491,7 @@ def get_trends_data():
         })
         
     except Exception as e:
-        print(f"获取趋势数据时发生错误: {str(e)}")
-        import traceback
-        traceback.print_exc() # 打印详细错误堆栈
+        logger.exception('获取趋势数据时发生错误: %s', e)
         return jsonify({
             'success': False,
             'message': f'获取趋势数据失败: {str(e)}'
@@ -1,10 +1,11 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..services.reports import ReportService
+from ..services.report_jobs import report_job_runner
 from ..utils.errors import ValidationError, bad_request, not_found
 from datetime import datetime, timedelta
 
-from ..models import db, Report, Record, Recommendation
+from ..models import db, Report, ReportRequest, Record, Recommendation
 
 reports_bp = Blueprint('reports', __name__)
 
@@ -56,6 +57,73 @@ def get_trends():
             'message': f'获取趋势分析失败: {str(e)}'
         }), 500 
 
+@reports_bp.route('/requests', methods=['POST'])
+@jwt_required()
+def create_report_request():
+    """提交报告生成申请，报告由后台工作线程异步生成"""
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        report_request = ReportRequest(
+            user_id=user_id,
+            user_notes=data.get('user_notes')
+        )
+        db.session.add(report_request)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'提交报告申请失败: {str(e)}'
+        }), 500
+    
+    report_job_runner.enqueue(report_request.id)
+    
+    return jsonify({
+        'success': True,
+        'message': '报告申请已提交，正在后台生成',
+        'data': report_request.to_dict()
+    }), 202
+
+@reports_bp.route('/requests', methods=['GET'])
+@jwt_required()
+def get_report_requests():
+    """获取当前用户的报告申请列表"""
+    user_id = get_jwt_identity()
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    
+    report_requests = ReportRequest.query.filter_by(user_id=user_id)\
+                                         .order_by(ReportRequest.requested_at.desc())\
+                                         .limit(limit).all()
+    
+    return jsonify({
+        'success': True,
+        'data': [r.to_dict() for r in report_requests]
+    })
+
+@reports_bp.route('/requests/<int:request_id>', methods=['GET'])
+@jwt_required()
+def get_report_request(request_id):
+    """查询报告申请的处理状态，完成后附带报告内容"""
+    user_id = get_jwt_identity()
+    
+    report_request = ReportRequest.query.filter_by(id=request_id, user_id=user_id).first()
+    if not report_request:
+        return not_found('报告申请不存在')
+    
+    result = report_request.to_dict()
+    if report_request.status == 'completed' and report_request.report:
+        result['report'] = report_request.report.to_dict()
+    elif report_request.status == 'pending':
+        # 确保进程重启后仍有工作线程处理遗留的申请
+        report_job_runner.start()
+    
+    return jsonify({
+        'success': True,
+        'data': result
+    })
+
 # 新增的报告管理API
 
 # 删除 / 路由
@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import db, ManualSuggestion, User
 from ..utils.errors import ValidationError, bad_request, not_found
+from ..utils.identity import current_is_admin
 
 suggestions_bp = Blueprint('suggestions', __name__)
 
@@ -12,11 +13,7 @@ def get_manual_suggestions(user_id):
     current_user_id = get_jwt_identity()
     
     # 检查当前用户是否是管理员或者正在请求自己的建议
-    user = User.query.get(current_user_id)
-    if not user:
-        return not_found('用户不存在')
-    
-    if not user.is_admin and current_user_id != user_id:
+    if not current_is_admin() and current_user_id != user_id:
         return jsonify({
             'success': False,
             'message': '无权访问其他用户的建议'
@@ -39,8 +36,7 @@ def add_manual_suggestion(user_id):
     admin_id = get_jwt_identity()
     
     # 检查当前用户是否是管理员
-    admin = User.query.get(admin_id)
-    if not admin or not admin.is_admin:
+    if not current_is_admin():
         return jsonify({
             'success': False,
             'message': '只有管理员可以添加手动建议'
@@ -84,8 +80,7 @@ def delete_manual_suggestion(suggestion_id):
     current_user_id = get_jwt_identity()
     
     # 检查当前用户是否是管理员
-    user = User.query.get(current_user_id)
-    if not user or not user.is_admin:
+    if not current_is_admin():
         return jsonify({
             'success': False,
             'message': '只有管理员可以删除建议'
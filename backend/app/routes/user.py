@@ -1,18 +1,22 @@
 from flask import Blueprint, jsonify, request, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 import os
 import uuid
-import random
-import traceback
+import logging
 
-from ..models import db, User, UserProfile, Announcement, FoodItem
+from ..models import db, User, UserProfile, Announcement
+from ..services.meal_plans import MealPlanService
+from ..services.recommendations import food_index, food_recommender
 from ..utils.errors import ValidationError, AuthenticationError, bad_request, not_found
 
 user_bp = Blueprint('user', __name__)
 
+logger = logging.getLogger(__name__)
+
 @user_bp.route('/info', methods=['GET'])
 @jwt_required()
 def get_user_info():
@@ -63,7 +67,7 @@ def update_user_info(user_id):
         
         # 更新密码
         if 'password' in data and data['password']:
-            user.password_hash = generate_password_hash(data['password'])
+            user.password = data['password']
             
         db.session.commit()
         
@@ -135,7 +139,7 @@ def update_profile():
     
     # 更新密码
     if 'password' in data and data['password']:
-        user.password_hash = generate_password_hash(data['password'])
+        user.password = data['password']
     
     # 更新或创建用户个人资料
     profile_data = data.get('profile', {})
@@ -262,110 +266,49 @@ def upload_avatar():
         'avatar_url': avatar_url
     })
 
+def _optional_identity():
+    """可选登录的接口使用：返回有效令牌中的用户ID，没有令牌或令牌无效、过期时返回 None
+
+    与 jwt_required(optional=True) 不同，前端残留的过期令牌不会导致 401。
+    """
+    try:
+        verify_jwt_in_request(optional=True)
+    except (JWTExtendedException, PyJWTError) as e:
+        logger.debug('忽略无效令牌，按未登录处理: %s', e)
+        return None
+    return get_jwt_identity()
+
 @user_bp.route('/recommendations/food', methods=['GET'])
 def get_food_recommendations():
-    """获取模拟的早、中、晚餐食物推荐组合"""
+    """获取早、中、晚餐食物推荐组合
+    
+    已登录用户优先返回当天预计算的推荐（flask precompute-meal-plans，只需一次按
+    唯一索引的查询，其中的食物已不在推荐索引中时忽略）；没有预计算结果时根据其饮食记录统计加权选择（见
+    FoodRecommender）。未登录或令牌无效时按类别随机选择。候选食物来自进程内的推荐索引。
+    """
     try:
-        # 查询所有被标记为推荐的食物项
-        all_recommended_items = FoodItem.query.filter_by(is_recommended=True).all()
+        snapshot = food_index.snapshot()
 
-        if not all_recommended_items:
+        if not snapshot.categories:
             # 如果没有任何推荐项，返回空列表
             return jsonify({'success': True, 'data': [], 'message': '数据库中没有可推荐的食物项'}) 
 
-        # 按类别分组
-        items_by_category = {}
-        for item in all_recommended_items:
-            if hasattr(item, 'category') and item.category and hasattr(item, 'to_dict'): 
-                if item.category not in items_by_category:
-                    items_by_category[item.category] = []
-                items_by_category[item.category].append(item.name) # 只存储名字即可
-            else:
-                print(f"警告: 食物项 ID {item.id if hasattr(item, 'id') else '未知'} 缺少 category 或 to_dict 方法，已跳过。")
-        
-        recommendations_list = []
-        
-        # --- 生成早餐推荐 ---
-        breakfast_content = []
-        # 尝试选主食 (假设类别为 'staple', 'bread', 'cereal')
-        staple_cats = ['staple', 'bread', 'cereal']
-        available_staples = [name for cat in staple_cats if cat in items_by_category for name in items_by_category[cat]]
-        if available_staples:
-            breakfast_content.append(random.choice(available_staples))
-        # 尝试选蛋白质/饮品 (假设类别为 'protein', 'dairy', 'drink')
-        protein_cats = ['protein', 'dairy', 'drink', 'egg']
-        available_proteins = [name for cat in protein_cats if cat in items_by_category for name in items_by_category[cat]]
-        if available_proteins:
-            breakfast_content.append(random.choice(available_proteins))
-        # 尝试选水果 (假设类别为 'fruit')
-        if 'fruit' in items_by_category and items_by_category['fruit']:
-             breakfast_content.append(random.choice(items_by_category['fruit']))
-             
-        if breakfast_content:
-            recommendations_list.append({
-                'meal_time': '早餐',
-                'content': '、'.join(breakfast_content),
-                'calories': None # 暂时不计算卡路里
-            })
-
-        # --- 生成午餐推荐 ---
-        lunch_content = []
-        # 尝试选主食
-        if available_staples: # Use staples found earlier
-            lunch_content.append(random.choice(available_staples))
-        # 尝试选主菜 (假设类别 'meat', 'fish', 'poultry', 'protein')
-        main_dish_cats = ['meat', 'fish', 'poultry', 'protein', 'tofu']
-        available_main = [name for cat in main_dish_cats if cat in items_by_category for name in items_by_category[cat]]
-        if available_main:
-            lunch_content.append(random.choice(available_main))
-        # 尝试选蔬菜 (假设类别 'vegetable')
-        if 'vegetable' in items_by_category and items_by_category['vegetable']:
-            lunch_content.append(random.choice(items_by_category['vegetable']))
-        
-        if lunch_content:
-             recommendations_list.append({
-                'meal_time': '午餐',
-                'content': '、'.join(lunch_content),
-                'calories': None
-            })
-
-        # --- 生成晚餐推荐 ---
-        dinner_content = []
-        # 晚餐类似午餐，但可以尝试选择不同的项目
-        if available_staples:
-            dinner_content.append(random.choice(available_staples))
-        if available_main:
-            dinner_content.append(random.choice(available_main))
-        if 'vegetable' in items_by_category and items_by_category['vegetable']:
-            dinner_content.append(random.choice(items_by_category['vegetable']))
-        # 可以加个汤 (假设类别 'soup')
-        if 'soup' in items_by_category and items_by_category['soup']:
-             dinner_content.append(random.choice(items_by_category['soup']))
-             
-        if dinner_content:
-             recommendations_list.append({
-                'meal_time': '晚餐',
-                'content': '、'.join(dinner_content),
-                'calories': None
-            })
-
-        # --- 在 return 之前加入这行 print ---
-        # print(">>> DEBUG: Preparing to return:", {'success': True, 'data': recommendations_list})
+        user_id = _optional_identity()
+        plan = MealPlanService.get_plan(user_id, snapshot=snapshot) if user_id else None
+        if plan is not None:
+            recommendations_list, personalized = plan.meals(), plan.personalized
+        elif user_id:
+            recommendations_list, personalized = food_recommender.recommend_meals(user_id, snapshot)
+        else:
+            recommendations_list, personalized = food_index.recommend_meals(snapshot), False
 
-        response_object = jsonify({  # 将 jsonify 结果赋给变量
+        return jsonify({
             'success': True,
-            'data': recommendations_list
+            'data': recommendations_list,
+            'personalized': personalized
         })
-        
-        # 打印 Flask Response 对象的详细信息
-        print(">>> DEBUG: Flask Response Headers:", response_object.headers)
-        print(">>> DEBUG: Flask Response Status Code:", response_object.status_code)
-        print(">>> DEBUG: Flask Response Data (raw bytes):", response_object.get_data()) 
-        
-        return response_object # 返回创建的 Response 对象
 
     except Exception as e:
-        print(f"获取食物推荐时出错: {e}")
-        traceback.print_exc()
+        logger.exception('获取食物推荐时出错: %s', e)
         # Return a generic error message
         return jsonify({'success': False, 'message': '获取食物推荐时发生内部错误'}), 500 
\ No newline at end of file
@@ -0,0 +1,226 @@
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import contains_eager
+
+from ..models import db, ActivityLog, User
+from ..utils.pagination import keyset_paginate
+
+logger = logging.getLogger(__name__)
+
+# 缓冲的日志中写入 activity_logs 表的字段（其余为内部状态，例如重试次数）
+ENTRY_COLUMNS = ('user_id', 'action', 'details', 'ip_address', 'created_at')
+
+
+class ActivityLogWriter:
+    """缓冲、批量写入的活动日志
+
+    record() 只把日志放入内存环形缓冲区并立即返回，后台线程在缓冲区达到
+    ACTIVITY_LOG_BATCH_SIZE 条或距上次写入超过 ACTIVITY_LOG_FLUSH_INTERVAL
+    毫秒时，用一次批量 INSERT 写入数据库。登录等高频请求因此不再产生写事务。
+
+    批量写入失败时改为逐条写入：违反约束等无法写入的单条日志直接丢弃（计入
+    rejected），不会卡住后面的日志；数据库不可用（OperationalError）时剩余
+    日志放回缓冲区，每条最多尝试 ACTIVITY_LOG_MAX_ATTEMPTS 次。
+
+    缓冲区容量为 ACTIVITY_LOG_BUFFER_SIZE，数据库持续不可用导致缓冲区写满时
+    丢弃最早的日志（计入 dropped），不会阻塞请求。进程退出时会写入剩余日志。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._buffer = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stats = {'written': 0, 'dropped': 0, 'rejected': 0, 'flushes': 0, 'failures': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ACTIVITY_LOG_BATCH_SIZE', 200)
+        app.config.setdefault('ACTIVITY_LOG_FLUSH_INTERVAL', 500)  # 毫秒
+        app.config.setdefault('ACTIVITY_LOG_BUFFER_SIZE', 10000)
+        app.config.setdefault('ACTIVITY_LOG_MAX_ATTEMPTS', 3)
+        self.app = app
+        self._buffer = deque(maxlen=app.config['ACTIVITY_LOG_BUFFER_SIZE'])
+        app.extensions['activity_log'] = self
+        atexit.register(self.flush)
+
+    def record(self, user_id, action, details=None, ip_address=None):
+        """写入一条活动日志（异步）
+
+        Args:
+            user_id: 执行操作的用户ID
+            action: 操作类型，例如 login、update_user_role
+            details: 详细信息（可JSON序列化）
+            ip_address: 客户端IP
+        """
+        entry = {
+            'user_id': user_id,
+            'action': action,
+            'details': details,
+            'ip_address': ip_address,
+            'created_at': datetime.utcnow(),
+            'attempts': 0
+        }
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._stats['dropped'] += 1
+            self._buffer.append(entry)
+            pending = len(self._buffer)
+        self._ensure_started()
+        if pending >= self.app.config['ACTIVITY_LOG_BATCH_SIZE']:
+            self._wakeup.set()
+
+    def flush(self):
+        """立即把缓冲区中的日志写入数据库
+
+        Returns:
+            int: 写入的条数
+        """
+        if self.app is None:
+            return 0
+        with self._lock:
+            entries = list(self._buffer)
+            self._buffer.clear()
+        if not entries:
+            return 0
+
+        with self.app.app_context():
+            try:
+                self._insert(entries)
+                written, rejected, retry = len(entries), 0, []
+            except Exception as e:
+                db.session.rollback()
+                logger.warning('批量写入 %d 条活动日志失败，改为逐条写入: %s', len(entries), e)
+                written, rejected, retry = self._insert_each(entries)
+
+        max_attempts = self.app.config['ACTIVITY_LOG_MAX_ATTEMPTS']
+        for entry in retry:
+            entry['attempts'] += 1
+        expired = sum(1 for entry in retry if entry['attempts'] >= max_attempts)
+        retry = [entry for entry in retry if entry['attempts'] < max_attempts]
+
+        with self._lock:
+            self._stats['written'] += written
+            self._stats['rejected'] += rejected
+            self._stats['dropped'] += expired
+            if written:
+                self._stats['flushes'] += 1
+            if rejected or expired or retry:
+                self._stats['failures'] += 1
+            if retry:
+                # 放回缓冲区头部，下次重试；超出容量的部分按最早优先丢弃
+                room = self._buffer.maxlen - len(self._buffer)
+                self._stats['dropped'] += max(0, len(retry) - room)
+                self._buffer.extendleft(reversed(retry[-room:] if room else []))
+        return written
+
+    def _insert(self, entries):
+        db.session.execute(insert(ActivityLog), [
+            {column: entry[column] for column in ENTRY_COLUMNS} for entry in entries
+        ])
+        db.session.commit()
+
+    def _insert_each(self, entries):
+        """逐条写入，跳过无法写入的日志
+
+        Returns:
+            tuple: (写入条数, 丢弃条数, 因数据库不可用需要重试的日志列表)
+        """
+        written = rejected = 0
+        for position, entry in enumerate(entries):
+            try:
+                self._insert([entry])
+                written += 1
+            except OperationalError as e:
+                db.session.rollback()
+                logger.error('数据库不可用，%d 条活动日志稍后重试: %s', len(entries) - position, e)
+                return written, rejected, entries[position:]
+            except Exception as e:
+                db.session.rollback()
+                rejected += 1
+                logger.error('丢弃无法写入的活动日志 %s: %s', entry['action'], e)
+        return written, rejected, []
+
+    def stats(self):
+        """缓冲区指标"""
+        with self._lock:
+            return dict(self._stats, pending=len(self._buffer) if self._buffer is not None else 0)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._flush_loop, name='activity-log-writer', daemon=True)
+            self._thread.start()
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait(self.app.config['ACTIVITY_LOG_FLUSH_INTERVAL'] / 1000)
+            self._wakeup.clear()
+            self.flush()
+
+
+class ActivityLogService:
+    @staticmethod
+    def build_query(action=None, user_id=None, start=None, end=None):
+        """活动日志查询，用户名通过关联查询一并加载，序列化时不会逐行查询 users
+
+        Args:
+            action: 按操作类型筛选
+            user_id: 按用户筛选
+            start: 开始时间（包含）
+            end: 结束时间（不包含）
+
+        Returns:
+            Query: 未排序的查询
+        """
+        query = ActivityLog.query.outerjoin(ActivityLog.user).options(
+            contains_eager(ActivityLog.user).load_only(User.id, User.username)
+        )
+        if action:
+            query = query.filter(ActivityLog.action == action)
+        if user_id is not None:
+            query = query.filter(ActivityLog.user_id == user_id)
+        if start is not None:
+            query = query.filter(ActivityLog.created_at >= start)
+        if end is not None:
+            query = query.filter(ActivityLog.created_at < end)
+        return query
+
+    @staticmethod
+    def ordered(query):
+        """按 (created_at, id) 倒序，与 ix_activity_logs_created_id 一致"""
+        return query.order_by(ActivityLog.created_at.desc(), ActivityLog.id.desc())
+
+    @staticmethod
+    def list_after(query, cursor=None, limit=20):
+        """游标分页
+
+        Args:
+            query: build_query 返回的查询
+            cursor: 上一页返回的 next_cursor
+            limit: 每页条数
+
+        Returns:
+            tuple: (日志列表, next_cursor, has_more)
+        """
+        page = keyset_paginate(query, (ActivityLog.created_at, ActivityLog.id), cursor, limit)
+        return page.items, page.next_cursor, page.has_next
+
+    @staticmethod
+    def recent(limit=10):
+        """最近的活动日志"""
+        return ActivityLogService.ordered(ActivityLogService.build_query()).limit(limit).all()
+
+
+activity_log = ActivityLogWriter()
@@ -0,0 +1,57 @@
+from sqlalchemy.orm import aliased
+
+from ..models import db, AdviceRequest, User
+from ..utils.pagination import paginate, keyset_paginate
+
+
+class AdviceService:
+    @staticmethod
+    def listing_query(status=None):
+        """建议请求列表查询
+
+        users 表以两个别名分别关联申请者和回复者，用户名随请求一起查询，
+        序列化时不需要再访问 requester/responder 关联。
+
+        Args:
+            status: 按状态筛选，None 表示全部
+
+        Returns:
+            Query: 结果行为 (AdviceRequest, 申请者用户名, 回复者用户名)，按申请时间倒序
+        """
+        requester = aliased(User, name='requester')
+        responder = aliased(User, name='responder')
+
+        query = db.session.query(
+            AdviceRequest,
+            requester.username.label('requester_username'),
+            responder.username.label('responder_username')
+        ).outerjoin(requester, AdviceRequest.user_id == requester.id) \
+         .outerjoin(responder, AdviceRequest.admin_id == responder.id)
+
+        if status:
+            query = query.filter(AdviceRequest.status == status)
+        return query.order_by(AdviceRequest.requested_at.desc(), AdviceRequest.id.desc())
+
+    @staticmethod
+    def paginate(query, args):
+        """按 pagination_args() 的参数分页 listing_query 的结果
+
+        传入 cursor 时按 (requested_at, id) 倒序游标分页，否则按页码分页。
+
+        Returns:
+            Page
+        """
+        if args.cursor is None:
+            return paginate(query, args.page, args.per_page, args.include_total)
+        return keyset_paginate(
+            query, (AdviceRequest.requested_at, AdviceRequest.id), args.cursor, args.per_page,
+            key=lambda row: (row[0].requested_at, row[0].id), include_total=args.include_total
+        )
+
+    @staticmethod
+    def serialize(rows):
+        """序列化 listing_query 的结果行"""
+        return [
+            advice_request.to_dict_with_usernames(requester_username, responder_username)
+            for advice_request, requester_username, responder_username in rows
+        ]
@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+
+from flask import request, has_request_context
+from flask_jwt_extended import get_jwt_identity
+
+from ..models import db, ActivityLog
+
+
+class AuditEntry:
+    """audit() 产生的日志条目，代码块内可以补充 details"""
+
+    def __init__(self, action, details=None):
+        self.action = action
+        self.details = details
+
+
+@contextmanager
+def audit(action, details=None, user_id=None):
+    """在同一个事务中执行修改并记录活动日志
+
+    代码块正常结束时，把 ActivityLog 加入当前会话并提交一次，修改与日志要么
+    都写入、要么都不写入；代码块抛出异常时回滚并继续抛出。
+
+    用法::
+
+        with audit('update_setting') as entry:
+            setting.value = data['value']
+            entry.details = f"更新系统设置 {setting.key}"
+
+    Args:
+        action: 操作类型
+        details: 详细信息，也可以在代码块内通过 entry.details 设置
+        user_id: 执行操作的用户ID，默认取当前令牌的用户
+    """
+    entry = AuditEntry(action, details)
+    try:
+        yield entry
+        db.session.add(ActivityLog(
+            user_id=user_id if user_id is not None else get_jwt_identity(),
+            action=entry.action,
+            details=entry.details,
+            ip_address=request.remote_addr if has_request_context() else None
+        ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
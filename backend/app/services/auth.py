@@ -4,6 +4,7 @@ from flask import current_app
 from flask_jwt_extended import create_access_token, decode_token
 from ..models import db, User
 from ..utils.errors import ValidationError, AuthenticationError
+from ..utils.identity import token_claims
 
 class AuthService:
     @staticmethod
@@ -21,12 +22,26 @@ class AuthService:
                 raise AuthenticationError("账号已被禁用")
             
             # 使用flask_jwt_extended生成令牌
-            token = create_access_token(identity=user.id)
+            token = AuthService.create_token(user)
             
             return user, token
         except (AuthenticationError, Exception) as e:
             raise AuthenticationError(str(e))
     
+    @staticmethod
+    def create_token(user, expires_delta=None):
+        """为用户签发访问令牌，令牌中携带角色和令牌版本声明
+
+        Args:
+            user: User 对象
+            expires_delta: 有效期，默认使用 JWT_ACCESS_TOKEN_EXPIRES
+
+        Returns:
+            str: 访问令牌
+        """
+        kwargs = {'expires_delta': expires_delta} if expires_delta is not None else {}
+        return create_access_token(identity=user.id, additional_claims=token_claims(user), **kwargs)
+    
     @staticmethod
     def get_user_by_token(token):
         """通过令牌获取用户信息"""
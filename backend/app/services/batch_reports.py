@@ -0,0 +1,195 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import attrgetter
+
+from flask import Flask
+from sqlalchemy import insert
+
+from ..models import db, User, Record, Report
+from .reports import ReportService
+
+# 批量生成报告时每次从游标读取的行数
+BATCH_FETCH_SIZE = 2000
+
+# 报告计算需要的记录列，只取这些列以减少传输和对象构造开销
+REPORT_RECORD_COLUMNS = (
+    Record.user_id,
+    Record.type,
+    Record.record_date,
+    Record.weight_kg,
+    Record.duration,
+    Record.mood_type
+)
+
+# 工作进程内使用的精简应用，只初始化数据库
+_worker_app = None
+
+
+def _init_worker(database_uri):
+    """进程池初始化函数：为工作进程创建独立的数据库连接"""
+    global _worker_app
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    _worker_app = app
+
+
+def _run_shard(shard, start_date, end_date, days):
+    """在工作进程中计算一个分片的报告数据"""
+    with _worker_app.app_context():
+        try:
+            return BatchReportService.build_shard(shard, start_date, end_date, days)
+        finally:
+            db.session.remove()
+
+
+class BatchReportService:
+    @staticmethod
+    def shard_user_ids(shard_size):
+        """按用户ID把所有启用的用户切分为连续区间
+
+        Args:
+            shard_size: 每个分片的用户数
+
+        Returns:
+            list: [(起始用户ID, 结束用户ID)]，两端都包含
+        """
+        user_ids = [row[0] for row in db.session.query(User.id).filter(
+            User.is_active.is_(True)
+        ).order_by(User.id.asc()).all()]
+        return [
+            (chunk[0], chunk[-1])
+            for chunk in (user_ids[i:i + shard_size] for i in range(0, len(user_ids), shard_size))
+        ]
+
+    @staticmethod
+    def build_shard(shard, start_date, end_date, days):
+        """用一次范围查询计算一个分片内所有启用用户的报告数据
+
+        记录按 (user_id, record_date) 排序流式读取（命中 ix_records_user_record_date），
+        逐个用户交给 ReportService.build_report_data，内存中只保留当前用户的记录。
+
+        Args:
+            shard: (起始用户ID, 结束用户ID)
+            start_date: 开始时间
+            end_date: 结束时间（不包含）
+            days: 分析的天数
+
+        Returns:
+            dict: {'reports': [(user_id, report_data)], 'records': 读取的记录数}
+        """
+        first_id, last_id = shard
+        rows = db.session.query(*REPORT_RECORD_COLUMNS).join(User, User.id == Record.user_id).filter(
+            User.is_active.is_(True),
+            Record.user_id >= first_id,
+            Record.user_id <= last_id,
+            Record.record_date >= start_date,
+            Record.record_date < end_date
+        ).order_by(Record.user_id.asc(), Record.record_date.asc()).yield_per(BATCH_FETCH_SIZE)
+
+        reports = []
+        record_count = 0
+        for user_id, user_rows in groupby(rows, key=attrgetter('user_id')):
+            user_rows = list(user_rows)
+            record_count += len(user_rows)
+            reports.append((user_id, ReportService.build_report_data(user_rows, days)))
+
+        return {'reports': reports, 'records': record_count}
+
+    @staticmethod
+    def save_reports(reports, published_at):
+        """批量写入报告并提交
+
+        批量报告没有关联申请和管理员（request_id、admin_id 都为空）。同一天（UTC）
+        已经有批量报告的用户跳过，重复执行或重试不会产生重复报告；已有报告上
+        管理员填写的建议也不会被覆盖。
+
+        Args:
+            reports: [(user_id, report_data)]，按 user_id 升序
+            published_at: 报告的发布时间
+
+        Returns:
+            int: 写入的报告数
+        """
+        if not reports:
+            return 0
+        day_start = published_at.replace(hour=0, minute=0, second=0, microsecond=0)
+        existing = {row[0] for row in db.session.query(Report.user_id).filter(
+            Report.user_id >= reports[0][0],
+            Report.user_id <= reports[-1][0],
+            Report.request_id.is_(None),
+            Report.admin_id.is_(None),
+            Report.published_at >= day_start,
+            Report.published_at < day_start + timedelta(days=1)
+        )}
+        rows = [
+            {'user_id': user_id, 'report_data': report_data, 'published_at': published_at}
+            for user_id, report_data in reports if user_id not in existing
+        ]
+        if rows:
+            db.session.execute(insert(Report), rows)
+        db.session.commit()
+        return len(rows)
+
+    @staticmethod
+    def run(days=30, shard_size=1000, workers=None, dry_run=False, progress=None):
+        """为全部启用的用户批量生成报告（时间范围内没有记录、或当天已有批量报告的用户跳过）
+
+        各分片在进程池中并行计算，报告由主进程按分片批量写入，
+        避免多个进程同时写库（SQLite 只允许单写者）。
+
+        Args:
+            days: 分析的天数
+            shard_size: 每个分片的用户数
+            workers: 工作进程数，None 表示 CPU 核数，1 表示在当前进程内执行
+            dry_run: 只计算不写入
+            progress: 可选回调，每完成一个分片调用一次 progress(完成分片数, 总分片数)
+
+        Returns:
+            dict: 运行统计
+        """
+        started = time.perf_counter()
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days)
+        user_count = db.session.query(User.id).filter(User.is_active.is_(True)).count()
+        shards = BatchReportService.shard_user_ids(shard_size)
+
+        if workers == 1 or len(shards) <= 1:
+            results = (BatchReportService.build_shard(shard, start_date, end_date, days) for shard in shards)
+            stats = BatchReportService._collect(results, len(shards), end_date, dry_run, progress)
+        else:
+            database_uri = db.engine.url.render_as_string(hide_password=False)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(database_uri,)) as executor:
+                futures = [
+                    executor.submit(_run_shard, shard, start_date, end_date, days)
+                    for shard in shards
+                ]
+                results = (future.result() for future in as_completed(futures))
+                stats = BatchReportService._collect(results, len(shards), end_date, dry_run, progress)
+
+        elapsed = time.perf_counter() - started
+        stats['users'] = user_count
+        stats['seconds'] = round(elapsed, 2)
+        stats['users_per_second'] = round(user_count / elapsed, 1) if elapsed else None
+        stats['records_per_second'] = round(stats['records'] / elapsed, 1) if elapsed else None
+        return stats
+
+    @staticmethod
+    def _collect(results, shard_count, published_at, dry_run, progress):
+        """汇总各分片结果并写入报告"""
+        stats = {'shards': shard_count, 'records': 0, 'reports': 0, 'skipped': 0}
+        for done, result in enumerate(results, start=1):
+            stats['records'] += result['records']
+            if dry_run:
+                stats['reports'] += len(result['reports'])
+            else:
+                saved = BatchReportService.save_reports(result['reports'], published_at)
+                stats['reports'] += saved
+                stats['skipped'] += len(result['reports']) - saved
+            if progress:
+                progress(done, shard_count)
+        return stats
@@ -0,0 +1,124 @@
+import threading
+import time
+
+from sqlalchemy import func, case
+
+from ..models import db, User, Announcement
+
+
+class DashboardCounters:
+    """管理员仪表板计数器
+
+    用户总数/启用数/管理员数和启用公告数保存在内存中，由用户和公告的修改接口
+    在提交后增量更新；每隔 DASHBOARD_RECONCILE_INTERVAL 秒读取时用一次聚合查询
+    重新校准，纠正其他进程或绕过接口的修改造成的偏差。最近用户、最近日志等
+    列表按 DASHBOARD_CACHE_TTL 秒缓存。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._counts = None
+        self._reconciled_at = 0
+        self._cache = {}  # {key: (过期时间, 值)}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DASHBOARD_RECONCILE_INTERVAL', 300)  # 秒
+        app.config.setdefault('DASHBOARD_CACHE_TTL', 5)  # 秒
+        self.app = app
+        app.extensions['dashboard_counters'] = self
+
+    def counts(self):
+        """返回当前计数，必要时先校准"""
+        interval = self.app.config['DASHBOARD_RECONCILE_INTERVAL']
+        with self._lock:
+            if self._counts is not None and time.monotonic() - self._reconciled_at < interval:
+                return dict(self._counts)
+        return self.reconcile()
+
+    def reconcile(self):
+        """用聚合查询重新计算全部计数
+
+        Returns:
+            dict: 校准后的计数
+        """
+        total_users, active_users, admin_users = db.session.query(
+            func.count(User.id),
+            func.coalesce(func.sum(case((User.is_active.is_(True), 1), else_=0)), 0),
+            func.coalesce(func.sum(case((User.role == 'admin', 1), else_=0)), 0)
+        ).one()
+        active_announcements = db.session.query(func.count(Announcement.id)).filter(
+            Announcement.is_active.is_(True)
+        ).scalar()
+
+        counts = {
+            'total_users': total_users,
+            'active_users': active_users,
+            'admin_users': admin_users,
+            'active_announcements': active_announcements
+        }
+        with self._lock:
+            self._counts = counts
+            self._reconciled_at = time.monotonic()
+        return dict(counts)
+
+    @staticmethod
+    def user_state(user):
+        """用户在计数中的状态 (是否启用, 是否管理员)，修改前记录，提交后与新状态比较"""
+        return bool(user.is_active), user.role == 'admin'
+
+    def record_user_change(self, before, after):
+        """用户创建、修改或删除提交后更新计数
+
+        Args:
+            before: 修改前的 user_state()，新建用户时为 None
+            after: 修改后的 user_state()，删除用户时为 None
+        """
+        deltas = {'total_users': 0, 'active_users': 0, 'admin_users': 0}
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None:
+                continue
+            is_active, is_admin = state
+            deltas['total_users'] += sign
+            deltas['active_users'] += sign if is_active else 0
+            deltas['admin_users'] += sign if is_admin else 0
+        self._apply(deltas)
+        self.invalidate('recent_users')
+
+    def record_announcement_change(self, was_active, is_active):
+        """公告创建、修改或删除提交后更新计数
+
+        Args:
+            was_active: 修改前是否启用，新建时为 False
+            is_active: 修改后是否启用，删除时为 False
+        """
+        self._apply({'active_announcements': int(bool(is_active)) - int(bool(was_active))})
+
+    def cached(self, key, loader):
+        """按 DASHBOARD_CACHE_TTL 缓存 loader() 的结果"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = loader()
+        with self._lock:
+            self._cache[key] = (now + self.app.config['DASHBOARD_CACHE_TTL'], value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def _apply(self, deltas):
+        with self._lock:
+            # 尚未加载时无需维护，第一次读取会直接查询
+            if self._counts is None:
+                return
+            for name, delta in deltas.items():
+                self._counts[name] += delta
+
+
+dashboard_counters = DashboardCounters()
@@ -0,0 +1,244 @@
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import insert
+
+from ..models import db, User, Record, MealPlan
+from .recommendations import (
+    food_index, CATEGORY_GROUPS, MEAL_PLAN, GAP_GROUPS, GAP_WINDOW_DAYS, GAP_MIN_DAYS, GAP_BONUS,
+    FREQUENCY_WEIGHT, RECENT_PENALTY_DAYS, RECENT_PENALTY, MIN_WEIGHT
+)
+
+# 保留最近多少天的预计算推荐，更早的在每次生成时删除
+MEAL_PLAN_RETENTION_DAYS = 7
+
+# 批量生成时每次从游标读取的记录行数
+BATCH_FETCH_SIZE = 2000
+
+# 推荐食物目录：names 为食物名称数组，index 为 {名称: 列号}，
+# group_columns 为 {类别组: 列号数组}，gap_membership 为 [食物, GAP_GROUPS] 布尔矩阵
+Catalogue = namedtuple('Catalogue', ['names', 'index', 'group_columns', 'gap_membership'])
+
+MEAL_KEYS = tuple(meal_key for meal_key, _, _ in MEAL_PLAN)
+
+
+class MealPlanService:
+    @staticmethod
+    def build_catalogue(snapshot):
+        """把推荐索引快照整理成按列编号的食物目录"""
+        names = sorted(snapshot.category_of)
+        index = {name: column for column, name in enumerate(names)}
+        group_columns = {
+            group: np.array([index[name] for name in members], dtype=np.int64)
+            for group, members in snapshot.groups.items()
+        }
+        gap_membership = np.array([
+            [snapshot.category_of[name] in CATEGORY_GROUPS[group] for group in GAP_GROUPS]
+            for name in names
+        ], dtype=bool).reshape(len(names), len(GAP_GROUPS))
+        return Catalogue(np.array(names, dtype=object), index, group_columns, gap_membership)
+
+    @staticmethod
+    def batch_weights(user_ids, catalogue, day, window_days):
+        """计算一批用户 day 当天每餐每种食物的推荐权重
+
+        一次范围查询读取这批用户最近 window_days 天的饮食记录，整理成
+        [用户, 食物] 的频次、按餐次频次、距今天数矩阵，按与
+        UserFoodProfile.score() 相同的规则（频次加分、类别缺口加分、最近吃过
+        降权；批量生成时不计同餐共同出现的加分）算出权重。
+
+        Args:
+            user_ids: 按升序排列的用户ID
+            catalogue: build_catalogue 返回的食物目录
+            day: 推荐适用的日期
+            window_days: 参考的饮食记录天数
+
+        Returns:
+            dict: {'weights': {餐次: [用户, 食物] 权重矩阵}, 'records': 读取的记录数,
+            'users_with_records': 窗口内有饮食记录的用户ID集合}
+        """
+        user_rows = {user_id: row for row, user_id in enumerate(user_ids)}
+        day_start = datetime.combine(day, datetime.min.time())
+        rows = db.session.query(Record.user_id, Record.food_name, Record.meal_time, Record.record_date).filter(
+            Record.user_id >= user_ids[0],
+            Record.user_id <= user_ids[-1],
+            Record.record_date >= day_start - timedelta(days=window_days),
+            Record.record_date < day_start,
+            Record.type == 'food'
+        ).yield_per(BATCH_FETCH_SIZE)
+
+        meal_rows = {meal_key: row for row, meal_key in enumerate(MEAL_KEYS)}
+        users, foods, meals, days_ago = [], [], [], []
+        record_count = 0
+        users_with_records = set()
+        for user_id, food_name, meal_time, record_date in rows:
+            record_count += 1
+            column = catalogue.index.get(food_name)
+            row = user_rows.get(user_id)
+            if row is None:
+                continue
+            users_with_records.add(user_id)
+            if column is None:
+                continue
+            users.append(row)
+            foods.append(column)
+            meals.append(meal_rows.get(meal_time, -1))
+            days_ago.append((day - record_date.date()).days)
+
+        user_count, food_count = len(user_ids), len(catalogue.names)
+        users = np.array(users, dtype=np.int64)
+        foods = np.array(foods, dtype=np.int64)
+        meals = np.array(meals, dtype=np.int64)
+        days_ago = np.array(days_ago, dtype=np.int64)
+
+        counts = np.zeros((user_count, food_count))
+        np.add.at(counts, (users, foods), 1)
+        meal_counts = np.zeros((len(MEAL_KEYS), user_count, food_count))
+        has_meal = meals >= 0
+        np.add.at(meal_counts, (meals[has_meal], users[has_meal], foods[has_meal]), 1)
+        last_eaten = np.full((user_count, food_count), np.inf)
+        np.minimum.at(last_eaten, (users, foods), days_ago)
+
+        # 类别缺口：最近 GAP_WINDOW_DAYS 天（距今 0 到 GAP_WINDOW_DAYS - 1 天）中吃到各类别组的天数
+        recent = days_ago < GAP_WINDOW_DAYS
+        presence = np.zeros((user_count, GAP_WINDOW_DAYS, len(GAP_GROUPS)), dtype=np.int64)
+        np.add.at(presence, (users[recent], days_ago[recent]), catalogue.gap_membership[foods[recent]])
+        gaps = (presence > 0).sum(axis=1) < GAP_MIN_DAYS
+        gap_foods = (gaps.astype(np.int64) @ catalogue.gap_membership.T.astype(np.int64)) > 0
+
+        base = 1.0 + FREQUENCY_WEIGHT * np.log1p(counts) + GAP_BONUS * gap_foods
+        penalty = np.clip(RECENT_PENALTY_DAYS - last_eaten, 0, RECENT_PENALTY_DAYS)
+        factor = 1 - RECENT_PENALTY * penalty / RECENT_PENALTY_DAYS
+
+        weights = {
+            meal_key: np.maximum((base + FREQUENCY_WEIGHT * np.log1p(meal_counts[meal_row])) * factor, MIN_WEIGHT)
+            for meal_row, meal_key in enumerate(MEAL_KEYS)
+        }
+        return {'weights': weights, 'records': record_count, 'users_with_records': users_with_records}
+
+    @staticmethod
+    def build_batch(user_ids, catalogue, day, window_days, rng):
+        """为一批用户计算 day 当天的三餐推荐
+
+        按 batch_weights() 的权重，对每个 (用户, 类别组) 做一次向量化的加权抽样。
+
+        Args:
+            user_ids: 按升序排列的用户ID
+            catalogue: build_catalogue 返回的食物目录
+            day: 推荐适用的日期
+            window_days: 参考的饮食记录天数
+            rng: numpy 随机数生成器
+
+        Returns:
+            dict: {'plans': [{user_id, day, breakfast, lunch, dinner, personalized}], 'records': 读取的记录数}；
+            窗口内没有饮食记录的用户 personalized 为 False（按类别随机并加类别缺口分）
+        """
+        batch = MealPlanService.batch_weights(user_ids, catalogue, day, window_days)
+        user_count = len(user_ids)
+
+        picks = {}
+        for meal_key, _, groups in MEAL_PLAN:
+            weights = batch['weights'][meal_key]
+            chosen = []
+            for group in groups:
+                columns = catalogue.group_columns[group]
+                if not len(columns):
+                    continue
+                cumulative = np.cumsum(weights[:, columns], axis=1)
+                targets = rng.random(user_count) * cumulative[:, -1]
+                picked = np.minimum((cumulative <= targets[:, None]).sum(axis=1), len(columns) - 1)
+                chosen.append(catalogue.names[columns[picked]])
+            picks[meal_key] = chosen
+
+        plans = []
+        for row, user_id in enumerate(user_ids):
+            plan = {'user_id': user_id, 'day': day, 'personalized': user_id in batch['users_with_records']}
+            for meal_key in MEAL_KEYS:
+                plan[meal_key] = '、'.join(names[row] for names in picks[meal_key]) or None
+            plans.append(plan)
+        return {'plans': plans, 'records': batch['records']}
+
+    @staticmethod
+    def save_plans(plans, day, generated_at):
+        """替换这批用户 day 当天的推荐并提交"""
+        if not plans:
+            return
+        user_ids = [plan['user_id'] for plan in plans]
+        MealPlan.query.filter(
+            MealPlan.day == day,
+            MealPlan.user_id >= user_ids[0],
+            MealPlan.user_id <= user_ids[-1]
+        ).delete(synchronize_session=False)
+        db.session.execute(insert(MealPlan), [dict(plan, generated_at=generated_at) for plan in plans])
+        db.session.commit()
+
+    @staticmethod
+    def run(day=None, batch_size=1000, seed=None, dry_run=False, progress=None):
+        """为所有启用的用户生成 day（默认明天）的三餐推荐
+
+        Args:
+            day: 推荐适用的日期
+            batch_size: 每批处理的用户数
+            seed: 随机种子，便于复现
+            dry_run: 只计算不写入
+            progress: 可选回调，每完成一批调用一次 progress(完成批数, 总批数)
+
+        Returns:
+            dict: 运行统计
+        """
+        started = time.perf_counter()
+        day = day or (datetime.utcnow().date() + timedelta(days=1))
+        generated_at = datetime.utcnow()
+        window_days = current_app.config['FOOD_PROFILE_WINDOW_DAYS']
+        rng = np.random.default_rng(seed)
+
+        catalogue = MealPlanService.build_catalogue(food_index.snapshot())
+        user_ids = [row[0] for row in db.session.query(User.id).filter(
+            User.is_active.is_(True)
+        ).order_by(User.id.asc()).all()]
+        batches = [user_ids[i:i + batch_size] for i in range(0, len(user_ids), batch_size)]
+
+        stats = {'day': day.isoformat(), 'users': len(user_ids), 'foods': len(catalogue.names),
+                 'batches': len(batches), 'records': 0, 'plans': 0}
+        if catalogue.names.size:
+            for done, batch in enumerate(batches, start=1):
+                result = MealPlanService.build_batch(batch, catalogue, day, window_days, rng)
+                stats['records'] += result['records']
+                stats['plans'] += len(result['plans'])
+                if not dry_run:
+                    MealPlanService.save_plans(result['plans'], day, generated_at)
+                if progress:
+                    progress(done, len(batches))
+
+        if not dry_run:
+            MealPlan.query.filter(
+                MealPlan.day < day - timedelta(days=MEAL_PLAN_RETENTION_DAYS)
+            ).delete(synchronize_session=False)
+            db.session.commit()
+
+        elapsed = time.perf_counter() - started
+        stats['seconds'] = round(elapsed, 2)
+        stats['users_per_second'] = round(len(user_ids) / elapsed, 1) if elapsed else None
+        return stats
+
+    @staticmethod
+    def get_plan(user_id, day=None, snapshot=None):
+        """用户 day（默认今天）的预计算推荐
+
+        Args:
+            user_id: 用户ID
+            day: 推荐适用的日期，默认今天
+            snapshot: 推荐索引快照；给出时，包含已改名、删除或取消推荐的食物的
+                推荐视为过期
+
+        Returns:
+            MealPlan: 没有可用的推荐时返回 None
+        """
+        day = day or datetime.utcnow().date()
+        plan = MealPlan.query.filter_by(user_id=user_id, day=day).first()
+        if plan is not None and snapshot is not None and not plan.foods() <= snapshot.category_of.keys():
+            return None
+        return plan
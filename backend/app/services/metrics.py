@@ -0,0 +1,197 @@
+from datetime import datetime, date, timedelta
+from sqlalchemy import func, insert, or_
+from ..models import db, Record, DailyUserMetric
+from .reports import HEALTH_SCORES
+
+# 汇总表中单独计数的餐次
+TRACKED_MEALS = ('breakfast', 'lunch', 'dinner', 'snack')
+
+# upsert 冲突时覆盖的列（即 _empty_values 的全部字段加 updated_at）
+UPSERT_COLUMNS = (
+    'exercise_count', 'exercise_minutes', 'food_count', 'mood_counts', 'weight_kg', 'bmi',
+    'feeling_score_sum', 'feeling_count', 'updated_at'
+) + tuple(f'{meal}_count' for meal in TRACKED_MEALS)
+
+class DailyMetricsService:
+    @staticmethod
+    def refresh(user_id, days=None):
+        """重新计算用户指定日期的每日汇总
+
+        只聚合受影响日期范围内的记录，调用方负责提交事务，
+        以便汇总与记录本身的修改处于同一事务中。
+
+        Args:
+            user_id: 用户ID
+            days: 需要刷新的日期（date 或 datetime）集合，None 表示重建该用户的全部汇总
+        """
+        if days is not None:
+            days = {d.date() if isinstance(d, datetime) else d for d in days if d is not None}
+            if not days:
+                return
+
+        filters = [Record.user_id == user_id, Record.record_date.isnot(None)]
+        if days is not None:
+            filters.append(Record.record_date >= datetime.combine(min(days), datetime.min.time()))
+            filters.append(Record.record_date < datetime.combine(max(days) + timedelta(days=1), datetime.min.time()))
+
+        computed = DailyMetricsService._aggregate(filters)
+        if days is not None:
+            computed = {day: values for day, values in computed.items() if day in days}
+
+        # 没有记录的日期删除汇总行，其余日期用 upsert 写入：两个请求同时为同一用户
+        # 同一天创建第一条记录时，"先查后插"会让后提交的一方违反唯一约束
+        stale = DailyUserMetric.query.filter(DailyUserMetric.user_id == user_id)
+        if days is not None:
+            stale = stale.filter(DailyUserMetric.day.in_(days))
+        if computed:
+            stale = stale.filter(DailyUserMetric.day.notin_(list(computed)))
+        stale.delete(synchronize_session=False)
+
+        if computed:
+            now = datetime.utcnow()
+            rows = [dict(values, user_id=user_id, day=day, updated_at=now) for day, values in computed.items()]
+            upsert = DailyMetricsService._upsert_statement()
+            if upsert is None:
+                # 不支持 upsert 的数据库：在同一事务中先删除这些日期的汇总行再插入
+                DailyUserMetric.query.filter(
+                    DailyUserMetric.user_id == user_id,
+                    DailyUserMetric.day.in_(list(computed))
+                ).delete(synchronize_session=False)
+                db.session.execute(insert(DailyUserMetric), rows)
+            else:
+                db.session.execute(upsert, rows)
+
+    @staticmethod
+    def rebuild_all():
+        """为所有有记录的用户重建每日汇总并提交
+
+        Returns:
+            int: 处理的用户数
+        """
+        user_ids = [row[0] for row in db.session.query(Record.user_id).distinct().all()]
+        for user_id in user_ids:
+            DailyMetricsService.refresh(user_id)
+            db.session.commit()
+        return len(user_ids)
+
+    @staticmethod
+    def _upsert_statement():
+        """按 (user_id, day) 插入或覆盖汇总行的 INSERT 语句
+
+        Returns:
+            Insert: SQLite / PostgreSQL / MySQL 的 upsert 语句，其他数据库返回 None
+        """
+        table = DailyUserMetric.__table__
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        elif dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == 'mysql':
+            from sqlalchemy.dialects.mysql import insert
+            stmt = insert(table)
+            return stmt.on_duplicate_key_update({
+                name: stmt.inserted[name] for name in UPSERT_COLUMNS
+            })
+        else:
+            return None
+
+        stmt = insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.day],
+            set_={name: stmt.excluded[name] for name in UPSERT_COLUMNS}
+        )
+
+    @staticmethod
+    def _aggregate(filters):
+        """按日期聚合记录
+
+        Args:
+            filters: 记录过滤条件
+
+        Returns:
+            dict: {date: DailyUserMetric 字段值}
+        """
+        day_col = func.date(Record.record_date).label('day')
+        rows = db.session.query(
+            day_col,
+            Record.type,
+            Record.meal_time,
+            Record.mood_type,
+            Record.feeling,
+            func.count(Record.id),
+            func.sum(Record.duration),
+            func.min(Record.created_at)
+        ).filter(*filters).group_by(
+            day_col, Record.type, Record.meal_time, Record.mood_type, Record.feeling
+        ).all()
+
+        computed = {}
+        moods = {}  # {date: {心情: [条数, 当天第一条的 created_at]}}
+        for day, record_type, meal_time, mood_type, feeling, count, duration, first_created in rows:
+            day = DailyMetricsService._to_date(day)
+            values = computed.setdefault(day, DailyMetricsService._empty_values())
+
+            if record_type == 'exercise':
+                values['exercise_count'] += count
+                values['exercise_minutes'] += duration or 0
+            elif record_type == 'food':
+                values['food_count'] += count
+                if meal_time in TRACKED_MEALS:
+                    values[f'{meal_time}_count'] += count
+            elif record_type == 'mood' and mood_type:
+                entry = moods.setdefault(day, {}).setdefault(mood_type.lower(), [0, first_created])
+                entry[0] += count
+                if first_created is not None and (entry[1] is None or first_created < entry[1]):
+                    entry[1] = first_created
+
+            if record_type in ('health', 'body_status') and feeling:
+                score = HEALTH_SCORES.get(feeling.lower())
+                if score is not None:
+                    values['feeling_score_sum'] += score * count
+                    values['feeling_count'] += count
+
+        # mood_counts 按每种心情当天第一条记录的时间排序，报告的心情趋势依赖这个顺序
+        for day, day_moods in moods.items():
+            ordered = sorted(day_moods.items(), key=lambda item: (item[1][1] is None, item[1][1] or datetime.min))
+            computed[day]['mood_counts'] = {mood: count for mood, (count, _) in ordered}
+
+        # 体重/BMI 取当天最后一条有效记录
+        body_rows = db.session.query(Record.record_date, Record.weight_kg, Record.bmi).filter(
+            *filters,
+            Record.type == 'body_status',
+            or_(Record.weight_kg.isnot(None), Record.bmi.isnot(None))
+        ).order_by(Record.record_date.asc(), Record.id.asc()).all()
+
+        for record_date, weight_kg, bmi in body_rows:
+            values = computed.setdefault(record_date.date(), DailyMetricsService._empty_values())
+            if weight_kg is not None:
+                values['weight_kg'] = weight_kg
+            if bmi is not None:
+                values['bmi'] = bmi
+
+        return computed
+
+    @staticmethod
+    def _empty_values():
+        values = {
+            'exercise_count': 0,
+            'exercise_minutes': 0,
+            'food_count': 0,
+            'mood_counts': {},
+            'weight_kg': None,
+            'bmi': None,
+            'feeling_score_sum': 0,
+            'feeling_count': 0
+        }
+        values.update({f'{meal}_count': 0 for meal in TRACKED_MEALS})
+        return values
+
+    @staticmethod
+    def _to_date(value):
+        """数据库 DATE() 的返回值在 SQLite 中是字符串，统一转为 date"""
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return date.fromisoformat(value)
@@ -0,0 +1,351 @@
+import math
+import random
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+from ..models import db, FoodItem, Record
+
+# 推荐时使用的类别组：{组名: 属于该组的食物类别}
+CATEGORY_GROUPS = {
+    'staple': ('staple', 'bread', 'cereal'),
+    'breakfast_protein': ('protein', 'dairy', 'drink', 'egg'),
+    'main': ('meat', 'fish', 'poultry', 'protein', 'tofu'),
+    'fruit': ('fruit',),
+    'vegetable': ('vegetable',),
+    'soup': ('soup',),
+}
+
+# 每餐依次从这些类别组中各选一项：(记录中的 meal_time, 显示名称, 类别组)
+MEAL_PLAN = (
+    ('breakfast', '早餐', ('staple', 'breakfast_protein', 'fruit')),
+    ('lunch', '午餐', ('staple', 'main', 'vegetable')),
+    ('dinner', '晚餐', ('staple', 'main', 'vegetable', 'soup')),
+)
+
+# 个性化推荐的打分参数
+FREQUENCY_WEIGHT = 1.0      # 常吃的食物加分，按 log(1 + 次数)
+COOCCURRENCE_WEIGHT = 0.5   # 与本餐已选食物经常在同一天出现的加分
+RECENT_PENALTY_DAYS = 3     # 最近几天内吃过的食物按比例降权，越近降得越多
+RECENT_PENALTY = 0.8        # 当天吃过的食物权重乘以 (1 - RECENT_PENALTY)
+GAP_WINDOW_DAYS = 7         # 统计类别缺口的天数
+GAP_MIN_DAYS = 3            # 窗口内吃到某类别的天数少于此值视为缺口
+GAP_GROUPS = ('staple', 'main', 'vegetable', 'fruit')
+GAP_BONUS = 1.5
+MIN_WEIGHT = 0.05           # 每个候选至少保留的权重，保证推荐有变化
+
+# 索引快照：categories 为 {类别: (id元组, 名称元组)}，groups 为 {组名: 名称元组}，
+# category_of 为 {名称: 类别}
+IndexSnapshot = namedtuple('IndexSnapshot', ['version', 'built_at', 'categories', 'groups', 'category_of'])
+
+
+class FoodRecommendationIndex:
+    """进程内的推荐食物索引
+
+    第一次使用时用一次查询加载全部 is_recommended 的食物，按类别和类别组
+    整理成不可变的元组；之后每次推荐只是在元组中随机取值，不访问数据库。
+
+    管理后台增删改食物后调用 invalidate()，版本号加一，下次使用时重建。
+    其他进程或脚本的修改不会通知到这里，索引超过 FOOD_INDEX_MAX_AGE 秒后
+    也会重建。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FOOD_INDEX_MAX_AGE', 300)  # 秒
+        self.app = app
+        app.extensions['food_index'] = self
+
+    def snapshot(self):
+        """当前的索引快照，不存在或已过期时重建（需要在应用上下文中调用）"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.built_at < self.app.config['FOOD_INDEX_MAX_AGE']:
+            return snapshot
+
+        with self._lock:
+            # 等待锁期间可能已由其他线程重建
+            snapshot = self._snapshot
+            if snapshot is None or time.monotonic() - snapshot.built_at >= self.app.config['FOOD_INDEX_MAX_AGE']:
+                snapshot = self._build(self._version)
+                self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self):
+        """食物条目变化后调用，下次使用时重建索引"""
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+
+    def recommend_meals(self, snapshot=None, rng=random):
+        """生成早、中、晚餐推荐组合
+
+        Args:
+            snapshot: 索引快照，默认使用当前快照
+            rng: 随机数生成器，需要提供 choice()
+
+        Returns:
+            list: [{'meal_time', 'content', 'calories'}]，没有可选食物的餐次会被省略
+        """
+        snapshot = snapshot or self.snapshot()
+        meals = []
+        for _, meal_time, groups in MEAL_PLAN:
+            content = [rng.choice(snapshot.groups[group]) for group in groups if snapshot.groups[group]]
+            if content:
+                meals.append({
+                    'meal_time': meal_time,
+                    'content': '、'.join(content),
+                    'calories': None  # 暂时不计算卡路里
+                })
+        return meals
+
+    @staticmethod
+    def _build(version):
+        rows = db.session.query(FoodItem.id, FoodItem.name, FoodItem.category).filter(
+            FoodItem.is_recommended.is_(True)
+        ).order_by(FoodItem.id).all()
+
+        by_category = {}
+        category_of = {}
+        for item_id, name, category in rows:
+            if not category:
+                continue
+            ids, names = by_category.setdefault(category, ([], []))
+            ids.append(item_id)
+            names.append(name)
+            category_of[name] = category
+
+        categories = {category: (tuple(ids), tuple(names)) for category, (ids, names) in by_category.items()}
+        groups = {
+            group: tuple(name for category in members if category in categories for name in categories[category][1])
+            for group, members in CATEGORY_GROUPS.items()
+        }
+        return IndexSnapshot(version, time.monotonic(), categories, groups, category_of)
+
+
+class UserFoodProfile:
+    """用户的饮食统计：食物频次（总体和按餐次）、最近食用日期、同一天共同出现的次数
+
+    由最近 FOOD_PROFILE_WINDOW_DAYS 天的饮食记录构建，之后新建的记录通过 add() 增量计入。
+    """
+
+    def __init__(self):
+        self.built_at = time.monotonic()
+        self.counts = Counter()
+        self.meal_counts = defaultdict(Counter)
+        self.last_eaten = {}
+        self.cooccurrence = defaultdict(Counter)
+        self.foods_by_day = defaultdict(set)
+
+    def add(self, food_name, meal_time=None, day=None):
+        """计入一条饮食记录
+
+        Args:
+            food_name: 食物名称
+            meal_time: 餐次，breakfast/lunch/dinner/snack
+            day: 记录日期（date）
+        """
+        if not food_name:
+            return
+        self.counts[food_name] += 1
+        if meal_time:
+            self.meal_counts[meal_time][food_name] += 1
+        if day is None:
+            return
+        if food_name not in self.last_eaten or self.last_eaten[food_name] < day:
+            self.last_eaten[food_name] = day
+
+        same_day = self.foods_by_day[day]
+        if food_name not in same_day:
+            for other in same_day:
+                self.cooccurrence[food_name][other] += 1
+                self.cooccurrence[other][food_name] += 1
+            same_day.add(food_name)
+
+    def gap_groups(self, category_of, today):
+        """最近 GAP_WINDOW_DAYS 天中吃到的天数少于 GAP_MIN_DAYS 的类别组"""
+        days_by_group = Counter()
+        for day, foods in self.foods_by_day.items():
+            if (today - day).days >= GAP_WINDOW_DAYS:
+                continue
+            categories = {category_of.get(food) for food in foods}
+            for group in GAP_GROUPS:
+                if categories.intersection(CATEGORY_GROUPS[group]):
+                    days_by_group[group] += 1
+        return {group for group in GAP_GROUPS if days_by_group[group] < GAP_MIN_DAYS}
+
+    def score(self, food_name, meal_time, chosen, gap_foods, today):
+        """候选食物的权重，越大越可能被选中
+
+        Args:
+            food_name: 候选食物
+            meal_time: 餐次，用于按餐次的频次
+            chosen: 本餐已选的食物
+            gap_foods: 属于缺口类别组的食物名称
+            today: 当前日期
+        """
+        score = 1.0
+        score += FREQUENCY_WEIGHT * (math.log1p(self.counts[food_name]) +
+                                     math.log1p(self.meal_counts[meal_time][food_name]))
+
+        if chosen and food_name in self.cooccurrence:
+            together = sum(self.cooccurrence[food_name][other] for other in chosen)
+            score += COOCCURRENCE_WEIGHT * math.log1p(together)
+
+        if food_name in gap_foods:
+            score += GAP_BONUS
+
+        last = self.last_eaten.get(food_name)
+        if last is not None:
+            days_ago = (today - last).days
+            if days_ago < RECENT_PENALTY_DAYS:
+                score *= 1 - RECENT_PENALTY * (RECENT_PENALTY_DAYS - max(days_ago, 0)) / RECENT_PENALTY_DAYS
+        return max(score, MIN_WEIGHT)
+
+
+class FoodRecommender:
+    """基于用户饮食记录的个性化推荐
+
+    每个用户的 UserFoodProfile 缓存在进程内（最多 FOOD_PROFILE_CACHE_SIZE 个，
+    最久未使用的先淘汰），超过 FOOD_PROFILE_REFRESH_INTERVAL 秒后从数据库重建；
+    新建的饮食记录通过 record_foods() 增量计入，修改或删除记录时调用
+    invalidate()。推荐时在推荐索引的候选中按 UserFoodProfile.score() 加权随机
+    选择：常吃的、与本餐其他食物常一起吃的食物加分，最近一周吃得少的类别
+    （缺口）加分，最近几天吃过的按比例降权。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._profiles = OrderedDict()  # {user_id: UserFoodProfile}
+        self._building = {}  # {user_id: [正在构建的线程数, 构建期间记录是否有变化]}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FOOD_PROFILE_REFRESH_INTERVAL', 3600)  # 秒
+        app.config.setdefault('FOOD_PROFILE_WINDOW_DAYS', 90)
+        app.config.setdefault('FOOD_PROFILE_CACHE_SIZE', 10000)
+        self.app = app
+        app.extensions['food_recommender'] = self
+
+    def profile(self, user_id):
+        """用户的饮食统计，缓存中没有或已过期时从数据库构建"""
+        with self._lock:
+            profile = self._profiles.get(user_id)
+            if profile is not None and time.monotonic() - profile.built_at < self.app.config['FOOD_PROFILE_REFRESH_INTERVAL']:
+                self._profiles.move_to_end(user_id)
+                return profile
+            building = self._building.setdefault(user_id, [0, False])
+            building[0] += 1
+
+        try:
+            profile = self._build(user_id)
+        finally:
+            with self._lock:
+                building[0] -= 1
+                changed = building[1]
+                if not building[0]:
+                    del self._building[user_id]
+
+        # 构建期间有 record_foods()/invalidate() 时，查询结果可能不包含这些修改，
+        # 只用于本次推荐，不写入缓存
+        if not changed:
+            with self._lock:
+                self._profiles[user_id] = profile
+                self._profiles.move_to_end(user_id)
+                while len(self._profiles) > self.app.config['FOOD_PROFILE_CACHE_SIZE']:
+                    self._profiles.popitem(last=False)
+        return profile
+
+    def record_foods(self, user_id, foods):
+        """把新建的饮食记录计入已缓存的统计（未缓存时下次使用会直接构建）
+
+        Args:
+            user_id: 用户ID
+            foods: [(food_name, meal_time, record_date)]
+        """
+        with self._lock:
+            self._mark_changed(user_id)
+            profile = self._profiles.get(user_id)
+            if profile is None:
+                return
+            for food_name, meal_time, record_date in foods:
+                profile.add(food_name, meal_time, record_date.date() if record_date else None)
+
+    def invalidate(self, user_id):
+        """饮食记录被修改或删除后调用"""
+        with self._lock:
+            self._mark_changed(user_id)
+            self._profiles.pop(user_id, None)
+
+    def _mark_changed(self, user_id):
+        """通知正在构建该用户统计的线程不要缓存结果（需持有锁）"""
+        building = self._building.get(user_id)
+        if building is not None:
+            building[1] = True
+
+    def recommend_meals(self, user_id, snapshot=None, rng=random):
+        """为用户生成早、中、晚餐推荐组合
+
+        Args:
+            user_id: 用户ID
+            snapshot: 推荐索引快照，默认使用当前快照
+            rng: 随机数生成器，需要提供 choices()
+
+        Returns:
+            tuple: (推荐列表, 是否个性化)；用户没有饮食记录时按类别随机推荐
+        """
+        snapshot = snapshot or food_index.snapshot()
+        profile = self.profile(user_id)
+        if not profile.counts:
+            return food_index.recommend_meals(snapshot, rng), False
+
+        today = datetime.utcnow().date()
+        with self._lock:
+            gaps = profile.gap_groups(snapshot.category_of, today)
+            gap_foods = {
+                name for group in gaps for category in CATEGORY_GROUPS[group]
+                for name in snapshot.categories.get(category, ((), ()))[1]
+            }
+
+            meals = []
+            for meal_key, meal_time, groups in MEAL_PLAN:
+                chosen = []
+                for group in groups:
+                    candidates = [name for name in snapshot.groups[group] if name not in chosen]
+                    if not candidates:
+                        continue
+                    weights = [profile.score(name, meal_key, chosen, gap_foods, today) for name in candidates]
+                    chosen.append(rng.choices(candidates, weights)[0])
+                if chosen:
+                    meals.append({
+                        'meal_time': meal_time,
+                        'content': '、'.join(chosen),
+                        'calories': None  # 暂时不计算卡路里
+                    })
+        return meals, True
+
+    def _build(self, user_id):
+        since = datetime.utcnow() - timedelta(days=self.app.config['FOOD_PROFILE_WINDOW_DAYS'])
+        rows = db.session.query(Record.food_name, Record.meal_time, Record.record_date).filter(
+            Record.user_id == user_id,
+            Record.record_date >= since,
+            Record.type == 'food'
+        ).all()
+
+        profile = UserFoodProfile()
+        for food_name, meal_time, record_date in rows:
+            profile.add(food_name, meal_time, record_date.date() if record_date else None)
+        return profile
+
+
+food_index = FoodRecommendationIndex()
+food_recommender = FoodRecommender()
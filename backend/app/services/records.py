@@ -1,8 +1,12 @@
 from datetime import datetime, timedelta, date
 from ..models import db, Record
 from ..utils.errors import ValidationError, NotFoundError
+from .metrics import DailyMetricsService
 from sqlalchemy import func
 
+# 参与记录统计的类型
+STATS_RECORD_TYPES = ('exercise', 'mood', 'health', 'food')
+
 class RecordService:
     @staticmethod
     def get_all_records(user_id, days=7):
@@ -103,6 +107,7 @@ class RecordService:
         if 'note' in data:
             record.note = data['note']
             
+        DailyMetricsService.refresh(user_id, [record.record_date])
         db.session.commit()
         return record
     
@@ -133,20 +138,63 @@ class RecordService:
         if not record:
             raise NotFoundError("记录不存在")
             
+        record_date = record.record_date
         db.session.delete(record)
+        DailyMetricsService.refresh(user_id, [record_date])
         db.session.commit()
         
     @staticmethod
     def get_records_stats(user_id, days=30):
-        """获取记录统计信息"""
-        # 这个方法在用户仪表板中被调用
-        # 返回一个简单的统计对象
+        """获取记录统计信息
+        
+        按类型一次分组聚合出记录数和运动总时长，再取最近5条心情记录，
+        无论记录数量多少都只执行两次查询。
+        
+        Args:
+            user_id: 用户ID
+            days: 统计最近几天的记录，默认30天
+            
+        Returns:
+            dict: 各类型记录数量、运动总时长和最近心情
+        """
+        start_date = datetime.utcnow() - timedelta(days=days)
+        
+        counts = {record_type: 0 for record_type in STATS_RECORD_TYPES}
+        exercise_minutes = 0
+        
+        rows = db.session.query(
+            Record.type,
+            func.count(Record.id),
+            func.sum(Record.duration)
+        ).filter(
+            Record.user_id == user_id,
+            Record.type.in_(STATS_RECORD_TYPES),
+            Record.created_at >= start_date
+        ).group_by(Record.type).all()
+        
+        for record_type, count, duration in rows:
+            counts[record_type] = count
+            if record_type == 'exercise':
+                exercise_minutes = duration or 0
+        
+        # 获取最近的心情记录
+        recent_moods = db.session.query(Record.mood_type, Record.created_at).filter(
+            Record.user_id == user_id,
+            Record.type == 'mood',
+            Record.created_at >= start_date
+        ).order_by(Record.created_at.desc()).limit(5).all()
+        
         return {
-            'total_records': 0,
-            'exercise_records': 0,
-            'mood_records': 0,
-            'health_records': 0,
-            'food_records': 0,
-            'exercise_minutes': 0,
-            'recent_moods': []
-        } 
\ No newline at end of file
+            'total_records': sum(counts.values()),
+            'exercise_records': counts['exercise'],
+            'mood_records': counts['mood'],
+            'health_records': counts['health'],
+            'food_records': counts['food'],
+            'exercise_minutes': exercise_minutes,
+            'recent_moods': [
+                {
+                    'type': mood_type,
+                    'date': created_at.isoformat()
+                } for mood_type, created_at in recent_moods
+            ]
+        }
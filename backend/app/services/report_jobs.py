@@ -0,0 +1,206 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from ..models import db, Report, ReportRequest
+from .reports import ReportService
+
+logger = logging.getLogger(__name__)
+
+class ReportJobRunner:
+    """以 report_requests 表为队列的后台报告生成器
+
+    每个工作线程循环地从表中认领一条 pending 申请（条件 UPDATE 保证
+    同一条申请只会被一个线程或进程认领），生成报告后写入 Report 并回填
+    report_id。队列存放在数据库中，因此不需要外部消息中间件，进程重启后
+    未处理的申请也会被继续处理。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._last_requeue = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('REPORT_WORKERS', 2)
+        app.config.setdefault('REPORT_POLL_INTERVAL', 5)  # 秒
+        app.config.setdefault('REPORT_DAYS', 30)
+        app.config.setdefault('REPORT_JOB_TIMEOUT', 600)  # 秒，超时的 processing 申请会被重新放回队列
+        app.config.setdefault('REPORT_REQUEUE_INTERVAL', 60)  # 秒，空闲时检查超时申请的最小间隔
+        self.app = app
+        app.extensions['report_jobs'] = self
+
+    def start(self):
+        """启动工作线程（重复调用无副作用）"""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            self._requeue_interrupted()
+            for i in range(self.app.config['REPORT_WORKERS']):
+                thread = threading.Thread(target=self._work_loop, name=f'report-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info('报告生成工作线程已启动: %s 个', len(self._threads))
+
+    def stop(self, timeout=None):
+        """通知工作线程在当前任务完成后退出"""
+        self._stopping.set()
+        self._wakeup.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def enqueue(self, request_id):
+        """唤醒工作线程处理新申请
+
+        申请本身已经以 pending 状态写入数据库，这里只负责确保线程已启动并唤醒它们。
+        """
+        self.start()
+        self._wakeup.set()
+
+    def process_one(self):
+        """认领并处理一条待处理的申请
+
+        认领超时的申请可能已被放回队列并由其他工作线程重新认领，因此完成时
+        只在申请仍处于本次认领的状态（processing 且 started_at 不变）时写入，
+        否则丢弃本次生成的报告，避免同一申请产生两份报告。
+
+        Returns:
+            bool: 是否处理了申请
+        """
+        claim = self._claim_next()
+        if claim is None:
+            return False
+
+        request_id, started_at = claim
+        report_request = db.session.get(ReportRequest, request_id)
+        try:
+            report_data = ReportService.generate_report_data(
+                report_request.user_id, self.app.config['REPORT_DAYS']
+            )
+            if report_data is None:
+                values = {'status': 'failed', 'error_message': '指定时间内没有记录，无法生成报告'}
+            else:
+                report = Report(
+                    user_id=report_request.user_id,
+                    request_id=request_id,
+                    report_data=report_data
+                )
+                db.session.add(report)
+                db.session.flush()
+                values = {'status': 'completed', 'report_id': report.id}
+            values['completed_at'] = datetime.utcnow()
+            if self._finish(request_id, started_at, values):
+                db.session.commit()
+            else:
+                db.session.rollback()
+        except Exception as e:
+            db.session.rollback()
+            logger.exception('生成报告申请 %s 时发生错误: %s', request_id, e)
+            self._finish(request_id, started_at, {
+                'status': 'failed',
+                'error_message': str(e),
+                'completed_at': datetime.utcnow()
+            })
+            db.session.commit()
+        return True
+
+    def _finish(self, request_id, started_at, values):
+        """仅当申请仍属于本次认领时写入处理结果
+
+        Args:
+            request_id: 申请ID
+            started_at: 认领时写入的开始时间
+            values: 要更新的列
+
+        Returns:
+            bool: 是否写入（False 表示申请已超时并被重新认领）
+        """
+        owned = ReportRequest.query.filter(
+            ReportRequest.id == request_id,
+            ReportRequest.status == 'processing',
+            ReportRequest.started_at == started_at
+        ).update(values, synchronize_session=False)
+        if not owned:
+            logger.warning('报告申请 %s 处理超时后已被重新认领，丢弃本次结果', request_id)
+        return bool(owned)
+
+    def _claim_next(self):
+        """原子地把最早的一条 pending 申请标记为 processing
+
+        Returns:
+            tuple: (申请ID, 认领时写入的 started_at)，没有待处理申请时返回 None
+        """
+        while True:
+            candidate = db.session.query(ReportRequest.id).filter(
+                ReportRequest.status == 'pending'
+            ).order_by(ReportRequest.requested_at.asc(), ReportRequest.id.asc()).first()
+            if candidate is None:
+                db.session.commit()
+                return None
+
+            started_at = datetime.utcnow()
+            claimed = ReportRequest.query.filter(
+                ReportRequest.id == candidate.id,
+                ReportRequest.status == 'pending'
+            ).update({'status': 'processing', 'started_at': started_at}, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                return candidate.id, started_at
+            # 已被其他线程/进程认领，继续找下一条
+
+    def _requeue_interrupted(self):
+        """把处理超时（通常是处理中的进程已退出）的申请放回队列
+
+        Returns:
+            int: 放回队列的申请数
+        """
+        self._last_requeue = time.monotonic()
+        deadline = datetime.utcnow() - timedelta(seconds=self.app.config['REPORT_JOB_TIMEOUT'])
+        with self.app.app_context():
+            requeued = ReportRequest.query.filter(
+                ReportRequest.status == 'processing',
+                ReportRequest.started_at < deadline
+            ).update({'status': 'pending', 'started_at': None}, synchronize_session=False)
+            db.session.commit()
+        if requeued:
+            logger.warning('%s 条处理超时的报告申请已放回队列', requeued)
+        return requeued
+
+    def _requeue_if_due(self):
+        """空闲时定期检查超时申请，其他进程崩溃留下的申请不必等到本进程重启
+
+        Returns:
+            int: 放回队列的申请数
+        """
+        with self._lock:
+            if time.monotonic() - self._last_requeue < self.app.config['REPORT_REQUEUE_INTERVAL']:
+                return 0
+            self._last_requeue = time.monotonic()
+        return self._requeue_interrupted()
+
+    def _work_loop(self):
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    processed = self.process_one()
+                if not processed:
+                    processed = self._requeue_if_due() > 0
+            except Exception as e:
+                logger.exception('报告工作线程发生错误: %s', e)
+                processed = False
+
+            if not processed:
+                self._wakeup.wait(self.app.config['REPORT_POLL_INTERVAL'])
+                self._wakeup.clear()
+
+
+report_job_runner = ReportJobRunner()
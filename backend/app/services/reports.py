@@ -1,6 +1,56 @@
+import logging
 from datetime import datetime, timedelta
-from ..models import Record, Report, Recommendation
+from ..models import Record, Report, Recommendation, DailyUserMetric
 from ..utils.errors import ValidationError
+from .trends import TrendService
+
+logger = logging.getLogger(__name__)
+
+# 心情分值（1-5）
+MOOD_SCORES = {
+    'happy': 5, 
+    'excited': 5,
+    'calm': 4, 
+    'relaxed': 4,
+    'normal': 3, 
+    'neutral': 3,
+    'sad': 2, 
+    'tired': 2,
+    'angry': 1, 
+    'anxious': 1,
+    'stressed': 1
+}
+
+MOOD_LABELS = {
+    'happy': '开心',
+    'excited': '兴奋',
+    'calm': '平静',
+    'relaxed': '放松',
+    'normal': '一般',
+    'neutral': '一般',
+    'sad': '难过',
+    'tired': '疲惫',
+    'angry': '生气',
+    'anxious': '焦虑',
+    'stressed': '压力'
+}
+
+# 身体感受分值（1-5）
+HEALTH_SCORES = {
+    'energetic': 5,
+    'good': 4,
+    'normal': 3,
+    'tired': 2,
+    'sick': 1
+}
+
+# 没有食物类别数据时使用的默认分布（百分比）
+DEFAULT_FOOD_CATEGORIES = {
+    'staple': 30,
+    'protein': 25,
+    'vegetables': 35,
+    'snacks': 10
+}
 
 class ReportService:
     @staticmethod
@@ -14,182 +64,93 @@ class ReportService:
         Returns:
             dict: 包含摘要数据的字典
         """
-        print(f"获取健康摘要数据，用户ID: {user_id}, 天数: {days}")
+        logger.debug('获取健康摘要数据，用户ID: %s, 天数: %s', user_id, days)
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
         try:
-            # 获取食物记录
-            food_records = Record.query.filter(
-                Record.user_id == user_id,
-                Record.type == 'food',
-                Record.created_at >= start_date,
-                Record.created_at <= end_date
-            ).all()
+            # 从每日汇总表读取，查询成本与天数成正比，与记录条数无关
+            metrics = ReportService._load_daily_metrics(user_id, start_date, end_date)
             
-            # 获取运动记录
-            exercise_records = Record.query.filter(
-                Record.user_id == user_id,
-                Record.type == 'exercise',
-                Record.created_at >= start_date,
-                Record.created_at <= end_date
-            ).all()
-            
-            # 获取心情记录
-            mood_records = Record.query.filter(
-                Record.user_id == user_id,
-                Record.type == 'mood',
-                Record.created_at >= start_date,
-                Record.created_at <= end_date
-            ).all()
-            
-            # 获取健康记录
-            health_records = Record.query.filter(
-                Record.user_id == user_id,
-                Record.type == 'health',
-                Record.created_at >= start_date,
-                Record.created_at <= end_date
-            ).all()
-            
-            print(f"记录数量 - 食物: {len(food_records)}, 运动: {len(exercise_records)}, 心情: {len(mood_records)}, 健康: {len(health_records)}")
-            
-            # 计算食物记录数量
-            food_count = len(food_records)
+            food_count = 0
+            exercise_minutes = 0
+            meal_counts = {}
+            meal_counts_per_day = []  # 每天吃了几个不同餐次
+            mood_counts = {}
+            mood_days = []  # [(score, count)]，按时间升序
+            health_total = 0
+            health_count = 0
+            has_data = False
+            
+            for metric in metrics:
+                food_count += metric.food_count
+                exercise_minutes += metric.exercise_minutes
+                health_total += metric.feeling_score_sum
+                health_count += metric.feeling_count
+                
+                day_meals = metric.meal_counts()
+                for meal, count in day_meals.items():
+                    if count:
+                        meal_counts[meal] = meal_counts.get(meal, 0) + count
+                # 有食物记录的日期都参与规律度计算，即使未填写餐次
+                if metric.food_count:
+                    meal_counts_per_day.append(sum(1 for count in day_meals.values() if count))
+                
+                # 汇总表中同一天的心情按第一条记录的时间排序；同一种心情的多条记录
+                # 合并在一起，因此当天内的顺序是近似的
+                for mood_type, count in (metric.mood_counts or {}).items():
+                    mood_counts[mood_type] = mood_counts.get(mood_type, 0) + count
+                    score = MOOD_SCORES.get(mood_type)
+                    if score is not None:
+                        mood_days.append((score, count))
+                
+                has_data = has_data or bool(
+                    metric.food_count or metric.exercise_count or metric.mood_counts or metric.feeling_count
+                )
             
-            # 计算运动总时长（处理空值）
-            exercise_minutes = sum(record.duration or 0 for record in exercise_records)
+            logger.debug('记录数量 - 食物: %s, 运动分钟: %s, 心情: %s, 健康: %s', food_count, exercise_minutes, sum(mood_counts.values()), health_count)
             
             # 分析膳食分布
-            meal_distribution = {}
-            for record in food_records:
-                meal_time = record.meal_time
-                if meal_time:
-                    meal_distribution[meal_time] = meal_distribution.get(meal_time, 0) + 1
-            
-            # 计算百分比
-            total_meals = sum(meal_distribution.values()) if meal_distribution else 1
-            for meal in meal_distribution:
-                meal_distribution[meal] = round((meal_distribution[meal] / total_meals) * 100)
+            total_meals = sum(meal_counts.values()) if meal_counts else 1
+            meal_distribution = {meal: round((count / total_meals) * 100)
+                                 for meal, count in meal_counts.items()}
             
             # 确保包含所有膳食类型
             for meal in ['breakfast', 'lunch', 'dinner', 'snack']:
                 if meal not in meal_distribution:
                     meal_distribution[meal] = 0
             
-            # 分析食物类别
-            food_categories = {
-                'staple': 0,
-                'protein': 0,
-                'vegetables': 0,
-                'snacks': 0
-            }
-            
-            # 分析食物类别（这里简化处理，实际中可能需要根据食物名称或类型来分类）
-            for record in food_records:
-                category = record.category if hasattr(record, 'category') else None
-                if category:
-                    if category in food_categories:
-                        food_categories[category] += 1
-                    else:
-                        food_categories['staple'] += 1  # 默认归类为主食
-            
-            # 如果没有足够的分类数据，使用默认值
-            if sum(food_categories.values()) < 3:
-                food_categories = {
-                    'staple': 30,
-                    'protein': 25,
-                    'vegetables': 35,
-                    'snacks': 10
-                }
-            else:
-                # 计算百分比
-                total_categories = sum(food_categories.values())
-                for cat in food_categories:
-                    food_categories[cat] = round((food_categories[cat] / total_categories) * 100)
-            
-            # 计算规律度（这里简化处理，根据每日进餐次数的一致性来估算）
-            daily_meals = {}
-            for record in food_records:
-                date = record.created_at.strftime('%Y-%m-%d')
-                if date not in daily_meals:
-                    daily_meals[date] = set()
-                if record.meal_time:
-                    daily_meals[date].add(record.meal_time)
+            # Record 模型没有食物类别字段，使用默认的类别分布
+            food_categories = dict(DEFAULT_FOOD_CATEGORIES)
             
-            # 计算平均每日进餐次数
-            meal_counts = [len(meals) for meals in daily_meals.values()]
-            avg_meals = sum(meal_counts) / len(meal_counts) if meal_counts else 0
+            # 计算规律度（根据每日进餐次数的一致性来估算）
+            avg_meals = sum(meal_counts_per_day) / len(meal_counts_per_day) if meal_counts_per_day else 0
             
-            # 计算规律度：每日进餐次数的稳定性
-            if not meal_counts or avg_meals == 0:
+            if not meal_counts_per_day or avg_meals == 0:
                 regularity_rate = 50  # 默认值
             else:
                 # 计算标准差
-                variance = sum((x - avg_meals) ** 2 for x in meal_counts) / len(meal_counts)
+                variance = sum((x - avg_meals) ** 2 for x in meal_counts_per_day) / len(meal_counts_per_day)
                 std_dev = variance ** 0.5
-                # 规律度 = 100 - (标准差/平均值) * 100，但最低不小于0
+                # 规律度 = 100 - (标准差/平均值) * 50，限制在0-100之间
                 regularity_rate = max(0, min(100, 100 - (std_dev / avg_meals) * 50))
                 regularity_rate = round(regularity_rate)
             
-            # 计算平均心情分数（改进心情值处理）
-            mood_values = {
-                'happy': 5, 
-                'excited': 5,
-                'calm': 4, 
-                'relaxed': 4,
-                'normal': 3, 
-                'neutral': 3,
-                'sad': 2, 
-                'tired': 2,
-                'angry': 1, 
-                'anxious': 1,
-                'stressed': 1
-            }
-            
-            valid_mood_scores = []
-            for record in mood_records:
-                if record.mood_type:
-                    score = mood_values.get(record.mood_type.lower())
-                    if score is not None:
-                        valid_mood_scores.append(score)
-            
-            mood_score = sum(valid_mood_scores) / len(valid_mood_scores) if valid_mood_scores else 3
-            
-            # 获取最常见心情（改进心情统计）
-            mood_counts = {}
-            for record in mood_records:
-                if record.mood_type:
-                    mood_type = record.mood_type.lower()
-                    mood_counts[mood_type] = mood_counts.get(mood_type, 0) + 1
+            # 计算平均心情分数
+            valid_mood_count = sum(count for _, count in mood_days)
+            mood_score = (sum(score * count for score, count in mood_days) / valid_mood_count
+                          if valid_mood_count else 3)
             
+            # 获取最常见心情
             top_mood = None
             if mood_counts:
                 top_mood = max(mood_counts.items(), key=lambda x: x[1])[0]
             
-            mood_labels = {
-                'happy': '开心',
-                'excited': '兴奋',
-                'calm': '平静',
-                'relaxed': '放松',
-                'normal': '一般',
-                'neutral': '一般',
-                'sad': '难过',
-                'tired': '疲惫',
-                'angry': '生气',
-                'anxious': '焦虑',
-                'stressed': '压力'
-            }
-            
-            top_mood = mood_labels.get(top_mood, '暂无数据') if top_mood else '暂无数据'
+            top_mood = MOOD_LABELS.get(top_mood, '暂无数据') if top_mood else '暂无数据'
             
-            # 计算心情趋势（改进趋势计算）
-            if len(valid_mood_scores) >= 2:
-                # 计算最近3天和之前的平均分数
-                recent_scores = valid_mood_scores[-3:] if len(valid_mood_scores) > 3 else valid_mood_scores
-                older_scores = valid_mood_scores[:-3] if len(valid_mood_scores) > 3 else []
-                
-                recent_avg = sum(recent_scores) / len(recent_scores)
-                older_avg = sum(older_scores) / len(older_scores) if older_scores else recent_avg
+            # 计算心情趋势：最近3条与之前记录的平均分数对比
+            if valid_mood_count >= 2:
+                recent_avg, older_avg = ReportService._split_recent_average(mood_days, 3)
                 
                 if recent_avg > older_avg + 0.5:
                     mood_trend = '上升'
@@ -200,25 +161,10 @@ class ReportService:
             else:
                 mood_trend = '数据不足'
             
-            # 计算健康评分（改进健康评分计算）
-            health_values = {
-                'energetic': 5,
-                'good': 4,
-                'normal': 3,
-                'tired': 2,
-                'sick': 1
-            }
-            
-            valid_health_scores = []
-            for record in health_records:
-                if record.feeling:
-                    score = health_values.get(record.feeling.lower())
-                    if score is not None:
-                        valid_health_scores.append(score)
-            
-            health_score = sum(valid_health_scores) / len(valid_health_scores) if valid_health_scores else 3
+            # 计算健康评分
+            health_score = health_total / health_count if health_count else 3
             
-            # 生成健康建议（改进建议生成逻辑）
+            # 生成健康建议
             health_tips = []
             
             if health_score < 3:
@@ -238,23 +184,69 @@ class ReportService:
                 'topMood': top_mood,
                 'moodTrend': mood_trend,
                 'healthTip': health_tip,
-                'hasData': bool(food_records or exercise_records or mood_records or health_records),
+                'hasData': has_data,
                 'mealDistribution': meal_distribution,
                 'foodCategories': food_categories,
                 'regularityRate': regularity_rate
             }
             
-            print(f"健康摘要数据结果: {result}")
+            logger.debug('健康摘要数据结果: %s', result)
             return result
             
         except Exception as e:
-            print(f"获取健康摘要数据时发生错误: {str(e)}")
+            logger.exception('获取健康摘要数据时发生错误: %s', e)
             # 返回一个带有错误信息的结果
             return {
                 'error': True,
                 'message': '获取数据时发生错误，请稍后重试',
                 'details': str(e)
             }
+    
+    @staticmethod
+    def _load_daily_metrics(user_id, start_date, end_date):
+        """读取时间范围内的每日汇总
+        
+        Args:
+            user_id: 用户ID
+            start_date: 开始时间
+            end_date: 结束时间
+            
+        Returns:
+            list: DailyUserMetric 列表，按日期升序
+        """
+        return DailyUserMetric.query.filter(
+            DailyUserMetric.user_id == user_id,
+            DailyUserMetric.day >= start_date.date(),
+            DailyUserMetric.day <= end_date.date()
+        ).order_by(DailyUserMetric.day.asc()).all()
+    
+    @staticmethod
+    def _split_recent_average(weighted_scores, recent_size):
+        """计算最近 recent_size 个分数与更早分数的平均值
+        
+        Args:
+            weighted_scores: [(score, count)] 按时间升序
+            recent_size: 视为"最近"的分数个数
+            
+        Returns:
+            tuple: (recent_avg, older_avg)，没有更早的分数时 older_avg 等于 recent_avg
+        """
+        total = sum(count for _, count in weighted_scores)
+        if total <= recent_size:
+            recent_avg = sum(score * count for score, count in weighted_scores) / total
+            return recent_avg, recent_avg
+        
+        recent_sum = 0
+        remaining = recent_size
+        for score, count in reversed(weighted_scores):
+            taken = min(count, remaining)
+            recent_sum += score * taken
+            remaining -= taken
+            if remaining == 0:
+                break
+        
+        all_sum = sum(score * count for score, count in weighted_scores)
+        return recent_sum / recent_size, (all_sum - recent_sum) / (total - recent_size)
         
     @staticmethod
     def get_trends(user_id, period='month'):
@@ -280,79 +272,21 @@ class ReportService:
         else:
             raise ValidationError("无效的时间周期")
             
-        # 获取记录数据
-        food_records = Record.query.filter(
-            Record.user_id == user_id,
-            Record.created_at >= start_date,
-            Record.created_at <= end_date
-        ).all()
-        
-        exercise_records = Record.query.filter(
-            Record.user_id == user_id,
-            Record.created_at >= start_date,
-            Record.created_at <= end_date
-        ).all()
-        
-        mood_records = Record.query.filter(
-            Record.user_id == user_id,
-            Record.created_at >= start_date,
-            Record.created_at <= end_date
-        ).all()
+        # 每日汇总，每天一行，一次性转换为数组后向量化计算
+        metrics = ReportService._load_daily_metrics(user_id, start_date, end_date)
+        series = TrendService.build_series(metrics, MOOD_SCORES)
         
-        # 计算食物记录趋势
-        food_trend = ReportService._calculate_trend(food_records, lambda r: 1)
-        
-        # 计算运动时长趋势
-        exercise_trend = ReportService._calculate_trend(exercise_records, lambda r: r.duration)
-        
-        # 计算心情趋势
-        mood_values = {'happy': 5, 'calm': 4, 'normal': 3, 'sad': 2, 'angry': 1}
-        mood_trend = ReportService._calculate_trend(mood_records, lambda r: mood_values.get(r.mood_type, 3))
+        statistics = {
+            name: TrendService.analyze(series['days'], series[name])
+            for name in ('food', 'exercise', 'mood')
+        }
         
         return {
-            'food': food_trend,
-            'exercise': exercise_trend,
-            'mood': mood_trend
+            'food': statistics['food']['label'],
+            'exercise': statistics['exercise']['label'],
+            'mood': statistics['mood']['label'],
+            'statistics': statistics
         }
-    
-    @staticmethod
-    def _calculate_trend(records, value_func):
-        """计算趋势
-        
-        Args:
-            records: 记录列表
-            value_func: 值提取函数
-            
-        Returns:
-            str: 趋势描述
-        """
-        if not records or len(records) < 2:
-            return '数据不足'
-            
-        # 按日期排序
-        sorted_records = sorted(records, key=lambda r: r.created_at)
-        
-        # 计算前半部分和后半部分的平均值
-        mid_point = len(sorted_records) // 2
-        first_half = sorted_records[:mid_point]
-        second_half = sorted_records[mid_point:]
-        
-        first_avg = sum(value_func(r) for r in first_half) / len(first_half)
-        second_avg = sum(value_func(r) for r in second_half) / len(second_half)
-        
-        # 计算变化百分比
-        change_percent = (second_avg - first_avg) / first_avg * 100 if first_avg > 0 else 0
-        
-        if change_percent > 10:
-            return '显著上升'
-        elif change_percent > 5:
-            return '略有上升'
-        elif change_percent < -10:
-            return '显著下降'
-        elif change_percent < -5:
-            return '略有下降'
-        else:
-            return '保持稳定'
 
     @staticmethod
     def generate_report_data(user_id, days=30):
@@ -366,7 +300,7 @@ class ReportService:
             dict: 包含报告关键数据的字典，用于存储在 Report.report_data
                   返回 None 表示无法生成 (例如数据不足)
         """
-        print(f"开始为用户 {user_id} 生成报告数据 (最近 {days} 天)")
+        logger.debug('开始为用户 %s 生成报告数据 (最近 %s 天)', user_id, days)
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
 
@@ -378,10 +312,28 @@ class ReportService:
         ).order_by(Record.record_date.asc()).all()
 
         if not user_records:
-            print(f"用户 {user_id} 在指定时间内没有记录，无法生成报告数据")
+            logger.debug('用户 %s 在指定时间内没有记录，无法生成报告数据', user_id)
             return None # 没有足够数据
 
-        # 2. 初始化报告数据字典
+        report_data = ReportService.build_report_data(user_records, days)
+        logger.debug('为用户 %s 生成的报告数据: %s', user_id, report_data)
+        return report_data
+
+    @staticmethod
+    def build_report_data(records, days=30):
+        """根据记录计算报告数据（不访问数据库）
+
+        单用户生成与批量生成共用此方法，批量任务可以直接传入查询行。
+
+        Args:
+            records: 按 record_date 升序的记录，需要提供 type、record_date、
+                     weight_kg、duration、mood_type 属性
+            days: 分析的天数
+
+        Returns:
+            dict: 报告数据
+        """
+        # 初始化报告数据字典
         report_data = {
             'bmi': None,
             'calorie_goal': 2000, # 示例：固定值
@@ -393,12 +345,12 @@ class ReportService:
             'weight_trend': [] # 存储 {date: YYYY-MM-DD, value: weight}
         }
 
-        # 3. 分析记录并填充报告数据
+        # 分析记录并填充报告数据
         mood_counts = {}
         total_duration = 0
         weight_data_points = []
 
-        for record in user_records:
+        for record in records:
             # 提取体重数据
             if record.type == 'body_status' and record.weight_kg is not None:
                 weight_data_points.append({
@@ -453,7 +405,6 @@ class ReportService:
         if not report_data['key_findings']:
             report_data['key_findings'].append("整体健康状况平稳，请继续保持记录习惯。")
 
-        print(f"为用户 {user_id} 生成的报告数据: {report_data}")
         return report_data
 
     @staticmethod
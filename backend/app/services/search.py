@@ -0,0 +1,169 @@
+from sqlalchemy import text, Integer, Float, inspect
+
+from ..models import db
+
+# 全文索引定义：{索引名: (内容表, 被索引的列)}
+SEARCH_INDEXES = {
+    'users': ('users', ('username', 'email')),
+    'food_items': ('food_items', ('name',)),
+}
+
+# trigram 分词把文本切成连续三个字符的片段，中文名称中间的词（宫保鸡丁中的
+# 鸡丁）也能匹配；unicode61 会把整段汉字当成一个词，只能匹配整个名称的前缀
+SEARCH_TOKENIZER = 'trigram'
+
+# trigram 分词要求每个搜索词至少三个字符，更短的词回退到 ILIKE
+MIN_TERM_LENGTH = 3
+
+# trigram 分词器从 SQLite 3.34.0 开始提供
+MIN_SQLITE_VERSION = (3, 34, 0)
+
+
+class SearchIndex:
+    """基于 SQLite FTS5 的管理后台搜索索引
+
+    每个内容表对应一张外部内容（external content）FTS5 虚拟表 <表名>_fts，
+    由触发器在 INSERT/UPDATE/DELETE 时同步，因此所有写入路径（接口、脚本、
+    批量导入）都会自动更新索引。索引使用 trigram 分词，搜索词按空白切分，
+    每个词做子串匹配（与原来的 ILIKE '%词%' 一致，对中文同样有效），结果按
+    bm25 相关度排序。
+
+    数据库不是 SQLite、SQLite 低于 3.34 或未编译 FTS5、SEARCH_FTS_ENABLED 为
+    False，或搜索词短于 MIN_TERM_LENGTH 个字符时，match() 返回 None，调用方
+    回退到 ILIKE 查询。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.available = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SEARCH_FTS_ENABLED', True)
+        self.app = app
+        app.extensions['search_index'] = self
+
+    def ensure(self):
+        """创建缺失的 FTS 表和触发器（需要在应用上下文中调用）
+
+        新建的索引会立即从内容表重建；SQLite 上的 batch 迁移会重建表并丢失
+        触发器，这里同样会把它们补回来。使用其他分词器建立的旧索引会被删除重建。
+        """
+        self.available = False
+        if not self.app.config['SEARCH_FTS_ENABLED'] or db.engine.dialect.name != 'sqlite':
+            return
+
+        with db.engine.begin() as conn:
+            if not conn.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar():
+                return
+            version = conn.exec_driver_sql('SELECT sqlite_version()').scalar()
+            if tuple(int(part) for part in version.split('.')) < MIN_SQLITE_VERSION:
+                return
+            for name in SEARCH_INDEXES:
+                sql = conn.exec_driver_sql(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (f'{name}_fts',)
+                ).scalar()
+                if sql is not None and f"tokenize='{SEARCH_TOKENIZER}'" not in sql:
+                    for statement in drop_statements(name):
+                        conn.exec_driver_sql(statement)
+            existing_tables = set(inspect(conn).get_table_names())
+            existing_triggers = {row[0] for row in conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+            )}
+            for name in SEARCH_INDEXES:
+                statements, needs_rebuild = _ddl(name, existing_tables, existing_triggers)
+                for statement in statements:
+                    conn.exec_driver_sql(statement)
+                if needs_rebuild:
+                    conn.exec_driver_sql(f"INSERT INTO {name}_fts({name}_fts) VALUES ('rebuild')")
+        self.available = True
+
+    def rebuild(self):
+        """从内容表重建全部索引"""
+        if not self.available:
+            return
+        with db.engine.begin() as conn:
+            for name in SEARCH_INDEXES:
+                conn.exec_driver_sql(f"INSERT INTO {name}_fts({name}_fts) VALUES ('rebuild')")
+
+    def match(self, name, term):
+        """搜索匹配的行
+
+        Args:
+            name: SEARCH_INDEXES 中的索引名
+            term: 用户输入的搜索词
+
+        Returns:
+            子查询，列为 id（内容表主键）和 rank（越小越相关）；
+            索引不可用或搜索词为空时返回 None
+        """
+        expression = self.build_match(term)
+        if not self.available or expression is None:
+            return None
+        return text(
+            f"SELECT rowid AS id, rank FROM {name}_fts WHERE {name}_fts MATCH :expression"
+        ).bindparams(expression=expression).columns(id=Integer, rank=Float).subquery(f'{name}_matches')
+
+    @staticmethod
+    def build_match(term):
+        """把搜索词转换为 FTS5 查询：每个词加引号转义后做子串匹配，多个词之间为 AND
+
+        Returns:
+            str: FTS5 查询表达式；没有有效词，或有词短于 MIN_TERM_LENGTH 个字符
+            （trigram 无法匹配）时返回 None
+        """
+        words = [word for word in (term or '').split() if word.strip('"')]
+        if not words or any(len(word) < MIN_TERM_LENGTH for word in words):
+            return None
+        return ' '.join('"{}"'.format(word.replace('"', '""')) for word in words)
+
+
+def _ddl(name, existing_tables, existing_triggers):
+    """生成索引 name 缺失的建表和触发器语句
+
+    Returns:
+        tuple: (语句列表, 是否需要重建索引)
+    """
+    table, columns = SEARCH_INDEXES[name]
+    fts = f'{name}_fts'
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+
+    statements = []
+    created = fts not in existing_tables
+    if created:
+        statements.append(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({column_list}, "
+            f"content='{table}', content_rowid='id', tokenize='{SEARCH_TOKENIZER}')"
+        )
+
+    triggers = {
+        f'{fts}_ai': f"AFTER INSERT ON {table} BEGIN "
+                     f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f'{fts}_ad': f"AFTER DELETE ON {table} BEGIN "
+                     f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f'{fts}_au': f"AFTER UPDATE OF {column_list} ON {table} BEGIN "
+                     f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+                     f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+    }
+    missing_trigger = False
+    for trigger, body in triggers.items():
+        if trigger not in existing_triggers:
+            statements.append(f'CREATE TRIGGER {trigger} {body}')
+            missing_trigger = True
+
+    # 触发器缺失期间的修改没有同步到索引，需要重建
+    return statements, created or missing_trigger
+
+
+def drop_statements(name):
+    """删除索引 name 的触发器和 FTS 表的语句"""
+    fts = f'{name}_fts'
+    return [f'DROP TRIGGER IF EXISTS {fts}_{suffix}' for suffix in ('ai', 'ad', 'au')] + [
+        f'DROP TABLE IF EXISTS {fts}'
+    ]
+
+
+search_index = SearchIndex()
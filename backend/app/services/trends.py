@@ -0,0 +1,109 @@
+from datetime import date
+import numpy as np
+
+class TrendService:
+    @staticmethod
+    def build_series(metrics, mood_scores, default_mood_score=3):
+        """把每日汇总一次性转换为 NumPy 数组
+
+        Args:
+            metrics: 按日期升序的 DailyUserMetric 列表
+            mood_scores: 心情类型到分值的映射
+            default_mood_score: 未知心情类型的分值
+
+        Returns:
+            dict: {'days': 日期序号数组, 'food': ..., 'exercise': ..., 'mood': ...}，
+                  当天没有对应数据的位置为 NaN
+        """
+        count = len(metrics)
+        days = np.fromiter((m.day.toordinal() for m in metrics), dtype=np.int64, count=count)
+        food = np.fromiter((m.food_count for m in metrics), dtype=float, count=count)
+        exercise = np.fromiter((m.exercise_minutes for m in metrics), dtype=float, count=count)
+        has_exercise = np.fromiter((m.exercise_count for m in metrics), dtype=np.int64, count=count) > 0
+
+        mood_total = np.zeros(count)
+        mood_count = np.zeros(count)
+        for i, metric in enumerate(metrics):
+            for mood_type, n in (metric.mood_counts or {}).items():
+                mood_total[i] += mood_scores.get(mood_type, default_mood_score) * n
+                mood_count[i] += n
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mood = mood_total / mood_count
+
+        return {
+            'days': days,
+            'food': np.where(food > 0, food, np.nan),
+            'exercise': np.where(has_exercise, exercise, np.nan),
+            'mood': mood
+        }
+
+    @staticmethod
+    def analyze(days, values, window=7):
+        """计算单个指标的趋势统计
+
+        忽略 NaN（当天无数据），对剩余样本计算前后半段均值变化、
+        线性回归斜率以及滑动平均。
+
+        Args:
+            days: 日期序号数组（date.toordinal()）
+            values: 与 days 等长的每日数值
+            window: 滑动平均窗口（天数）
+
+        Returns:
+            dict: label, samples, mean, change_percent, slope_per_day, rolling_mean
+        """
+        mask = ~np.isnan(values)
+        x = days[mask]
+        y = values[mask]
+
+        if y.size < 2:
+            return {
+                'label': '数据不足',
+                'samples': int(y.size),
+                'mean': round(float(y.mean()), 2) if y.size else None,
+                'change_percent': None,
+                'slope_per_day': None,
+                'rolling_mean': []
+            }
+
+        # 前半部分和后半部分的平均值
+        mid_point = y.size // 2
+        first_avg = y[:mid_point].mean()
+        second_avg = y[mid_point:].mean()
+        change_percent = (second_avg - first_avg) / first_avg * 100 if first_avg > 0 else 0.0
+
+        # 最小二乘线性回归斜率（每天的变化量）
+        offsets = (x - x[0]).astype(float)
+        slope = np.polyfit(offsets, y, 1)[0] if np.ptp(offsets) > 0 else 0.0
+
+        # 滑动平均
+        size = min(window, y.size)
+        rolling = np.convolve(y, np.ones(size) / size, mode='valid')
+        rolling_days = x[size - 1:]
+
+        return {
+            'label': TrendService.label(change_percent),
+            'samples': int(y.size),
+            'mean': round(float(y.mean()), 2),
+            'change_percent': round(float(change_percent), 1),
+            'slope_per_day': round(float(slope), 3),
+            'rolling_mean': [
+                {'date': date.fromordinal(int(d)).isoformat(), 'value': round(float(v), 2)}
+                for d, v in zip(rolling_days, rolling)
+            ]
+        }
+
+    @staticmethod
+    def label(change_percent):
+        """根据变化百分比返回趋势描述"""
+        if change_percent > 10:
+            return '显著上升'
+        elif change_percent > 5:
+            return '略有上升'
+        elif change_percent < -10:
+            return '显著下降'
+        elif change_percent < -5:
+            return '略有下降'
+        else:
+            return '保持稳定'
@@ -12,6 +12,10 @@ class NotFoundError(Exception):
     """资源未找到错误"""
     pass
 
+class ServiceUnavailableError(Exception):
+    """服务暂时不可用（过载）"""
+    pass
+
 def bad_request(message):
     """返回400错误响应"""
     response = jsonify({'error': 'bad_request', 'message': message})
@@ -48,6 +52,12 @@ def internal_server_error(message):
     response.status_code = 500
     return response
 
+def service_unavailable(message):
+    """返回503错误响应"""
+    response = jsonify({'error': 'service_unavailable', 'message': message})
+    response.status_code = 503
+    return response
+
 def register_error_handlers(app):
     """注册错误处理器"""
     
@@ -85,4 +95,8 @@ def register_error_handlers(app):
     
     @app.errorhandler(NotFoundError)
     def handle_not_found_error(e):
-        return not_found(str(e)) 
\ No newline at end of file
+        return not_found(str(e))
+    
+    @app.errorhandler(ServiceUnavailableError)
+    def handle_service_unavailable_error(e):
+        return service_unavailable(str(e)) 
\ No newline at end of file
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app, g
+from flask_jwt_extended import get_jwt
+
+from ..models import db, User
+
+# 进程级身份缓存的默认有效期（秒）
+DEFAULT_IDENTITY_CACHE_TTL = 30
+
+
+class UserIdentity(namedtuple('UserIdentity', ['id', 'username', 'role', 'is_active', 'token_version'])):
+    """鉴权所需的用户字段快照，避免每次请求都加载完整的 User 对象"""
+    __slots__ = ()
+
+    def is_admin(self):
+        return self.role == 'admin'
+
+
+_cache = {}  # {user_id: (过期时间, UserIdentity)}
+_cache_lock = threading.Lock()
+
+
+def _normalize(user_id):
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def token_claims(user):
+    """签发令牌时附加的声明
+
+    角色写入令牌后，权限检查只需读取声明；ver 对应 User.token_version，
+    角色或状态变化时递增，旧令牌随之失效。账号是否启用不写入令牌，由
+    is_token_revoked() 根据身份缓存检查。
+
+    Args:
+        user: User 对象
+
+    Returns:
+        dict: 附加声明
+    """
+    return {'role': user.role, 'ver': user.token_version or 0}
+
+
+def is_token_revoked(jwt_payload):
+    """检查令牌是否已失效（用户不存在、已禁用或令牌版本已过期）
+
+    用户信息来自身份缓存，稳定状态下不查询数据库。
+    """
+    identity = get_identity(jwt_payload.get('sub'))
+    if identity is None or not identity.is_active:
+        return True
+    if 'ver' in jwt_payload and jwt_payload['ver'] != (identity.token_version or 0):
+        return True
+    return False
+
+
+def current_role():
+    """当前请求令牌中的角色
+
+    旧版本签发的令牌没有角色声明，此时回退到身份缓存。
+    """
+    claims = get_jwt()
+    if 'role' in claims:
+        return claims['role']
+    identity = get_identity(claims.get('sub'))
+    return identity.role if identity else None
+
+
+def current_is_admin():
+    """当前请求的用户是否为管理员"""
+    return current_role() == 'admin'
+
+
+def get_identity(user_id):
+    """获取用户的身份信息
+
+    依次查找请求内缓存和进程级缓存（有效期由 IDENTITY_CACHE_TTL 配置），
+    都未命中时才查询 users 表。多进程部署时，其他进程对用户的修改最多在
+    TTL 之后生效。
+
+    Args:
+        user_id: 用户ID（JWT 中的 sub）
+
+    Returns:
+        UserIdentity: 用户不存在时返回 None
+    """
+    user_id = _normalize(user_id)
+    if user_id is None:
+        return None
+
+    request_cache = g.setdefault('_identity_cache', {})
+    if user_id in request_cache:
+        return request_cache[user_id]
+
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(user_id)
+    if cached is not None and cached[0] > now:
+        identity = cached[1]
+    else:
+        identity = _load_identity(user_id)
+        if identity is not None:
+            ttl = current_app.config.get('IDENTITY_CACHE_TTL', DEFAULT_IDENTITY_CACHE_TTL)
+            with _cache_lock:
+                _cache[user_id] = (now + ttl, identity)
+
+    request_cache[user_id] = identity
+    return identity
+
+
+def invalidate_identity(user_id):
+    """用户的角色、状态被修改或用户被删除后清除缓存"""
+    user_id = _normalize(user_id)
+    with _cache_lock:
+        _cache.pop(user_id, None)
+    g.get('_identity_cache', {}).pop(user_id, None)
+
+
+def clear_identity_cache():
+    """清空进程级身份缓存"""
+    with _cache_lock:
+        _cache.clear()
+
+
+def _load_identity(user_id):
+    row = db.session.query(User.id, User.username, User.role, User.is_active, User.token_version).filter(
+        User.id == user_id
+    ).first()
+    return UserIdentity(*row) if row else None
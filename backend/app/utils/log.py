@@ -0,0 +1,116 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import request, has_request_context
+
+# 应用日志的根 logger，各模块使用 logging.getLogger(__name__) 即 app.xxx
+ROOT_LOGGER = 'app'
+
+# 文本格式，LOG_FORMAT='json' 时改为每行一个 JSON 对象
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(method)s %(path)s] %(message)s'
+
+_listener = None
+
+
+class RequestContextFilter(logging.Filter):
+    """在产生日志的线程中附加请求方法和路径（请求上下文之外为 '-'）"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.method = request.method
+            record.path = request.path
+        else:
+            record.method = record.path = '-'
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """队列写满时丢弃日志而不是阻塞请求线程"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'method': getattr(record, 'method', '-'),
+            'path': getattr(record, 'path', '-'),
+        }
+        # 异常堆栈已由 QueueHandler.prepare() 合并到 message 中
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(app):
+    """配置应用日志
+
+    所有 app.* logger 的日志经 DroppingQueueHandler 放入有界队列后立即返回，
+    由后台 QueueListener 线程格式化并写到 stderr，请求线程不做任何 I/O。
+    低于 LOG_LEVEL 的日志在 logger.debug() 等调用处就被过滤，不会创建日志记录。
+
+    配置项：
+        LOG_LEVEL: 日志级别，默认调试模式为 DEBUG，否则为 INFO
+        LOG_FORMAT: text（默认）或 json
+        LOG_QUEUE_SIZE: 队列容量，写满时丢弃新日志
+
+    Args:
+        app: Flask 应用
+    """
+    global _listener
+
+    if not app.config.get('LOG_LEVEL'):
+        app.config['LOG_LEVEL'] = 'DEBUG' if app.debug else 'INFO'
+    app.config.setdefault('LOG_FORMAT', 'text')
+    app.config.setdefault('LOG_QUEUE_SIZE', 10000)
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if app.config['LOG_FORMAT'] == 'json':
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    queue_handler = DroppingQueueHandler(queue.Queue(app.config['LOG_QUEUE_SIZE']))
+    queue_handler.addFilter(RequestContextFilter())
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(app.config['LOG_LEVEL'])
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+
+    # 重复创建应用（测试、工作进程）时替换旧的监听线程
+    if _listener is not None:
+        _listener.stop()
+    _listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+    app.extensions['log_queue_handler'] = queue_handler
+
+
+def flush_logging():
+    """停止监听线程并写出队列中剩余的日志（进程退出时调用）"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(flush_logging)
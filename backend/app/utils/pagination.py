@@ -0,0 +1,249 @@
+import base64
+import json
+import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import and_, or_
+
+from .errors import ValidationError
+
+# page/per_page 分页的默认/最大每页条数
+DEFAULT_PER_PAGE = 10
+MAX_PER_PAGE = 100
+
+# include_total=false 时返回的近似总数：相同筛选条件最近一次 COUNT 的结果
+COUNT_CACHE_TTL = 60  # 秒
+COUNT_CACHE_SIZE = 256
+
+_count_cache = OrderedDict()  # {查询键: (过期时间, 总数)}
+_count_cache_lock = threading.Lock()
+
+PageArgs = namedtuple('PageArgs', ['page', 'per_page', 'include_total', 'cursor'])
+
+
+def encode_cursor(*values):
+    """将排序键编码为不透明的分页游标
+
+    Args:
+        values: 最后一条数据的排序键，例如 (created_at, id)
+
+    Returns:
+        str: URL安全的游标字符串
+    """
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, *types):
+    """解码分页游标
+
+    Args:
+        cursor: encode_cursor 生成的游标
+        types: 每个排序键的类型，datetime 会从ISO格式还原
+
+    Returns:
+        tuple: 排序键
+
+    Raises:
+        ValidationError: 游标格式无效
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError('cursor length mismatch')
+        return tuple(
+            datetime.fromisoformat(value) if value_type is datetime else value_type(value)
+            for value, value_type in zip(values, types)
+        )
+    except (ValueError, TypeError, UnicodeError):
+        raise ValidationError('无效的分页游标')
+
+
+def keyset_filter(columns, values, descending=True):
+    """构造 "排在游标之后" 的过滤条件
+
+    等价于 (col1, col2, ...) < (v1, v2, ...)（降序）或 >（升序），
+    展开成 OR/AND 形式以便各数据库都能利用复合索引定位。
+
+    Args:
+        columns: 排序列，例如 (Record.created_at, Record.id)
+        values: decode_cursor 返回的排序键
+        descending: 是否按降序分页
+
+    Returns:
+        SQLAlchemy 过滤表达式
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        after = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal_prefix, after))
+    return or_(*clauses)
+
+
+class Page:
+    """paginate() / keyset_paginate() 返回的一页数据
+
+    total 为 None 表示没有计算总数；total_approximate 为 True 表示总数取自
+    缓存，可能与当前数据略有出入。游标分页时 page 为 None，下一页通过
+    next_cursor 获取。
+    """
+
+    def __init__(self, items, per_page, has_next, has_prev, page=None,
+                 total=None, total_approximate=False, next_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.page = page
+        self.total = total
+        self.total_approximate = total_approximate
+        self.next_cursor = next_cursor
+
+    @property
+    def pages(self):
+        if self.total is None:
+            return None
+        return math.ceil(self.total / self.per_page)
+
+    def to_dict(self):
+        """分页元数据，字段与原来 paginate() 的响应一致"""
+        meta = {
+            'total_items': self.total,
+            'total_pages': self.pages,
+            'total_approximate': self.total_approximate,
+            'current_page': self.page,
+            'per_page': self.per_page,
+            'has_next': self.has_next,
+            'has_prev': self.has_prev
+        }
+        if self.page is None:
+            meta['next_cursor'] = self.next_cursor
+        return meta
+
+
+def pagination_args(default_per_page=DEFAULT_PER_PAGE, max_per_page=MAX_PER_PAGE):
+    """读取分页查询参数
+
+    - page, per_page: 页码分页，per_page 限制在 [1, max_per_page]
+    - include_total: 传 false/0/no 时不执行 COUNT 查询
+    - cursor: 传入（包括空字符串，表示第一页）时使用游标分页
+
+    Returns:
+        PageArgs
+    """
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = max(1, min(request.args.get('per_page', default_per_page, type=int), max_per_page))
+    include_total = request.args.get('include_total', 'true').lower() not in ('false', '0', 'no')
+    return PageArgs(page, per_page, include_total, request.args.get('cursor'))
+
+
+def paginate(query, page=1, per_page=DEFAULT_PER_PAGE, include_total=True):
+    """页码分页，替代 query.paginate()
+
+    多取一条数据判断是否有下一页。include_total 为 False 时不执行 COUNT，
+    总数取自缓存（近似值，缓存中没有则为 None）；到达最后一页时总数可以
+    直接算出，不需要 COUNT。
+
+    Args:
+        query: 已排序的查询
+        page: 页码，从1开始
+        per_page: 每页条数
+        include_total: 是否计算精确总数
+
+    Returns:
+        Page
+    """
+    offset = (page - 1) * per_page
+    rows = query.limit(per_page + 1).offset(offset).all()
+    has_next = len(rows) > per_page
+    items = rows[:per_page]
+
+    total, approximate = None, False
+    if not has_next and (items or page == 1):
+        total = offset + len(items)
+        _store_count(_count_key(query), total)
+    elif include_total:
+        total = count(query)
+    else:
+        total = cached_count(query)
+        approximate = total is not None
+
+    return Page(items, per_page, has_next, page > 1, page=page,
+                total=total, total_approximate=approximate)
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=DEFAULT_PER_PAGE,
+                    descending=True, key=None, include_total=False):
+    """游标分页
+
+    按 columns 排序（最后一列应唯一，例如主键），游标记录上一页最后一条的
+    排序键。排序列不能为 NULL，否则行比较会漏掉数据。
+
+    Args:
+        query: 未排序的查询（已有的排序会被替换）
+        columns: 排序列，例如 (ActivityLog.created_at, ActivityLog.id)
+        cursor: 上一页返回的 next_cursor，None 或空字符串表示第一页
+        per_page: 每页条数
+        descending: 是否降序
+        key: 从结果行取排序键的函数，默认按列名读取属性
+        include_total: 是否计算总数（忽略游标条件）
+
+    Returns:
+        Page
+    """
+    total = count(query) if include_total else None
+    if cursor:
+        values = decode_cursor(cursor, *(column.type.python_type for column in columns))
+        query = query.filter(keyset_filter(columns, values, descending))
+
+    ordering = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(None).order_by(*ordering).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    items = rows[:per_page]
+
+    next_cursor = None
+    if has_next:
+        if key is None:
+            values = tuple(getattr(items[-1], column.key) for column in columns)
+        else:
+            values = key(items[-1])
+        next_cursor = encode_cursor(*values)
+    return Page(items, per_page, has_next, bool(cursor), total=total, next_cursor=next_cursor)
+
+
+def count(query):
+    """执行 COUNT 查询，并把结果写入近似总数缓存"""
+    total = query.order_by(None).count()
+    _store_count(_count_key(query), total)
+    return total
+
+
+def cached_count(query):
+    """近似总数：COUNT_CACHE_TTL 秒内相同查询的 COUNT 结果，没有时返回 None"""
+    key = _count_key(query)
+    with _count_cache_lock:
+        entry = _count_cache.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+
+def _count_key(query):
+    compiled = query.order_by(None).statement.compile()
+    params = tuple(sorted((name, repr(value)) for name, value in compiled.params.items()))
+    return str(compiled), params
+
+
+def _store_count(key, total):
+    with _count_cache_lock:
+        _count_cache[key] = (time.monotonic() + COUNT_CACHE_TTL, total)
+        _count_cache.move_to_end(key)
+        while len(_count_cache) > COUNT_CACHE_SIZE:
+            _count_cache.popitem(last=False)
@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+from .errors import ServiceUnavailableError
+
+# 默认的密码哈希方法，迭代次数可通过 PASSWORD_HASH_METHOD 调整
+DEFAULT_PASSWORD_HASH_METHOD = f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+
+
+class PasswordHasher:
+    """在独立的有界线程池中执行密码哈希
+
+    PBKDF2 是刻意设计的 CPU 密集型运算（hashlib 计算时会释放 GIL），直接在
+    请求线程中执行时，登录高峰会占满所有 CPU，拖慢其他接口。这里把哈希计算
+    交给并发数固定的线程池：同时进行的哈希不超过 PASSWORD_HASH_WORKERS 个，
+    排队数超过 PASSWORD_HASH_QUEUE_LIMIT 时直接拒绝（503），避免请求无限堆积。
+
+    未初始化应用时（例如命令行脚本）直接在当前线程计算。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._reset_stats()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', DEFAULT_PASSWORD_HASH_METHOD)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2))
+        app.config.setdefault('PASSWORD_HASH_QUEUE_LIMIT', app.config['PASSWORD_HASH_WORKERS'] * 16)
+        self.app = app
+        app.extensions['password_hasher'] = self
+
+    @property
+    def method(self):
+        if self.app is None:
+            return DEFAULT_PASSWORD_HASH_METHOD
+        return self.app.config['PASSWORD_HASH_METHOD']
+
+    def hash(self, password):
+        """生成密码哈希
+
+        Raises:
+            ServiceUnavailableError: 排队的哈希任务过多
+        """
+        method = self.method
+        return self._run(generate_password_hash, password, method=method)
+
+    def verify(self, password_hash, password):
+        """校验密码
+
+        Raises:
+            ServiceUnavailableError: 排队的哈希任务过多
+        """
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """已有哈希的算法或迭代次数与当前配置不同时返回 True
+
+        登录成功后据此用明文密码重新生成哈希，调整参数后旧密码会逐步迁移。
+        """
+        if not password_hash or '$' not in password_hash:
+            return True
+        return password_hash.split('$', 1)[0] != self.method
+
+    def stats(self):
+        """线程池运行指标"""
+        with self._lock:
+            stats = dict(self._stats)
+        finished = stats['completed'] or 1
+        return {
+            'workers': self.app.config['PASSWORD_HASH_WORKERS'] if self.app else 0,
+            'queue_limit': self.app.config['PASSWORD_HASH_QUEUE_LIMIT'] if self.app else 0,
+            'method': self.method,
+            'queued': stats['queued'],
+            'active': stats['active'],
+            'max_queued': stats['max_queued'],
+            'completed': stats['completed'],
+            'rejected': stats['rejected'],
+            'avg_wait_ms': round(stats['wait_seconds'] / finished * 1000, 2),
+            'avg_run_ms': round(stats['run_seconds'] / finished * 1000, 2)
+        }
+
+    def _run(self, fn, *args, **kwargs):
+        if self.app is None:
+            return fn(*args, **kwargs)
+
+        with self._lock:
+            if self._stats['queued'] >= self.app.config['PASSWORD_HASH_QUEUE_LIMIT']:
+                self._stats['rejected'] += 1
+                raise ServiceUnavailableError('服务器繁忙，请稍后重试')
+            self._stats['queued'] += 1
+            self._stats['max_queued'] = max(self._stats['max_queued'], self._stats['queued'])
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.app.config['PASSWORD_HASH_WORKERS'],
+                    thread_name_prefix='password-hash'
+                )
+
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._stats['queued'] -= 1
+                self._stats['active'] += 1
+                self._stats['wait_seconds'] += started - submitted
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._stats['active'] -= 1
+                    self._stats['completed'] += 1
+                    self._stats['run_seconds'] += time.perf_counter() - started
+
+        return self._executor.submit(task).result()
+
+    def _reset_stats(self):
+        self._stats = {
+            'queued': 0,
+            'active': 0,
+            'max_queued': 0,
+            'completed': 0,
+            'rejected': 0,
+            'wait_seconds': 0.0,
+            'run_seconds': 0.0
+        }
+
+
+password_hasher = PasswordHasher()
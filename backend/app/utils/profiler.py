@@ -0,0 +1,151 @@
+import threading
+import time
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+
+from ..models import db
+
+# 聚合统计中保留的最慢语句长度
+MAX_STATEMENT_LENGTH = 500
+
+
+class QueryProfiler:
+    """按请求统计 SQL 查询次数和耗时
+
+    通过 SQLAlchemy 引擎的 before_cursor_execute / after_cursor_execute 事件
+    计时，每个请求的查询次数、SQL 总耗时和最慢的一条语句记录在 g 中；请求结束时
+    按端点（Flask endpoint）累加到内存中的汇总表，供 /api/admin/perf 查看。
+    代替 SQLALCHEMY_ECHO 排查慢接口和 N+1 查询，不会把每条 SQL 都打到日志里。
+
+    配置项：
+        QUERY_PROFILER_ENABLED: 是否注册引擎事件，默认 True
+        QUERY_PROFILER_HEADERS: 是否在响应头中返回本次请求的统计，默认（None）跟随调试模式
+
+    请求上下文之外执行的查询（后台线程、命令行）不计入统计。流式响应在
+    after_request 之后才执行的查询也不会计入。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._since = time.time()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_PROFILER_ENABLED', True)
+        app.config.setdefault('QUERY_PROFILER_HEADERS', None)
+        self.app = app
+        self.enabled = app.config['QUERY_PROFILER_ENABLED']
+        app.extensions['query_profiler'] = self
+        if not self.enabled:
+            return
+
+        with app.app_context():
+            for engine in db.engines.values():
+                if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+                    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def _start_request(self):
+        g.query_stats = {'count': 0, 'seconds': 0.0, 'slowest': 0.0, 'slowest_statement': None}
+
+    def _finish_request(self, response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+
+        # app.run(debug=True) 在创建应用之后才打开调试模式，因此在这里判断
+        headers = self.app.config['QUERY_PROFILER_HEADERS']
+        if headers if headers is not None else self.app.debug:
+            response.headers['X-Query-Count'] = str(stats['count'])
+            response.headers['X-Query-Time-Ms'] = f"{stats['seconds'] * 1000:.2f}"
+            response.headers['X-Slowest-Query-Ms'] = f"{stats['slowest'] * 1000:.2f}"
+
+        self._record(request.endpoint or request.path, stats)
+        return response
+
+    def _record(self, endpoint, stats):
+        """把一个请求的统计累加到端点汇总"""
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = self._endpoints[endpoint] = {
+                    'requests': 0, 'queries': 0, 'max_queries': 0, 'seconds': 0.0,
+                    'max_seconds': 0.0, 'slowest': 0.0, 'slowest_statement': None,
+                }
+            entry['requests'] += 1
+            entry['queries'] += stats['count']
+            entry['max_queries'] = max(entry['max_queries'], stats['count'])
+            entry['seconds'] += stats['seconds']
+            entry['max_seconds'] = max(entry['max_seconds'], stats['seconds'])
+            if stats['slowest'] > entry['slowest']:
+                entry['slowest'] = stats['slowest']
+                entry['slowest_statement'] = stats['slowest_statement'][:MAX_STATEMENT_LENGTH]
+
+    def stats(self):
+        """按 SQL 总耗时降序排列的各端点统计
+
+        Returns:
+            dict: {'enabled', 'since', 'endpoints': [{endpoint, requests, queries, avg_queries,
+            max_queries, total_ms, avg_ms, max_ms, slowest_ms, slowest_statement}]}
+        """
+        with self._lock:
+            entries = [(endpoint, dict(entry)) for endpoint, entry in self._endpoints.items()]
+            since = self._since
+
+        endpoints = []
+        for endpoint, entry in sorted(entries, key=lambda item: item[1]['seconds'], reverse=True):
+            requests = entry['requests']
+            endpoints.append({
+                'endpoint': endpoint,
+                'requests': requests,
+                'queries': entry['queries'],
+                'avg_queries': round(entry['queries'] / requests, 2),
+                'max_queries': entry['max_queries'],
+                'total_ms': round(entry['seconds'] * 1000, 2),
+                'avg_ms': round(entry['seconds'] * 1000 / requests, 2),
+                'max_ms': round(entry['max_seconds'] * 1000, 2),
+                'slowest_ms': round(entry['slowest'] * 1000, 2),
+                'slowest_statement': entry['slowest_statement'],
+            })
+        return {
+            'enabled': self.enabled,
+            'since': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(since)),
+            'endpoints': endpoints,
+        }
+
+    def reset(self):
+        """清空汇总统计"""
+        with self._lock:
+            self._endpoints = {}
+            self._since = time.time()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info['query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    if started is None or not has_request_context():
+        return
+    elapsed = time.perf_counter() - started
+    stats = g.get('query_stats')
+    if stats is None:
+        return
+    stats['count'] += 1
+    stats['seconds'] += elapsed
+    if elapsed > stats['slowest']:
+        stats['slowest'] = elapsed
+        stats['slowest_statement'] = statement
+
+
+query_profiler = QueryProfiler()
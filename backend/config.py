@@ -11,11 +11,17 @@ class Config:
     JWT_HEADER_TYPE = 'Bearer'
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 输出全部 SQL 到日志，仅在排查问题时打开；日常性能分析使用 /api/admin/perf
+    SQLALCHEMY_ECHO = os.environ.get('SQLALCHEMY_ECHO', '').lower() in ('1', 'true', 'yes')
     JSON_AS_ASCII = False
     
     # SQLite配置
     SQLALCHEMY_DATABASE_URI = 'sqlite:///app.db'
     
+    # 日志配置，LOG_LEVEL 为空时调试模式使用 DEBUG，否则使用 INFO
+    LOG_LEVEL = os.environ.get('LOG_LEVEL')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')  # text 或 json
+    
     # 上传文件配置
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app/static/uploads')
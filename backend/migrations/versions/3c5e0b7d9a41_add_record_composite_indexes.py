@@ -0,0 +1,43 @@
+"""add composite indexes on records
+
+Revision ID: 3c5e0b7d9a41
+Revises:
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c5e0b7d9a41'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+RECORD_INDEXES = {
+    'ix_records_user_type_created': ['user_id', 'type', 'created_at'],
+    'ix_records_user_created': ['user_id', 'created_at'],
+    'ix_records_user_record_date': ['user_id', 'record_date'],
+}
+
+
+def _existing_indexes():
+    # db.create_all() 可能已经在新库上建好了这些索引
+    inspector = sa.inspect(op.get_bind())
+    return {index['name'] for index in inspector.get_indexes('records')}
+
+
+def upgrade():
+    existing = _existing_indexes()
+    for name, columns in RECORD_INDEXES.items():
+        if name not in existing:
+            op.create_index(name, 'records', columns, unique=False)
+
+
+def downgrade():
+    existing = _existing_indexes()
+    for name in RECORD_INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name='records')
@@ -0,0 +1,52 @@
+"""add daily_user_metrics rollup table
+
+Revision ID: 8f2a6d41c0e7
+Revises: 3c5e0b7d9a41
+Create Date: 2026-10-18 11:00:00.000000
+
+After upgrading an existing database run `flask rebuild-daily-metrics`
+to backfill the rollup from historical records.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f2a6d41c0e7'
+down_revision = '3c5e0b7d9a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() 可能已经建好了这张表
+    if 'daily_user_metrics' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        'daily_user_metrics',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('exercise_count', sa.Integer(), nullable=False),
+        sa.Column('exercise_minutes', sa.Integer(), nullable=False),
+        sa.Column('food_count', sa.Integer(), nullable=False),
+        sa.Column('breakfast_count', sa.Integer(), nullable=False),
+        sa.Column('lunch_count', sa.Integer(), nullable=False),
+        sa.Column('dinner_count', sa.Integer(), nullable=False),
+        sa.Column('snack_count', sa.Integer(), nullable=False),
+        sa.Column('mood_counts', sa.JSON(), nullable=True),
+        sa.Column('weight_kg', sa.Float(), nullable=True),
+        sa.Column('bmi', sa.Float(), nullable=True),
+        sa.Column('feeling_score_sum', sa.Integer(), nullable=False),
+        sa.Column('feeling_count', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'day', name='uq_daily_user_metrics_user_day')
+    )
+
+
+def downgrade():
+    op.drop_table('daily_user_metrics')
@@ -0,0 +1,42 @@
+"""add meal_plans table for precomputed recommendations
+
+Revision ID: a9d3e5f17b42
+Revises: f4b7d2e8a613
+Create Date: 2026-10-18 22:00:00.000000
+
+Rows are written by `flask precompute-meal-plans`.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3e5f17b42'
+down_revision = 'f4b7d2e8a613'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() 可能已经建好了这张表
+    if 'meal_plans' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        'meal_plans',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('breakfast', sa.String(length=255), nullable=True),
+        sa.Column('lunch', sa.String(length=255), nullable=True),
+        sa.Column('dinner', sa.String(length=255), nullable=True),
+        sa.Column('generated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'day', name='uq_meal_plans_user_day')
+    )
+
+
+def downgrade():
+    op.drop_table('meal_plans')
@@ -0,0 +1,37 @@
+"""add job tracking fields to report_requests
+
+Revision ID: b7e19c2f5d60
+Revises: 8f2a6d41c0e7
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e19c2f5d60'
+down_revision = '8f2a6d41c0e7'
+branch_labels = None
+depends_on = None
+
+
+NEW_COLUMNS = (
+    ('started_at', sa.DateTime()),
+    ('completed_at', sa.DateTime()),
+    ('error_message', sa.Text()),
+)
+
+
+def upgrade():
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('report_requests')}
+    with op.batch_alter_table('report_requests') as batch_op:
+        for name, column_type in NEW_COLUMNS:
+            if name not in existing:
+                batch_op.add_column(sa.Column(name, column_type, nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('report_requests') as batch_op:
+        for name, _ in reversed(NEW_COLUMNS):
+            batch_op.drop_column(name)
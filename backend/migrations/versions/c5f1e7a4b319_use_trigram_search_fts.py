@@ -0,0 +1,78 @@
+"""rebuild admin search FTS tables with the trigram tokenizer
+
+Revision ID: c5f1e7a4b319
+Revises: a9d3e5f17b42
+Create Date: 2026-10-19 10:00:00.000000
+
+unicode61 treats a run of CJK characters as a single token, so Chinese food
+names only matched by their full prefix. trigram matches any substring of
+three or more characters.
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f1e7a4b319'
+down_revision = 'a9d3e5f17b42'
+branch_labels = None
+depends_on = None
+
+
+# {FTS表: (内容表, 被索引的列)}
+FTS_TABLES = {
+    'users_fts': ('users', ('username', 'email')),
+    'food_items_fts': ('food_items', ('name',)),
+}
+
+
+def _fts5_available(bind, min_version=None):
+    if bind.dialect.name != 'sqlite':
+        return False
+    if not bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar():
+        return False
+    if min_version is None:
+        return True
+    version = bind.exec_driver_sql('SELECT sqlite_version()').scalar()
+    return tuple(int(part) for part in version.split('.')) >= min_version
+
+
+def _recreate(tokenizer):
+    for fts, (table, columns) in FTS_TABLES.items():
+        column_list = ', '.join(columns)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        old_values = ', '.join(f'old.{column}' for column in columns)
+
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+        op.execute(f'DROP TABLE IF EXISTS {fts}')
+
+        op.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({column_list}, "
+            f"content='{table}', content_rowid='id', tokenize='{tokenizer}')"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {column_list} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+        )
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def upgrade():
+    # trigram 分词器需要 SQLite 3.34+，否则保留原索引（搜索会回退到 ILIKE）
+    if _fts5_available(op.get_bind(), min_version=(3, 34, 0)):
+        _recreate('trigram')
+
+
+def downgrade():
+    if _fts5_available(op.get_bind()):
+        _recreate('unicode61')
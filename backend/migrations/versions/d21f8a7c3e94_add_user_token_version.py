@@ -0,0 +1,28 @@
+"""add token_version to users
+
+Revision ID: d21f8a7c3e94
+Revises: b7e19c2f5d60
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd21f8a7c3e94'
+down_revision = 'b7e19c2f5d60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('users')}
+    if 'token_version' not in existing:
+        with op.batch_alter_table('users') as batch_op:
+            batch_op.add_column(sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('token_version')
@@ -0,0 +1,41 @@
+"""add indexes on activity_logs
+
+Revision ID: e6a3c9b12f58
+Revises: d21f8a7c3e94
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a3c9b12f58'
+down_revision = 'd21f8a7c3e94'
+branch_labels = None
+depends_on = None
+
+
+ACTIVITY_LOG_INDEXES = {
+    'ix_activity_logs_created_id': ['created_at', 'id'],
+    'ix_activity_logs_user_created': ['user_id', 'created_at'],
+}
+
+
+def _existing_indexes():
+    inspector = sa.inspect(op.get_bind())
+    return {index['name'] for index in inspector.get_indexes('activity_logs')}
+
+
+def upgrade():
+    existing = _existing_indexes()
+    for name, columns in ACTIVITY_LOG_INDEXES.items():
+        if name not in existing:
+            op.create_index(name, 'activity_logs', columns, unique=False)
+
+
+def downgrade():
+    existing = _existing_indexes()
+    for name in ACTIVITY_LOG_INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name='activity_logs')
@@ -0,0 +1,28 @@
+"""add personalized flag to meal_plans
+
+Revision ID: e8b2d4f6a1c3
+Revises: c5f1e7a4b319
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b2d4f6a1c3'
+down_revision = 'c5f1e7a4b319'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('meal_plans')}
+    if 'personalized' not in existing:
+        with op.batch_alter_table('meal_plans') as batch_op:
+            batch_op.add_column(sa.Column('personalized', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('meal_plans') as batch_op:
+        batch_op.drop_column('personalized')
@@ -0,0 +1,69 @@
+"""add FTS5 search indexes for users and food_items
+
+Revision ID: f4b7d2e8a613
+Revises: e6a3c9b12f58
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b7d2e8a613'
+down_revision = 'e6a3c9b12f58'
+branch_labels = None
+depends_on = None
+
+
+# {FTS表: (内容表, 被索引的列)}
+FTS_TABLES = {
+    'users_fts': ('users', ('username', 'email')),
+    'food_items_fts': ('food_items', ('name',)),
+}
+
+
+def _fts5_available(bind):
+    if bind.dialect.name != 'sqlite':
+        return False
+    return bool(bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+
+def upgrade():
+    bind = op.get_bind()
+    # 其他数据库上搜索回退到 ILIKE，无需建表
+    if not _fts5_available(bind):
+        return
+
+    for fts, (table, columns) in FTS_TABLES.items():
+        column_list = ', '.join(columns)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        old_values = ', '.join(f'old.{column}' for column in columns)
+
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column_list}, "
+            f"content='{table}', content_rowid='id', tokenize='unicode61')"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_list} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+        )
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for fts in FTS_TABLES:
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+        op.execute(f'DROP TABLE IF EXISTS {fts}')
@@ -0,0 +1,53 @@
+import pytest
+
+from app import create_app
+from app.models import db, User
+from app.services.auth import AuthService
+from app.utils.identity import clear_identity_cache
+
+
+@pytest.fixture
+def app(tmp_path):
+    """使用临时 SQLite 文件数据库的应用（FTS 和多线程测试需要文件数据库）"""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'SQLALCHEMY_ECHO': False,
+        'JWT_SECRET_KEY': 'test-secret-key-that-is-long-enough-for-hs256',
+        'JWT_VERIFY_SUB': False,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    })
+    # 进程级身份缓存按用户ID保存，每个测试的数据库都从头编号
+    clear_identity_cache()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """创建用户，返回用户ID"""
+    def make_user(username, role='user'):
+        with app.app_context():
+            user = User(username=username, email=f'{username}@example.com', role=role)
+            user.password = 'password123'
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make_user
+
+
+@pytest.fixture
+def auth_header(app):
+    """签发带角色和令牌版本声明的访问令牌"""
+    def auth_header(user_id):
+        with app.app_context():
+            token = AuthService.create_token(db.session.get(User, user_id))
+        return {'Authorization': f'Bearer {token}'}
+    return auth_header
@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.models import ActivityLog
+from app.services.activity_log import ActivityLogWriter
+
+
+@pytest.fixture
+def writer(app):
+    """独立的写入器，不启动后台线程，由测试显式调用 flush()"""
+    writer = ActivityLogWriter(app)
+    writer._ensure_started = lambda: None
+    return writer
+
+
+def _actions(app):
+    with app.app_context():
+        return [log.action for log in ActivityLog.query.order_by(ActivityLog.id)]
+
+
+def test_flush_writes_batch(app, writer, make_user):
+    user_id = make_user('alice')
+    writer.record(user_id, 'login', ip_address='127.0.0.1')
+    writer.record(user_id, 'logout')
+
+    assert writer.flush() == 2
+    assert _actions(app) == ['login', 'logout']
+    assert writer.stats()['pending'] == 0
+
+
+def test_bad_entry_is_rejected_without_blocking_others(app, writer, make_user):
+    user_id = make_user('bob')
+    writer.record(user_id, 'login')
+    writer.record(None, 'broken')  # user_id 不能为 NULL
+    writer.record(user_id, 'logout')
+
+    assert writer.flush() == 2
+    stats = writer.stats()
+    assert (stats['written'], stats['rejected'], stats['pending']) == (2, 1, 0)
+
+    # 之后的日志照常写入
+    writer.record(user_id, 'view_report')
+    assert writer.flush() == 1
+    assert _actions(app) == ['login', 'logout', 'view_report']
+
+
+def test_unavailable_database_retries_then_drops(app, writer, make_user, monkeypatch):
+    user_id = make_user('carol')
+    app.config['ACTIVITY_LOG_MAX_ATTEMPTS'] = 2
+    writer.record(user_id, 'login')
+
+    def unavailable(entries):
+        raise OperationalError('INSERT', {}, Exception('database is locked'))
+
+    monkeypatch.setattr(writer, '_insert', unavailable)
+    assert writer.flush() == 0
+    assert writer.stats()['pending'] == 1
+
+    assert writer.flush() == 0
+    stats = writer.stats()
+    assert (stats['pending'], stats['dropped']) == (0, 1)
+
+
+def test_retried_entries_are_written_once_database_recovers(app, writer, make_user, monkeypatch):
+    user_id = make_user('dave')
+    writer.record(user_id, 'login')
+    insert = writer._insert
+
+    def unavailable(entries):
+        raise OperationalError('INSERT', {}, Exception('database is locked'))
+
+    monkeypatch.setattr(writer, '_insert', unavailable)
+    writer.flush()
+    monkeypatch.setattr(writer, '_insert', insert)
+    writer.record(user_id, 'logout')
+
+    assert writer.flush() == 2
+    assert _actions(app) == ['login', 'logout']
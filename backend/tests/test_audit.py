@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, User, ActivityLog
+from app.services.audit import audit
+
+
+def _state(app, user_id):
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        return user.role, [log.action for log in ActivityLog.query.order_by(ActivityLog.id)]
+
+
+def test_change_and_log_commit_together(app, make_user):
+    admin_id, user_id = make_user('boss', role='admin'), make_user('alice')
+    with app.app_context():
+        with audit('update_user_role', user_id=admin_id) as entry:
+            db.session.get(User, user_id).role = 'admin'
+            entry.details = '更新用户 alice 的角色为 admin'
+
+    assert _state(app, user_id) == ('admin', ['update_user_role'])
+
+
+def test_error_in_block_rolls_back_change(app, make_user):
+    admin_id, user_id = make_user('boss', role='admin'), make_user('bob')
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            with audit('update_user_role', user_id=admin_id):
+                db.session.get(User, user_id).role = 'admin'
+                raise RuntimeError('boom')
+
+    assert _state(app, user_id) == ('user', [])
+
+
+def test_failed_log_write_rolls_back_change(app, make_user, monkeypatch):
+    user_id = make_user('carol')
+    monkeypatch.setattr('app.services.audit.get_jwt_identity', lambda: None)
+    with app.app_context():
+        # 日志的 user_id 不能为空，提交失败时修改也不应写入
+        with pytest.raises(IntegrityError):
+            with audit('update_user_role'):
+                db.session.get(User, user_id).role = 'admin'
+
+    assert _state(app, user_id) == ('user', [])
+
+
+def test_admin_route_writes_audit_log(app, client, make_user, auth_header):
+    admin_id, user_id = make_user('boss', role='admin'), make_user('dave')
+    response = client.put(f'/api/admin/users/{user_id}/role', headers=auth_header(admin_id), json={'role': 'admin'})
+    assert response.status_code == 200
+
+    with app.app_context():
+        log = ActivityLog.query.filter_by(action='update_user_role').one()
+        assert log.user_id == admin_id
+        assert 'dave' in log.details
@@ -0,0 +1,39 @@
+from app.models import db, User
+
+
+def test_role_change_revokes_existing_tokens(app, client, make_user, auth_header):
+    admin_id = make_user('boss', role='admin')
+    user_id = make_user('alice')
+    admin, old = auth_header(admin_id), auth_header(user_id)
+    assert client.get('/api/user/info', headers=old).status_code == 200
+
+    response = client.put(f'/api/admin/users/{user_id}/role', headers=admin, json={'role': 'admin'})
+    assert response.status_code == 200
+    assert client.get('/api/user/info', headers=old).status_code == 401
+
+    new = auth_header(user_id)
+    assert client.get('/api/user/info', headers=new).status_code == 200
+    assert client.get('/api/admin/dashboard', headers=new).status_code == 200
+
+
+def test_unchanged_role_keeps_tokens(app, client, make_user, auth_header):
+    admin_id = make_user('boss', role='admin')
+    user_id = make_user('bob')
+    headers = auth_header(user_id)
+
+    response = client.put(f'/api/admin/users/{user_id}', headers=auth_header(admin_id),
+                          json={'role': 'user', 'is_active': True})
+    assert response.status_code == 200
+    assert client.get('/api/user/info', headers=headers).status_code == 200
+    with app.app_context():
+        assert db.session.get(User, user_id).token_version == 0
+
+
+def test_disabling_user_revokes_tokens(app, client, make_user, auth_header):
+    admin_id = make_user('boss', role='admin')
+    user_id = make_user('carol')
+    headers = auth_header(user_id)
+
+    response = client.put(f'/api/admin/users/{user_id}', headers=auth_header(admin_id), json={'is_active': False})
+    assert response.status_code == 200
+    assert client.get('/api/user/info', headers=headers).status_code == 401
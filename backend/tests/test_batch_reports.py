@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from app.models import db, User, Record, Report
+from app.services.batch_reports import BatchReportService
+
+
+def _add_records(app, user_id):
+    with app.app_context():
+        for days_ago in range(3):
+            db.session.add(Record(user_id=user_id, type='exercise', duration=30,
+                                  record_date=datetime.utcnow() - timedelta(days=days_ago)))
+        db.session.commit()
+
+
+def test_rerun_does_not_duplicate_reports(app, make_user):
+    active, disabled = make_user('alice'), make_user('bob')
+    for user_id in (active, disabled):
+        _add_records(app, user_id)
+    with app.app_context():
+        db.session.get(User, disabled).is_active = False
+        db.session.commit()
+
+        first = BatchReportService.run(days=30, shard_size=1, workers=1)
+        second = BatchReportService.run(days=30, shard_size=1, workers=1)
+
+        assert (first['reports'], first['skipped']) == (1, 0)
+        assert (second['reports'], second['skipped']) == (0, 1)
+        assert [report.user_id for report in Report.query.all()] == [active]
+
+
+def test_requested_reports_do_not_block_batch_report(app, make_user):
+    user_id = make_user('carol')
+    _add_records(app, user_id)
+    with app.app_context():
+        db.session.add(Report(user_id=user_id, report_data={}, admin_id=user_id))
+        db.session.commit()
+
+        assert BatchReportService.run(days=30, workers=1)['reports'] == 1
+        assert Report.query.filter_by(user_id=user_id).count() == 2
+
+
+def test_workers_must_be_positive(app):
+    result = app.test_cli_runner().invoke(args=['generate-reports', '--workers', '0'])
+    assert result.exit_code != 0
+    assert 'workers' in result.output
@@ -0,0 +1,167 @@
+import threading
+from datetime import date, datetime
+
+from sqlalchemy import event
+
+from app.models import db, Record, DailyUserMetric
+from app.services.metrics import DailyMetricsService
+
+DAY = date(2026, 10, 1)
+
+
+def _metric(app, user_id, day=DAY):
+    with app.app_context():
+        metric = DailyUserMetric.query.filter_by(user_id=user_id, day=day).first()
+        return metric.to_dict() if metric else None
+
+
+def test_rollup_follows_create_update_delete(app, client, make_user, auth_header):
+    user_id = make_user('alice')
+    headers = auth_header(user_id)
+
+    response = client.post('/api/records', headers=headers, json={
+        'type': 'exercise', 'duration': 30, 'record_date': DAY.isoformat()
+    })
+    assert response.status_code == 201
+    record_id = response.get_json()['id']
+    client.post('/api/records', headers=headers, json={
+        'type': 'food', 'food_name': '米饭', 'meal_time': 'lunch', 'record_date': DAY.isoformat()
+    })
+
+    metric = _metric(app, user_id)
+    assert metric['exercise_count'] == 1
+    assert metric['exercise_minutes'] == 30
+    assert metric['food_count'] == 1
+    assert metric['meal_counts']['lunch'] == 1
+
+    response = client.put(f'/api/records/{record_id}', headers=headers, json={'duration': 45})
+    assert response.status_code == 200
+    assert _metric(app, user_id)['exercise_minutes'] == 45
+
+    client.delete(f'/api/records/{record_id}', headers=headers)
+    metric = _metric(app, user_id)
+    assert metric['exercise_count'] == 0
+    assert metric['food_count'] == 1
+
+    with app.app_context():
+        food_id = Record.query.filter_by(user_id=user_id, type='food').first().id
+    client.delete(f'/api/records/{food_id}', headers=headers)
+    assert _metric(app, user_id) is None
+
+
+def test_mood_counts_keep_recorded_order(app, make_user):
+    user_id = make_user('bob')
+    with app.app_context():
+        for minute, mood in enumerate(('sad', 'happy', 'happy')):
+            db.session.add(Record(
+                user_id=user_id, type='mood', mood_type=mood,
+                record_date=datetime(2026, 10, 1), created_at=datetime(2026, 10, 1, 8, minute)
+            ))
+        db.session.flush()
+        DailyMetricsService.refresh(user_id, [DAY])
+        db.session.commit()
+
+    assert list(_metric(app, user_id)['mood_counts'].items()) == [('sad', 1), ('happy', 2)]
+
+
+def test_concurrent_first_records_for_same_day(app, make_user):
+    user_id = make_user('carol')
+    workers = 8
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def create_record():
+        with app.app_context():
+            try:
+                barrier.wait()
+                db.session.add(Record(user_id=user_id, type='exercise', duration=10,
+                                      record_date=datetime(2026, 10, 1, 9)))
+                DailyMetricsService.refresh(user_id, [DAY])
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=create_record) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    metric = _metric(app, user_id)
+    assert metric['exercise_count'] == workers
+    assert metric['exercise_minutes'] == 10 * workers
+
+
+def test_row_inserted_by_another_request_before_write(app, make_user):
+    """另一个请求在本次 refresh 读取之后、写入之前提交了同一天的汇总行"""
+    user_id = make_user('dave')
+    with app.app_context():
+        db.session.add(Record(user_id=user_id, type='exercise', duration=20, record_date=datetime(2026, 10, 1)))
+        db.session.commit()
+
+        inserted = []
+
+        def insert_competing_row(conn, cursor, statement, parameters, context, executemany):
+            if inserted or 'daily_user_metrics' not in statement or statement.lstrip().startswith('SELECT'):
+                return
+            inserted.append(True)
+            with db.engine.connect() as other:
+                other.execute(DailyUserMetric.__table__.insert().values(
+                    user_id=user_id, day=DAY, exercise_count=99, exercise_minutes=0, food_count=0,
+                    breakfast_count=0, lunch_count=0, dinner_count=0, snack_count=0,
+                    feeling_score_sum=0, feeling_count=0
+                ))
+                other.commit()
+
+        event.listen(db.engine, 'before_cursor_execute', insert_competing_row)
+        try:
+            DailyMetricsService.refresh(user_id, [DAY])
+            db.session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', insert_competing_row)
+
+        assert inserted
+        assert DailyUserMetric.query.filter_by(user_id=user_id).count() == 1
+
+    assert _metric(app, user_id)['exercise_count'] == 1
+
+
+def test_delete_user_removes_rollup(app, client, make_user, auth_header):
+    admin_id = make_user('boss', role='admin')
+    user_id = make_user('erin')
+    with app.app_context():
+        db.session.add(Record(user_id=user_id, type='exercise', duration=5, record_date=datetime(2026, 10, 1)))
+        db.session.flush()
+        DailyMetricsService.refresh(user_id, [DAY])
+        # 记录没有 ORM 级联，先删除以免外键约束影响本测试
+        Record.query.filter_by(user_id=user_id).delete()
+        db.session.commit()
+
+    response = client.delete(f'/api/admin/users/{user_id}', headers=auth_header(admin_id))
+    assert response.status_code == 200
+    with app.app_context():
+        assert DailyUserMetric.query.filter_by(user_id=user_id).count() == 0
+
+
+def test_delete_then_insert_without_upsert(app, client, make_user, auth_header, monkeypatch):
+    """不支持 upsert 的数据库退回到同一事务内先删后插"""
+    monkeypatch.setattr(DailyMetricsService, '_upsert_statement', staticmethod(lambda: None))
+    user_id = make_user('frank')
+    headers = auth_header(user_id)
+
+    response = client.post('/api/records', headers=headers, json={
+        'type': 'exercise', 'duration': 30, 'record_date': DAY.isoformat()
+    })
+    assert response.status_code == 201
+    client.post('/api/records', headers=headers, json={
+        'type': 'exercise', 'duration': 15, 'record_date': DAY.isoformat()
+    })
+
+    metric = _metric(app, user_id)
+    assert (metric['exercise_count'], metric['exercise_minutes']) == (2, 45)
+    with app.app_context():
+        assert DailyUserMetric.query.filter_by(user_id=user_id).count() == 1
@@ -0,0 +1,81 @@
+import pytest
+
+from app.services.dashboard import dashboard_counters
+
+
+@pytest.fixture
+def counts(app):
+    """从数据库校准后的计数，之后的修改只通过增量维护"""
+    with app.app_context():
+        return dashboard_counters.reconcile()
+
+
+def _dashboard(client, headers):
+    body = client.get('/api/admin/dashboard', headers=headers).get_json()
+    return dict(body['user_stats'], announcements=body['active_announcements'])
+
+
+def test_user_changes_update_counts_incrementally(app, client, make_user, auth_header, counts):
+    admin = auth_header(make_user('boss', role='admin'))
+    expected = {'total': counts['total_users'] + 1, 'active': counts['active_users'] + 1,
+                'admin': counts['admin_users'] + 1, 'announcements': counts['active_announcements']}
+    # make_user 绕过接口写库，先校准一次
+    with app.app_context():
+        dashboard_counters.reconcile()
+    assert _dashboard(client, admin) == expected
+
+    response = client.post('/api/auth/register', json={'username': 'alice', 'password': 'password123'})
+    assert response.status_code == 201
+    user_id = response.get_json()['data']['user']['id']
+    expected.update(total=expected['total'] + 1, active=expected['active'] + 1)
+    assert _dashboard(client, admin) == expected
+
+    client.put(f'/api/admin/users/{user_id}/role', headers=admin, json={'role': 'admin'})
+    expected['admin'] += 1
+    assert _dashboard(client, admin) == expected
+
+    client.put(f'/api/admin/users/{user_id}', headers=admin, json={'is_active': False})
+    expected['active'] -= 1
+    assert _dashboard(client, admin) == expected
+
+    client.delete(f'/api/admin/users/{user_id}', headers=admin)
+    expected.update(total=expected['total'] - 1, admin=expected['admin'] - 1)
+    assert _dashboard(client, admin) == expected
+
+    with app.app_context():
+        reconciled = dashboard_counters.reconcile()
+    assert (reconciled['total_users'], reconciled['active_users'], reconciled['admin_users']) == (
+        expected['total'], expected['active'], expected['admin']
+    )
+
+
+def test_announcement_changes_update_counts(app, client, make_user, auth_header, counts):
+    admin = auth_header(make_user('boss', role='admin'))
+    with app.app_context():
+        active = dashboard_counters.reconcile()['active_announcements']
+
+    response = client.post('/api/admin/announcements', headers=admin, json={'title': '通知', 'content': '内容'})
+    announcement_id = response.get_json()['id']
+    assert _dashboard(client, admin)['announcements'] == active + 1
+
+    client.put(f'/api/admin/announcements/{announcement_id}', headers=admin, json={'is_active': False})
+    assert _dashboard(client, admin)['announcements'] == active
+
+    client.delete(f'/api/admin/announcements/{announcement_id}', headers=admin)
+    assert _dashboard(client, admin)['announcements'] == active
+
+
+def test_record_user_change_deltas(app, counts):
+    before = dict(counts)
+    dashboard_counters.record_user_change(None, (True, False))
+    dashboard_counters.record_user_change((True, False), (False, True))
+    dashboard_counters.record_user_change((False, True), None)
+
+    with app.app_context():
+        assert dashboard_counters.counts() == before
+    dashboard_counters.record_user_change(None, (False, True))
+    with app.app_context():
+        after = dashboard_counters.counts()
+    assert (after['total_users'], after['active_users'], after['admin_users']) == (
+        before['total_users'] + 1, before['active_users'], before['admin_users'] + 1
+    )
@@ -0,0 +1,114 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.models import db, FoodItem, Record, MealPlan
+from app.services.meal_plans import MealPlanService, MEAL_KEYS
+from app.services.recommendations import food_index, UserFoodProfile, CATEGORY_GROUPS
+
+DAY = date(2026, 10, 20)
+
+FOODS = {
+    '米饭': 'staple', '面包': 'staple',
+    '鸡蛋': 'egg', '牛奶': 'dairy',
+    '牛肉': 'meat', '鱼': 'fish',
+    '菠菜': 'vegetable', '西兰花': 'vegetable',
+    '苹果': 'fruit', '香蕉': 'fruit',
+}
+
+# (距 DAY 的天数, 食物, 餐次)；7 天前的记录位于类别缺口窗口之外
+HISTORY = [
+    (1, '米饭', 'lunch'), (1, '菠菜', 'lunch'), (1, '牛肉', 'dinner'),
+    (2, '米饭', 'dinner'), (2, '鸡蛋', 'breakfast'),
+    (4, '菠菜', 'dinner'), (4, '苹果', 'snack'),
+    (7, '菠菜', 'lunch'), (7, '米饭', 'lunch'),
+    (12, '鱼', 'dinner'), (12, '面包', 'breakfast'),
+]
+
+
+@pytest.fixture
+def catalogue(app):
+    with app.app_context():
+        for name, category in FOODS.items():
+            db.session.add(FoodItem(name=name, category=category, is_recommended=True))
+        db.session.commit()
+        food_index.invalidate()
+        snapshot = food_index.snapshot()
+    return snapshot, MealPlanService.build_catalogue(snapshot)
+
+
+def _add_history(app, user_id):
+    with app.app_context():
+        for days_ago, food_name, meal_time in HISTORY:
+            db.session.add(Record(
+                user_id=user_id, type='food', food_name=food_name, meal_time=meal_time,
+                record_date=datetime.combine(DAY - timedelta(days=days_ago), datetime.min.time()) + timedelta(hours=12)
+            ))
+        db.session.commit()
+
+
+def test_batch_weights_match_profile_scores(app, make_user, catalogue):
+    snapshot, catalogue = catalogue
+    active, newcomer = make_user('alice'), make_user('bob')
+    _add_history(app, active)
+
+    with app.app_context():
+        batch = MealPlanService.batch_weights(sorted([active, newcomer]), catalogue, DAY, window_days=90)
+    rows = {user_id: row for row, user_id in enumerate(sorted([active, newcomer]))}
+
+    profiles = {active: UserFoodProfile(), newcomer: UserFoodProfile()}
+    for days_ago, food_name, meal_time in HISTORY:
+        profiles[active].add(food_name, meal_time, DAY - timedelta(days=days_ago))
+
+    for user_id, profile in profiles.items():
+        gaps = profile.gap_groups(snapshot.category_of, DAY)
+        gap_foods = {
+            name for group in gaps for category in CATEGORY_GROUPS[group]
+            for name in snapshot.categories.get(category, ((), ()))[1]
+        }
+        for meal_key in MEAL_KEYS:
+            expected = [profile.score(name, meal_key, [], gap_foods, DAY) for name in catalogue.names]
+            np.testing.assert_allclose(batch['weights'][meal_key][rows[user_id]], expected)
+
+    assert batch['users_with_records'] == {active}
+    assert batch['records'] == len(HISTORY)
+
+
+def test_plans_are_flagged_personalized_only_with_history(app, make_user, catalogue):
+    _, catalogue = catalogue
+    active, newcomer = make_user('alice'), make_user('bob')
+    _add_history(app, active)
+
+    with app.app_context():
+        result = MealPlanService.build_batch(
+            sorted([active, newcomer]), catalogue, DAY, 90, np.random.default_rng(0)
+        )
+    plans = {plan['user_id']: plan for plan in result['plans']}
+    assert plans[active]['personalized'] is True
+    assert plans[newcomer]['personalized'] is False
+    for plan in plans.values():
+        for meal_key in MEAL_KEYS:
+            assert set(plan[meal_key].split('、')) <= FOODS.keys()
+
+
+def test_route_serves_stored_flag_and_skips_stale_plans(app, client, make_user, auth_header, catalogue):
+    user_id = make_user('carol')
+    today = datetime.utcnow().date()
+    with app.app_context():
+        db.session.add(MealPlan(user_id=user_id, day=today, breakfast='面包、牛奶、苹果',
+                                lunch='米饭、牛肉、菠菜', dinner='米饭、鱼、西兰花', personalized=False))
+        db.session.commit()
+
+    body = client.get('/api/user/recommendations/food', headers=auth_header(user_id)).get_json()
+    assert body['personalized'] is False
+    assert body['data'][0]['content'] == '面包、牛奶、苹果'
+
+    # 计划中的食物被删除后不再返回该计划
+    with app.app_context():
+        db.session.delete(FoodItem.query.filter_by(name='牛奶').one())
+        db.session.commit()
+    food_index.invalidate()
+
+    body = client.get('/api/user/recommendations/food', headers=auth_header(user_id)).get_json()
+    assert all('牛奶' not in meal['content'] for meal in body['data'])
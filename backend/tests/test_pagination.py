@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, Record, FoodItem
+from app.utils.errors import ValidationError
+from app.utils.pagination import keyset_paginate, encode_cursor
+
+
+def _walk_records(client, headers, limit):
+    """沿 next_cursor 读取 /api/records/all 的全部分页"""
+    ids, cursor = [], None
+    while True:
+        params = {'limit': limit}
+        if cursor:
+            params['cursor'] = cursor
+        body = client.get('/api/records/all', headers=headers, query_string=params).get_json()
+        ids.extend(record['id'] for record in body['records'])
+        cursor = body['next_cursor']
+        assert body['has_more'] == (cursor is not None)
+        if cursor is None:
+            return ids
+
+
+def test_record_cursor_pages_cover_ties_once(app, client, make_user, auth_header):
+    user_id = make_user('alice')
+    now = datetime.utcnow().replace(microsecond=0)
+    with app.app_context():
+        # 每 3 条共用一个 created_at，游标需要靠 id 区分
+        for i in range(10):
+            db.session.add(Record(user_id=user_id, type='mood', mood_type='happy',
+                                  created_at=now - timedelta(minutes=i // 3)))
+        db.session.commit()
+        expected = [record.id for record in Record.query.filter_by(user_id=user_id).order_by(
+            Record.created_at.desc(), Record.id.desc()
+        )]
+
+    assert _walk_records(client, auth_header(user_id), limit=3) == expected
+    assert _walk_records(client, auth_header(user_id), limit=20) == expected
+
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_keyset_paginate_with_duplicate_sort_keys(app, descending):
+    with app.app_context():
+        for i in range(12):
+            db.session.add(FoodItem(name=f'food-{i % 4}', category='staple'))
+        db.session.commit()
+
+        columns = (FoodItem.name, FoodItem.id)
+        ordering = [column.desc() if descending else column.asc() for column in columns]
+        expected = [item.id for item in FoodItem.query.order_by(*ordering)]
+
+        seen, cursor = [], None
+        while True:
+            page = keyset_paginate(FoodItem.query, columns, cursor, per_page=5, descending=descending)
+            seen.extend(item.id for item in page.items)
+            assert page.has_prev == bool(cursor)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        assert seen == expected
+
+
+def test_keyset_paginate_total_is_optional(app):
+    with app.app_context():
+        for i in range(3):
+            db.session.add(FoodItem(name=f'food-{i}', category='staple'))
+        db.session.commit()
+
+        assert keyset_paginate(FoodItem.query, (FoodItem.id,), per_page=2).total is None
+        assert keyset_paginate(FoodItem.query, (FoodItem.id,), per_page=2, include_total=True).total == 3
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', encode_cursor(1)])
+def test_invalid_cursor_is_rejected(app, cursor):
+    with app.app_context():
+        with pytest.raises(ValidationError):
+            keyset_paginate(FoodItem.query, (FoodItem.name, FoodItem.id), cursor)
+
+
+def test_admin_listing_cursor_and_nullable_sort(app, client, make_user, auth_header):
+    admin_id = make_user('boss', role='admin')
+    headers = auth_header(admin_id)
+    with app.app_context():
+        for i in range(7):
+            db.session.add(FoodItem(name=f'item-{i}', category='staple'))
+        db.session.commit()
+
+    names, cursor = [], ''
+    while cursor is not None:
+        body = client.get('/api/admin/food-items', headers=headers,
+                          query_string={'cursor': cursor, 'per_page': 3}).get_json()
+        names.extend(item['name'] for item in body['data'])
+        assert body['pagination']['current_page'] is None
+        cursor = body['pagination']['next_cursor']
+    assert names == [f'item-{i}' for i in range(7)]
+
+    # description 可以为 NULL，不支持游标分页
+    response = client.get('/api/admin/food-items', headers=headers,
+                          query_string={'cursor': '', 'sort_by': 'description'})
+    assert response.status_code == 400
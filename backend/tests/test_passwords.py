@@ -0,0 +1,44 @@
+from app.models import db, User
+from app.utils.passwords import password_hasher
+
+
+def _login(client, username):
+    return client.post('/api/auth/login', json={'username': username, 'password': 'password123'})
+
+
+def test_full_queue_returns_503(app, client, make_user):
+    make_user('alice')
+    app.config['PASSWORD_HASH_QUEUE_LIMIT'] = 0
+    rejected = password_hasher.stats()['rejected']
+
+    response = _login(client, 'alice')
+    assert response.status_code == 503
+    assert password_hasher.stats()['rejected'] == rejected + 1
+
+    app.config['PASSWORD_HASH_QUEUE_LIMIT'] = 4
+    assert _login(client, 'alice').status_code == 200
+
+
+def test_login_rehashes_with_new_method(app, client, make_user):
+    user_id = make_user('bob')
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+
+    assert _login(client, 'bob').status_code == 200
+    with app.app_context():
+        password_hash = db.session.get(User, user_id).password_hash
+    assert password_hash.startswith('pbkdf2:sha256:2000$')
+
+    # 哈希已是当前参数时不再重写
+    assert _login(client, 'bob').status_code == 200
+    with app.app_context():
+        assert db.session.get(User, user_id).password_hash == password_hash
+
+
+def test_wrong_password_does_not_rehash(app, client, make_user):
+    user_id = make_user('carol')
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+
+    response = client.post('/api/auth/login', json={'username': 'carol', 'password': 'wrong'})
+    assert response.status_code == 401
+    with app.app_context():
+        assert db.session.get(User, user_id).password_hash.startswith('pbkdf2:sha256:1000$')
@@ -0,0 +1,41 @@
+from app.utils.profiler import query_profiler
+
+
+def test_query_count_headers(app, client, make_user, auth_header):
+    headers = auth_header(make_user('alice'))
+
+    response = client.get('/api/user/info', headers=headers)
+    assert 'X-Query-Count' not in response.headers
+
+    app.config['QUERY_PROFILER_HEADERS'] = True
+    response = client.get('/api/user/info', headers=headers)
+    assert response.status_code == 200
+    assert int(response.headers['X-Query-Count']) >= 1
+    assert float(response.headers['X-Query-Time-Ms']) >= float(response.headers['X-Slowest-Query-Ms']) >= 0
+
+
+def test_perf_endpoint_aggregates_and_resets(app, client, make_user, auth_header):
+    admin = auth_header(make_user('boss', role='admin'))
+    user = auth_header(make_user('bob'))
+    query_profiler.reset()
+
+    for _ in range(3):
+        client.get('/api/user/info', headers=user)
+
+    body = client.get('/api/admin/perf', headers=admin).get_json()
+    assert body['data']['enabled'] is True
+    entry = next(item for item in body['data']['endpoints'] if item['endpoint'] == 'user.get_user_info')
+    assert entry['requests'] == 3
+    assert entry['queries'] >= 3
+    assert entry['avg_queries'] == round(entry['queries'] / 3, 2)
+    assert entry['slowest_statement'].lstrip().upper().startswith('SELECT')
+
+    assert client.delete('/api/admin/perf', headers=admin).status_code == 200
+    endpoints = client.get('/api/admin/perf', headers=admin).get_json()['data']['endpoints']
+    # DELETE 请求本身在清空之后才记入汇总
+    assert [item['endpoint'] for item in endpoints] == ['admin_api.reset_perf_stats']
+
+
+def test_perf_requires_admin(client, make_user, auth_header):
+    response = client.get('/api/admin/perf', headers=auth_header(make_user('carol')))
+    assert response.status_code == 403
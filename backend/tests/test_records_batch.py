@@ -0,0 +1,63 @@
+from datetime import date
+
+from app.models import Record, DailyUserMetric
+from app.routes.records import BATCH_MAX_RECORDS
+from app.services.metrics import DailyMetricsService
+
+
+def test_invalid_items_do_not_block_valid_ones(app, client, make_user, auth_header):
+    user_id = make_user('alice')
+    response = client.post('/api/records/batch', headers=auth_header(user_id), json={'records': [
+        {'type': 'exercise', 'duration': 30, 'record_date': '2026-10-01'},
+        {'type': 'unknown'},
+        {'type': 'food', 'food_name': '米饭', 'meal_time': 'lunch', 'record_date': '2026-10-01'},
+        'not an object',
+        {'note': 'missing type'},
+    ]})
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert (body['created'], body['failed']) == (2, 3)
+    assert [result['success'] for result in body['results']] == [True, False, True, False, False]
+    assert all('message' in result for result in body['results'] if not result['success'])
+
+    with app.app_context():
+        records = {record.id: record for record in Record.query.filter_by(user_id=user_id)}
+        assert set(records) == {body['results'][0]['id'], body['results'][2]['id']}
+        assert records[body['results'][0]['id']].type == 'exercise'
+        assert records[body['results'][2]['id']].food_name == '米饭'
+
+        metric = DailyUserMetric.query.filter_by(user_id=user_id, day=date(2026, 10, 1)).one()
+        assert (metric.exercise_count, metric.food_count) == (1, 1)
+
+
+def test_all_invalid_items(client, make_user, auth_header):
+    user_id = make_user('bob')
+    response = client.post('/api/records/batch', headers=auth_header(user_id),
+                           json=[{'type': 'unknown'}, {}])
+    assert response.status_code == 400
+    assert response.get_json()['created'] == 0
+
+
+def test_database_failure_rolls_back_whole_batch(app, client, make_user, auth_header, monkeypatch):
+    user_id = make_user('carol')
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('rollup unavailable')
+
+    monkeypatch.setattr(DailyMetricsService, 'refresh', fail)
+    response = client.post('/api/records/batch', headers=auth_header(user_id), json=[
+        {'type': 'exercise', 'duration': 10},
+        {'type': 'exercise', 'duration': 20},
+    ])
+
+    assert response.status_code == 500
+    with app.app_context():
+        assert Record.query.filter_by(user_id=user_id).count() == 0
+
+
+def test_batch_size_limit(client, make_user, auth_header):
+    user_id = make_user('dave')
+    response = client.post('/api/records/batch', headers=auth_header(user_id),
+                           json=[{'type': 'mood', 'mood_type': 'happy'}] * (BATCH_MAX_RECORDS + 1))
+    assert response.status_code == 400
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, Record, Report, ReportRequest
+from app.services.report_jobs import ReportJobRunner
+from app.services.reports import ReportService
+
+
+@pytest.fixture
+def runner(app):
+    """不启动工作线程的任务执行器，由测试显式调用 process_one()"""
+    return ReportJobRunner(app)
+
+
+def _add_request(app, user_id, with_records=True):
+    with app.app_context():
+        if with_records:
+            db.session.add(Record(user_id=user_id, type='exercise', duration=30,
+                                  record_date=datetime.utcnow() - timedelta(days=1)))
+        report_request = ReportRequest(user_id=user_id)
+        db.session.add(report_request)
+        db.session.commit()
+        return report_request.id
+
+
+def _request(app, request_id):
+    with app.app_context():
+        return db.session.get(ReportRequest, request_id).to_dict()
+
+
+def test_claims_and_completes_oldest_request(app, runner, make_user):
+    first = _add_request(app, make_user('alice'))
+    second = _add_request(app, make_user('newcomer'), with_records=False)
+
+    with app.app_context():
+        assert runner.process_one() is True
+    done = _request(app, first)
+    assert done['status'] == 'completed'
+    assert done['report_id'] is not None
+    assert _request(app, second)['status'] == 'pending'
+
+    with app.app_context():
+        assert runner.process_one() is True
+        assert runner.process_one() is False
+    failed = _request(app, second)
+    assert failed['status'] == 'failed'
+    assert failed['report_id'] is None
+
+
+def test_timed_out_request_is_requeued(app, runner, make_user):
+    user_id = make_user('bob')
+    request_id = _add_request(app, user_id)
+    with app.app_context():
+        ReportRequest.query.filter_by(id=request_id).update({
+            'status': 'processing', 'started_at': datetime.utcnow() - timedelta(hours=1)
+        })
+        db.session.commit()
+
+    assert runner._requeue_interrupted() == 1
+    assert _request(app, request_id)['status'] == 'pending'
+
+    # 未到检查间隔时不再查询
+    assert runner._requeue_if_due() == 0
+
+
+def test_worker_that_lost_its_claim_discards_report(app, runner, make_user, monkeypatch):
+    user_id = make_user('carol')
+    request_id = _add_request(app, user_id)
+    app.config['REPORT_JOB_TIMEOUT'] = 0
+    generate = ReportService.generate_report_data
+    calls = []
+
+    def slow_generate(user_id, days):
+        calls.append(user_id)
+        if len(calls) == 1:
+            # 第一个工作线程超时：申请被放回队列并由另一个工作线程处理完成
+            runner._requeue_interrupted()
+            assert runner.process_one() is True
+        return generate(user_id, days)
+
+    monkeypatch.setattr(ReportService, 'generate_report_data', staticmethod(slow_generate))
+    with app.app_context():
+        assert runner.process_one() is True
+
+    with app.app_context():
+        reports = Report.query.filter_by(request_id=request_id).all()
+        assert len(reports) == 1
+    assert _request(app, request_id)['report_id'] == reports[0].id
+    assert _request(app, request_id)['status'] == 'completed'
@@ -0,0 +1,101 @@
+import pytest
+
+from app.models import db, FoodItem, User
+from app.services.search import search_index
+
+
+@pytest.fixture
+def fts(app):
+    if not search_index.available:
+        pytest.skip('SQLite 不支持 FTS5 trigram 分词')
+    return search_index
+
+
+def _match_ids(name, term):
+    matches = search_index.match(name, term)
+    assert matches is not None
+    return {row.id for row in db.session.query(matches.c.id)}
+
+
+def test_triggers_keep_index_in_sync(app, fts):
+    with app.app_context():
+        item = FoodItem(name='Pineapple', category='fruit')
+        db.session.add(item)
+        db.session.commit()
+        assert _match_ids('food_items', 'apple') == {item.id}
+
+        item.name = 'Mango'
+        db.session.commit()
+        assert _match_ids('food_items', 'apple') == set()
+        assert _match_ids('food_items', 'mango') == {item.id}
+
+        db.session.delete(item)
+        db.session.commit()
+        assert _match_ids('food_items', 'mango') == set()
+
+
+def test_cjk_substring_search(app, fts):
+    with app.app_context():
+        names = ['宫保鸡丁', '鸡丁炒饭', '菠菜']
+        items = {name: FoodItem(name=name, category='meat') for name in names}
+        db.session.add_all(items.values())
+        db.session.commit()
+
+        assert _match_ids('food_items', '保鸡丁') == {items['宫保鸡丁'].id}
+        assert _match_ids('food_items', '鸡丁炒') == {items['鸡丁炒饭'].id}
+        # 短于三个字符的词不走索引，由调用方回退到 ILIKE
+        assert search_index.match('food_items', '鸡丁') is None
+
+
+@pytest.mark.parametrize('term, expected', [
+    ('鸡丁', ['宫保鸡丁', '鸡丁炒饭']),
+    ('宫保鸡丁', ['宫保鸡丁']),
+    ('菠', ['菠菜']),
+    ('apple', ['Pineapple']),
+])
+def test_admin_food_search(app, client, make_user, auth_header, term, expected):
+    admin_id = make_user('boss', role='admin')
+    with app.app_context():
+        for name in ('宫保鸡丁', '鸡丁炒饭', '菠菜', 'Pineapple'):
+            db.session.add(FoodItem(name=name, category='meat'))
+        db.session.commit()
+
+    body = client.get('/api/admin/food-items', headers=auth_header(admin_id),
+                      query_string={'search': term}).get_json()
+    assert sorted(item['name'] for item in body['data']) == sorted(expected)
+
+
+def test_admin_user_search_is_routed_to_paginated_endpoint(app, client, make_user, auth_header):
+    admin_id = make_user('boss', role='admin')
+    make_user('张三丰')
+    make_user('李四')
+
+    body = client.get('/api/admin/users', headers=auth_header(admin_id),
+                      query_string={'search': '张三丰'}).get_json()
+    assert body['success'] is True
+    assert [user['username'] for user in body['data']] == ['张三丰']
+    assert 'pagination' in body
+
+    # 不分页的完整列表移到了 /users/all
+    all_users = client.get('/api/admin/users/all', headers=auth_header(admin_id)).get_json()
+    assert isinstance(all_users, list)
+    with app.app_context():
+        assert len(all_users) == User.query.count()
+
+
+def test_old_tokenizer_is_rebuilt(app, fts):
+    with app.app_context():
+        item = FoodItem(name='宫保鸡丁', category='meat')
+        db.session.add(item)
+        db.session.commit()
+        with db.engine.begin() as conn:
+            for suffix in ('ai', 'ad', 'au'):
+                conn.exec_driver_sql(f'DROP TRIGGER food_items_fts_{suffix}')
+            conn.exec_driver_sql('DROP TABLE food_items_fts')
+            conn.exec_driver_sql(
+                "CREATE VIRTUAL TABLE food_items_fts USING fts5(name, content='food_items', "
+                "content_rowid='id', tokenize='unicode61')"
+            )
+
+        search_index.ensure()
+        assert _match_ids('food_items', '保鸡丁') == {item.id}
@@ -6,7 +6,7 @@ import api from './index'; // 导入配置好的 axios 实例
  */
 export const getAllUsers = async () => {
   try {
-    const response = await api.get('/admin/users');
+    const response = await api.get('/admin/users/all');
     return response; // axios 响应拦截器已经处理了 response.data
   } catch (error) {
     console.error('获取用户列表失败 (API):', error.response || error.message);